@@ -0,0 +1,83 @@
+"""Benchmark Job Guide parser backends on saved pages and check they agree.
+
+Pages come from HTML files/directories given on the command line, or, without arguments,
+from the response cache (`jobguide` entries of every job slug that was scraped before).
+With `--snapshot FILE` the parsed actions are compared against FILE (written on first
+run), so a snapshot taken with an older parser pins today's output.
+
+    python scripts/bench_jobguide_parse.py [pages...] [--repeat 5] [--snapshot actions.json]
+
+`tests/fixtures/jobguide/` holds trimmed pages and their snapshot (`actions.json`, taken with
+the parser both backends replaced); `tests/test_jobguide.py` checks both backends against it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import orjson
+
+from ff14_dataset.config import load_settings
+from ff14_dataset.io.http_cache import ResponseCache
+from ff14_dataset.scraper.jobguide import JOB_SLUG_TO_ABBR, JOBGUIDE_URL, lxml, parse_job_actions
+
+
+def load_pages(sources: list[str]) -> dict[str, str]:
+    if sources:
+        files = [f for s in map(Path, sources) for f in (sorted(s.glob("*.html")) if s.is_dir() else [s])]
+        return {f.stem: f.read_text(encoding="utf-8") for f in files}
+    cache = ResponseCache.from_settings(load_settings())
+    if cache is None:
+        raise SystemExit("no pages given and the response cache is disabled")
+    pages = {}
+    try:
+        for slug in JOB_SLUG_TO_ABBR:
+            hit = cache.get(ResponseCache.make_key(JOBGUIDE_URL.format(slug=slug)), "jobguide")
+            if hit is not None:
+                pages[slug] = hit.decode("utf-8")
+    finally:
+        cache.close()
+    return pages
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("pages", nargs="*", help="HTML files or directories of *.html (default: response cache)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--snapshot", type=Path, default=None, help="Expected actions JSON (created if missing)")
+    args = ap.parse_args()
+
+    pages = load_pages(args.pages)
+    if not pages:
+        raise SystemExit("no Job Guide pages found")
+    backends = ["soup"] + (["lxml"] if lxml is not None else [])
+
+    results: dict[str, dict[str, list[dict]]] = {}
+    for backend in backends:
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            parsed = {name: parse_job_actions(html, backend=backend) for name, html in pages.items()}
+        per_page = (time.perf_counter() - t0) / args.repeat / len(pages)
+        results[backend] = {name: [asdict(a) for a in actions] for name, actions in parsed.items()}
+        n = sum(len(a) for a in parsed.values())
+        print(f"{backend:>5}: {per_page * 1000:8.2f} ms/page  ({len(pages)} pages, {n} actions)")
+
+    ref = results["soup"]
+    for backend in backends[1:]:
+        bad = [name for name in pages if results[backend][name] != ref[name]]
+        print(f"{backend} vs soup: " + ("identical" if not bad else f"DIFFERENT on {', '.join(bad)}"))
+    if args.snapshot is not None:
+        if args.snapshot.exists():
+            expected = orjson.loads(args.snapshot.read_bytes())
+            bad = [name for name in pages if name in expected and expected[name] != ref[name]]
+            print(f"snapshot {args.snapshot}: " + ("identical" if not bad else f"DIFFERENT on {', '.join(bad)}"))
+        else:
+            args.snapshot.write_bytes(orjson.dumps(ref, option=orjson.OPT_INDENT_2))
+            print(f"wrote snapshot {args.snapshot}")
+
+
+if __name__ == "__main__":
+    main()
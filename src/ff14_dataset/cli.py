@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 from ff14_dataset.config import load_settings
-from ff14_dataset.scraper.jobguide import fetch_jobguide_html, parse_job_actions, get_job_abbr
-from ff14_dataset.tagging.actions import derive_tags
+from ff14_dataset.io.http_cache import ResponseCache
+from ff14_dataset.io.presets import load_catalog
+from ff14_dataset.scraper.jobguide import JOB_SLUG_TO_ABBR, get_job_abbr, scrape_jobguides
+from ff14_dataset.tagging.actions import DEFAULT_TAG_RULES, load_tag_rules, tag_frame
 from pathlib import Path
 import orjson
+import polars as pl
 from typing import Any
 
 
@@ -16,16 +20,51 @@ def main() -> None:
     sub.add_parser("version", help="Show versions")
     sub.add_parser("paths", help="Show important paths")
 
+    p_norm = sub.add_parser("normalize", help="Normalize new/changed raw event files into staging Parquet")
+    p_norm.add_argument("--full", action="store_true", help="Ignore the fingerprint index and rebuild everything")
+    p_norm.add_argument("--workers", type=int, default=None, help="Parallel files (default: half the cores)")
+
+    p_feat = sub.add_parser("build-features", help="Build ticks + labels for staging partitions in parallel")
+    p_feat.add_argument("--preset", default=None, help="Action preset JSON (default: presets_dir tags preset)")
+    p_feat.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    p_feat.add_argument("--retries", type=int, default=None, help="Resubmissions per failed partition")
+    p_feat.add_argument("--memory-mb", type=int, default=None, help="Address-space cap per worker process")
+    p_feat.add_argument("--full", action="store_true", help="Rebuild files that are already up to date")
+
+    p_metrics = sub.add_parser("build-metrics", help="Compute metrics_fight_job for every staging partition")
+    p_metrics.add_argument("--preset", default=None, help="Action preset JSON (default: presets_dir tags preset)")
+    p_metrics.add_argument("--jobs", nargs="*", default=[], help="Job abbreviations (default: all jobs)")
+    p_metrics.add_argument("--workers", type=int, default=None, help="Parallel partitions (default: half the cores)")
+
+    p_win = sub.add_parser("export-windows", help="Export one job's ticks + labels as sliding-window shards")
+    p_win.add_argument("job", help="Job abbreviation (e.g. SAM)")
+    p_win.add_argument("--length", type=int, default=None, help="Ticks per window (default: window_length)")
+    p_win.add_argument("--stride", type=int, default=None, help="Ticks between window starts (default: window_stride)")
+
+    sub.add_parser("compact", help="Merge small staging Parquet files into sorted, target-sized parts")
+
+    p_compile = sub.add_parser("compile-presets", help="Compile actions-*.json presets to memory-mappable Arrow IPC")
+    p_compile.add_argument("--force", action="store_true", help="Recompile presets that are up to date")
+
+    p_cat = sub.add_parser("catalog", help="Register DuckDB views over all layers and refresh summary tables")
+    p_cat.add_argument("--no-summaries", action="store_true", help="Only (re)create the views")
+
     p_build_tags = sub.add_parser(
         "build-actions-tags",
         help="Scrape Job Guide and build consolidated actions with tags",
     )
-    p_build_tags.add_argument("--jobs", nargs="+", default=["paladin"], help="Job slugs to scrape (e.g. paladin)")
+    p_build_tags.add_argument(
+        "--jobs", nargs="*", default=[], help="Job slugs to scrape (e.g. paladin; default: all jobs)"
+    )
+    p_build_tags.add_argument("--concurrency", type=int, default=6, help="Job Guide pages fetched at once")
     p_build_tags.add_argument(
         "--base",
         default="config/presets/actions-7.3x-combat-all.json",
         help="Base actions JSON to merge",
     )
+    p_build_tags.add_argument(
+        "--rules", default=str(DEFAULT_TAG_RULES), help="Tag rules YAML (phrases, rules, names)"
+    )
     p_build_tags.add_argument(
         "--out",
         default="config/presets/actions-7.3x-combat-all+tags.json",
@@ -45,62 +84,123 @@ def main() -> None:
     elif args.command == "paths":
         s = load_settings()
         print(f"data_root={s.paths.data_root}")
+    elif args.command == "normalize":
+        from ff14_dataset.processing.normalize import normalize_to_staging
+
+        s = load_settings()
+        rep = normalize_to_staging(s, workers=args.workers, full=args.full)
+        print(
+            f"written={len(rep.written)} unchanged={rep.unchanged} "
+            f"removed={len(rep.removed)} in_flight={rep.skipped_in_flight}"
+        )
+    elif args.command == "build-features":
+        from ff14_dataset.features.driver import run_feature_build
+
+        s = load_settings()
+        results = run_feature_build(
+            s,
+            Path(args.preset) if args.preset else None,
+            workers=args.workers,
+            retries=args.retries,
+            memory_mb=args.memory_mb,
+            full=args.full,
+        )
+        for r in results:
+            if not r.ok:
+                print(f"FAILED {r.partition} after {r.attempts} attempt(s): {r.error}")
+        written = sum(len(r.written) for r in results)
+        failed = sum(not r.ok for r in results)
+        print(f"partitions={len(results)} written={written} failed={failed}")
+        if failed:
+            raise SystemExit(1)
+    elif args.command == "build-metrics":
+        from ff14_dataset.features.driver import default_preset, staging_partitions
+        from ff14_dataset.metrics.compute import build_metrics
+
+        s = load_settings()
+        preset = Path(args.preset) if args.preset else default_preset(s)
+        outs = build_metrics(s, staging_partitions(s), preset, jobs=args.jobs, workers=args.workers)
+        print(f"partitions={len(outs)}")
+    elif args.command == "export-windows":
+        from ff14_dataset.features.windows import export_windows, job_ticks_files
+
+        s = load_settings()
+        job = args.job.upper()
+        out = export_windows(s, job_ticks_files(s, job), job, length=args.length, stride=args.stride)
+        print(f"root={out.root} shards={len(out.shards)} windows={out.windows}")
+    elif args.command == "compact":
+        from ff14_dataset.processing.compact import compact_staging
+
+        rep = compact_staging(load_settings())
+        print(f"partitions={rep.partitions} merged_files={rep.merged} parts_written={len(rep.parts)}")
+    elif args.command == "compile-presets":
+        from ff14_dataset.io.presets import compile_presets
+
+        for arrow, rewritten in compile_presets(load_settings().paths.presets_dir, force=args.force):
+            print(f"{'compiled' if rewritten else 'up to date'}: {arrow}")
+    elif args.command == "catalog":
+        from ff14_dataset.io.duck import DuckCatalog
+
+        catalog = DuckCatalog(load_settings())
+        try:
+            print("views: " + ", ".join(catalog.register_all()))
+            if not args.no_summaries:
+                for name, (read, dropped) in catalog.refresh_summaries().items():
+                    print(f"{name}: files_read={read} files_dropped={dropped}")
+        finally:
+            catalog.close()
     elif args.command == "build-actions-tags":
         base_path = Path(args.base)
         out_path = Path(args.out)
         out_path.parent.mkdir(parents=True, exist_ok=True)
 
-        base = orjson.loads(base_path.read_bytes())
-        base_records: list[dict[str, Any]] = base.get("records", [])
-
-        # Scrape each requested job
-        scraped_by_job: dict[str, dict[str, dict[str, str | None]]] = {}
-        for job_slug in args.jobs:
-            html = fetch_jobguide_html(job_slug)
-            actions = parse_job_actions(html)
-            # Build name->details map (name_en normalized)
-            scraped_by_job[job_slug] = {a.name_en: {
-                "cast": a.cast,
-                "recast": a.recast,
-                "range": a.range,
-                "radius": a.radius,
-                "tooltip": a.tooltip,
-            } for a in actions}
-
-        # Merge: for records in base matching job_abbr, apply derived tags
-        updated_records: list[dict[str, Any]] = []
-        jobs_abbr = {get_job_abbr(j): j for j in args.jobs}
-        for rec in base_records:
-            job_abbr = rec.get("job_abbr")
-            name_en = rec.get("name_en") or rec.get("name")
-            category = rec.get("category")
-
-            # Keep original tags if present
-            tags = list(rec.get("tags") or [])
-
-            if job_abbr in jobs_abbr and name_en:
-                job_slug = jobs_abbr[job_abbr]
-                details = scraped_by_job.get(job_slug, {}).get(name_en)
-                if details:
-                    derived = derive_tags(
-                        name_en=name_en,
-                        tooltip=details.get("tooltip"),
-                        category=category,
-                        cast=details.get("cast"),
-                        recast=details.get("recast"),
-                    )
-                    # merge unique
-                    merged = sorted({*tags, *derived})
-                    rec = {**rec, "tags": merged}
-
-            updated_records.append(rec)
+        base = load_catalog(base_path)
+
+        # Scrape all requested jobs concurrently over one client
+        cache = ResponseCache.from_settings(load_settings())
+        jobs = args.jobs or list(JOB_SLUG_TO_ABBR)
+        try:
+            scraped = asyncio.run(scrape_jobguides(jobs, concurrency=args.concurrency, cache=cache))
+        finally:
+            if cache is not None:
+                cache.close()
+        scraped_frame = pl.DataFrame(
+            [
+                {"job_abbr": get_job_abbr(job_slug), "_name": a.name_en, "tooltip": a.tooltip}
+                for job_slug, actions in scraped.items()
+                for a in actions
+            ],
+            schema={"job_abbr": pl.Utf8, "_name": pl.Utf8, "tooltip": pl.Utf8},
+        ).unique(["job_abbr", "_name"], keep="last")
+
+        # Merge: base records of a scraped job whose name matches get tags derived in one batch
+        name = pl.coalesce(pl.col("name_en"), pl.col("name")) if "name" in base.frame.columns else pl.col("name_en")
+        records = base.frame.with_row_index("_row").with_columns(name.alias("_name"))
+        matched = records.join(scraped_frame, on=["job_abbr", "_name"], how="inner")
+        derived = matched.select(
+            "_row",
+            tag_frame(matched, load_tag_rules(Path(args.rules)), name="_name").alias("_derived"),
+        )
+        # Keep original tags, merge unique
+        updated = (
+            records.join(derived, on="_row", how="left")
+            .sort("_row")
+            .with_columns(
+                pl.when(pl.col("_derived").is_not_null())
+                .then(pl.concat_list(pl.col("tags").fill_null([]), "_derived").list.unique().list.sort())
+                .otherwise(pl.col("tags"))
+                .alias("tags")
+            )
+            .drop("_row", "_name", "_derived")
+        )
+        updated_records: list[dict[str, Any]] = updated.to_dicts()
 
         # Write output
         out_doc = {
-            "schema": base.get("schema", "ff14_dataset.actions/1"),
-            "game_patch": base.get("game_patch", "7.3x"),
-            "language": base.get("language", "en"),
-            "generated_at": base.get("generated_at"),
+            "schema": base.meta.get("schema", "ff14_dataset.actions/1"),
+            "game_patch": base.meta.get("game_patch", "7.3x"),
+            "language": base.meta.get("language", "en"),
+            "generated_at": base.meta.get("generated_at"),
             "records": updated_records,
         }
         out_path.write_bytes(orjson.dumps(out_doc))
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import yaml
 from dotenv import load_dotenv
@@ -27,6 +27,7 @@ class PathsConfig:
     curated: str
     duckdb_file: str
     presets_dir: Path
+    manifest_file: str = "ingest_manifest.sqlite"
 
 
 @dataclass
@@ -48,6 +49,11 @@ class IngestionConfig:
     sleep_ms: int
     quality_filters: IngestionQuality
     filters: IngestionFilters
+    batch_max_cost: int = 50  # sub-queries merged into one aliased GraphQL request
+    raw_compression: str = "none"  # "none" | "zstd" for raw event NDJSON
+    raw_layout: str = "files"  # "files" (one file per fight) | "segments" (see io.segments)
+    segment_max_mb: int = 256
+    max_concurrency: int = 8  # ceiling the rate-limit scheduler may grow concurrency to
 
 
 @dataclass
@@ -61,6 +67,16 @@ class FeaturesLabels:
 class FeaturesConfig:
     labels: FeaturesLabels
     include_action_mask: bool
+    # per job: status IDs tracked as st_<id> tick columns (in addition to the preset's)
+    tracked_statuses: Dict[str, list[int]] = field(default_factory=dict)
+    # per job: combo action id -> ability ids that must be the current combo step
+    combo_prerequisites: Dict[str, Dict[int, list[int]]] = field(default_factory=dict)
+    # sliding-window training samples: ticks per window, ticks between window starts
+    window_length: int = 64
+    window_stride: int = 16
+    # partition-parallel build: resubmissions per failed partition, address-space cap per worker
+    build_retries: int = 2
+    worker_memory_mb: Optional[int] = None
 
 
 @dataclass
@@ -68,6 +84,23 @@ class PartitionsConfig:
     scheme: str  # "game_patch/encounter_name/job/report_date"
 
 
+@dataclass
+class CompactionConfig:
+    target_file_mb: int = 128  # merge staging files smaller than this, up to this size
+    row_group_rows: int = 131_072
+    min_files: int = 8  # leave partitions with fewer files alone
+
+
+@dataclass
+class CacheConfig:
+    enabled: bool = True
+    dir: str = "cache"
+    max_mb: int = 2048
+    offline: bool = False
+    # seconds per request kind; null = never expires, 0 = not cached
+    ttl_s: Dict[str, Optional[float]] = field(default_factory=dict)
+
+
 @dataclass
 class Settings:
     app: AppConfig
@@ -75,6 +108,8 @@ class Settings:
     ingestion: IngestionConfig
     features: FeaturesConfig
     partitions: PartitionsConfig
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    compaction: CompactionConfig = field(default_factory=CompactionConfig)
 
 
 def _deep_update(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
@@ -118,6 +153,7 @@ def load_settings(config_path: str | Path = "config/default.yaml") -> Settings:
         curated=paths["curated"],
         duckdb_file=paths["duckdb_file"],
         presets_dir=Path(paths["presets_dir"]).resolve(),
+        manifest_file=paths.get("manifest_file", "ingest_manifest.sqlite"),
     )
     iq = IngestionQuality(**raw_cfg["ingestion"]["quality_filters"])  # type: ignore[arg-type]
     ifilt = IngestionFilters(**raw_cfg["ingestion"]["filters"])  # type: ignore[arg-type]
@@ -126,10 +162,31 @@ def load_settings(config_path: str | Path = "config/default.yaml") -> Settings:
         sleep_ms=int(raw_cfg["ingestion"]["sleep_ms"]),
         quality_filters=iq,
         filters=ifilt,
+        batch_max_cost=int(raw_cfg["ingestion"].get("batch_max_cost", 50)),
+        raw_compression=str(raw_cfg["ingestion"].get("raw_compression", "none")),
+        raw_layout=str(raw_cfg["ingestion"].get("raw_layout", "files")),
+        segment_max_mb=int(raw_cfg["ingestion"].get("segment_max_mb", 256)),
+        max_concurrency=int(raw_cfg["ingestion"].get("max_concurrency", 8)),
     )
     fl = FeaturesLabels(**raw_cfg["features"]["labels"])  # type: ignore[arg-type]
-    feat = FeaturesConfig(labels=fl, include_action_mask=raw_cfg["features"]["include_action_mask"])  # type: ignore[arg-type]
+    feat = FeaturesConfig(
+        labels=fl,
+        include_action_mask=raw_cfg["features"]["include_action_mask"],
+        tracked_statuses={k: [int(x) for x in v] for k, v in (raw_cfg["features"].get("tracked_statuses") or {}).items()},
+        combo_prerequisites={
+            job: {int(a): [int(x) for x in pre] for a, pre in (combos or {}).items()}
+            for job, combos in (raw_cfg["features"].get("combo_prerequisites") or {}).items()
+        },
+        window_length=int(raw_cfg["features"].get("window_length", 64)),
+        window_stride=int(raw_cfg["features"].get("window_stride", 16)),
+        build_retries=int(raw_cfg["features"].get("build_retries", 2)),
+        worker_memory_mb=raw_cfg["features"].get("worker_memory_mb"),
+    )  # type: ignore[arg-type]
     part = PartitionsConfig(**raw_cfg["partitions"])  # type: ignore[arg-type]
+    cache = CacheConfig(**(raw_cfg.get("cache") or {}))  # type: ignore[arg-type]
 
-    return Settings(app=app, paths=paths_cfg, ingestion=ing, features=feat, partitions=part)
+    compaction = CompactionConfig(**(raw_cfg.get("compaction") or {}))  # type: ignore[arg-type]
+    return Settings(
+        app=app, paths=paths_cfg, ingestion=ing, features=feat, partitions=part, cache=cache, compaction=compaction
+    )
 
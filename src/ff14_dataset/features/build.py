@@ -1,25 +1,116 @@
 from __future__ import annotations
 
-"""Feature and label builder (skeleton).
+"""Feature and label builder.
 
-Produces:
-- next GCD action label
-- oGCD list per weave window
-- time-to-next-action
-- action mask
+Produces, per tick (aligned 1:1 with the curated ticks file):
+- next GCD action label (`label_next_gcd`)
+- oGCDs still to be woven before that GCD (`label_ogcd_list`)
+- time-to-next-action in ms (`label_time_to_next_action_ms`)
+
+The tick state itself (including the action mask) lives in the ticks file. Every label is
+an as-of join of the tick grid against the actor's sorted cast stream plus grouped window
+aggregates, so throughput is bound by sorting, not by Python.
 """
 
-from typing import Dict, Any
+import os
+from pathlib import Path
+from typing import Collection, Optional
+
+import polars as pl
+
+from ff14_dataset.config import FeaturesLabels, Settings
+from ff14_dataset.features.ticks import ACTOR_KEYS, EVENT_ORDER, FIGHT_KEYS
+from ff14_dataset.io.storage import ensure_paths
+
+
+LABEL_KEYS = ACTOR_KEYS + ["tick_id", "fight_ts_ms"]
+
+
+def _casts(events: pl.LazyFrame) -> pl.LazyFrame:
+    return events.filter(pl.col("event_type") == "cast").select(
+        *FIGHT_KEYS, pl.col("source_id").alias("actor_id"), *EVENT_ORDER, "ability_id"
+    )
+
+
+def _asof(left: pl.LazyFrame, right: pl.LazyFrame, strategy: str) -> pl.LazyFrame:
+    return left.join_asof(right, on="fight_ts_ms", by=ACTOR_KEYS, strategy=strategy, check_sortedness=False)
+
+
+def build_features_from_ticks(
+    ticks: pl.LazyFrame | pl.DataFrame,
+    events: pl.LazyFrame | pl.DataFrame,
+    gcd_ability_ids: Collection[int],
+    labels: Optional[FeaturesLabels] = None,
+) -> pl.LazyFrame:
+    """Label every tick from the actor's cast stream.
+
+    Weave windows are the spans between consecutive GCD casts: each oGCD is assigned the
+    index of the last GCD before it, the list of a window is aggregated once, and each tick
+    takes the tail of its window starting at the first oGCD at or after the tick.
+    """
+    labels = labels or FeaturesLabels(next_gcd=True, ogcd_list=True, time_to_next_action=True)
+    grid = ticks.lazy().select(LABEL_KEYS).sort("fight_ts_ms")
+    # Sort after the semi join: joins do not keep row order, and the as-of joins need it
+    casts = _casts(events.lazy()).join(grid.select(ACTOR_KEYS).unique(), on=ACTOR_KEYS, how="semi").sort(EVENT_ORDER)
+    gcd_ids = list(gcd_ability_ids)
+    is_gcd = pl.col("ability_id").is_in(gcd_ids)
+    t = pl.col("fight_ts_ms")
+
+    out = grid
+    if labels.time_to_next_action:
+        nxt = casts.select(*ACTOR_KEYS, "fight_ts_ms", t.alias("_next_cast_ms"))
+        out = _asof(out, nxt, "forward").with_columns(
+            (pl.col("_next_cast_ms") - t).cast(pl.Int32).alias("label_time_to_next_action_ms")
+        ).drop("_next_cast_ms")
+
+    gcds = casts.filter(is_gcd).with_columns(pl.int_range(pl.len()).over(ACTOR_KEYS).cast(pl.Int64).alias("_g"))
+    if labels.next_gcd:
+        nxt_gcd = gcds.select(*ACTOR_KEYS, "fight_ts_ms", pl.col("ability_id").alias("label_next_gcd"))
+        out = _asof(out, nxt_gcd, "forward")
+
+    if labels.ogcd_list:
+        # Shift GCDs by +1 ms so a GCD at exactly t belongs to the *next* window of a tick at t
+        gcd_marks = gcds.select(*ACTOR_KEYS, (t + 1).alias("fight_ts_ms"), "_g")
+        ogcds = (
+            _asof(casts.filter(~is_gcd), gcd_marks, "backward")
+            .with_columns(pl.col("_g").fill_null(-1))
+            .with_columns(pl.int_range(pl.len()).over(ACTOR_KEYS + ["_g"]).alias("_r"))
+        )
+        windows = ogcds.group_by(ACTOR_KEYS + ["_g"]).agg(pl.col("ability_id").alias("_window"))
+        first_left = ogcds.select(*ACTOR_KEYS, "fight_ts_ms", pl.col("_g").alias("_next_g"), "_r")
+        out = (
+            _asof(_asof(out, gcd_marks, "backward").with_columns(pl.col("_g").fill_null(-1)), first_left, "forward")
+            .join(windows, on=ACTOR_KEYS + ["_g"], how="left")
+            .with_columns(
+                pl.when(pl.col("_next_g") == pl.col("_g"))
+                .then(pl.col("_window").list.slice(pl.col("_r")))
+                .otherwise(pl.lit([], dtype=pl.List(pl.Int64)))
+                .alias("label_ogcd_list")
+            )
+            .drop("_g", "_next_g", "_r", "_window")
+        )
+    return out.sort(ACTOR_KEYS + ["fight_ts_ms"])
+
+
+def labels_path_for(ticks_file: Path) -> Path:
+    return ticks_file.with_name(ticks_file.name.replace(".ticks.parquet", ".labels.parquet"))
+
+
+def staging_path_for_ticks(settings: Settings, ticks_file: Path) -> Path:
+    paths = ensure_paths(settings)
+    rel = ticks_file.relative_to(paths.curated)
+    return paths.staging / rel.parent / ticks_file.name.replace(".ticks.parquet", ".parquet")
 
 
-def build_features_from_ticks(ticks_df) -> Dict[str, Any]:
-    # Placeholder output structure
-    return {
-        "features": None,
-        "labels": {
-            "next_gcd": None,
-            "ogcd_list": None,
-            "time_to_next_action": None,
-        },
-    }
+def write_labels_file(settings: Settings, ticks_file: Path, gcd_ability_ids: Collection[int]) -> Path:
+    out = labels_path_for(ticks_file)
+    tmp = out.with_suffix(".parquet.tmp")
+    build_features_from_ticks(
+        pl.scan_parquet(ticks_file),
+        pl.scan_parquet(staging_path_for_ticks(settings, ticks_file)),
+        gcd_ability_ids,
+        settings.features.labels,
+    ).sink_parquet(tmp, compression="zstd", statistics=True)
+    os.replace(tmp, out)
+    return out
 
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+"""Partition-parallel feature build: staging fight files -> curated ticks + labels.
+
+Each `game_patch/encounter/job/report_date=...` staging partition is one unit of work run in
+a worker process (so Polars' GIL-free kernels and Python-side planning scale across cores):
+- every worker gets `cpu_count // workers` Polars threads and an optional address-space cap
+  (`worker_memory_mb`, Unix only), so N workers never oversubscribe cores or RAM;
+- outputs have deterministic names (`<report>_<fight>.ticks/.labels.parquet`) and are swapped
+  in atomically, so a rerun or retry simply overwrites; up-to-date files are skipped;
+- a partition that raises, or whose worker dies (e.g. out of memory), is resubmitted on a
+  fresh pool up to `retries` more times.
+"""
+
+import importlib.util
+import os
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from ff14_dataset.config import Settings
+from ff14_dataset.features.build import labels_path_for, write_labels_file
+from ff14_dataset.features.ticks import layout_for, partition_job, ticks_path_for, write_layout, write_ticks_file
+from ff14_dataset.io.storage import ensure_paths
+
+
+@dataclass
+class PartitionResult:
+    partition: str  # relative to staging
+    written: list[Path] = field(default_factory=list)
+    unchanged: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def default_preset(settings: Settings) -> Path:
+    return settings.paths.presets_dir / "actions-7.3x-combat-all+tags.json"
+
+
+def staging_partitions(settings: Settings) -> list[Path]:
+    """Leaf staging partitions holding fight files, in a stable order."""
+    staging = ensure_paths(settings).staging
+    return sorted({f.parent for f in staging.glob("*/*/*/report_date=*/*.parquet")})
+
+
+def _up_to_date(settings: Settings, staging_file: Path) -> bool:
+    ticks = ticks_path_for(settings, staging_file)
+    labels = labels_path_for(ticks)
+    if not (ticks.exists() and labels.exists()):
+        return False
+    src = staging_file.stat().st_mtime_ns
+    return ticks.stat().st_mtime_ns >= src and labels.stat().st_mtime_ns >= ticks.stat().st_mtime_ns
+
+
+def build_partition(settings: Settings, preset_path: Path, partition: Path, full: bool = False) -> PartitionResult:
+    """Ticks + labels for every fight file of one staging partition (runs inside a worker)."""
+    res = PartitionResult(partition=partition.relative_to(ensure_paths(settings).staging).as_posix())
+    for f in sorted(partition.glob("*.parquet")):
+        if not full and _up_to_date(settings, f):
+            res.unchanged += 1
+            continue
+        layout = layout_for(settings, preset_path, partition_job(settings, f))
+        ticks = write_ticks_file(settings, f, layout)
+        res.written += [ticks, write_labels_file(settings, ticks, layout.gcd_actions)]
+    return res
+
+
+def _init_worker(memory_mb: Optional[int]) -> None:
+    if memory_mb:
+        import resource  # Unix only; spawn_feature_pool drops the cap elsewhere
+
+        cap = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+
+
+def spawn_feature_pool(workers: int, memory_mb: Optional[int] = None) -> ProcessPoolExecutor:
+    """Spawned process pool whose workers split the cores' Polars threads between them."""
+    if memory_mb and importlib.util.find_spec("resource") is None:
+        warnings.warn("worker_memory_mb is not supported on this platform; workers run uncapped")
+        memory_mb = None
+    threads = str(max(1, (os.cpu_count() or 1) // workers))
+    prev = os.environ.get("POLARS_MAX_THREADS")
+    # Read by Polars at import time in the child, so it must be in the environment at spawn
+    os.environ["POLARS_MAX_THREADS"] = threads
+    try:
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker, initargs=(memory_mb,)
+        )
+    finally:
+        if prev is None:
+            os.environ.pop("POLARS_MAX_THREADS", None)
+        else:
+            os.environ["POLARS_MAX_THREADS"] = prev
+
+
+@contextmanager
+def feature_pool(workers: int, memory_mb: Optional[int] = None) -> Iterator[ProcessPoolExecutor]:
+    """`spawn_feature_pool`, shut down (queued work cancelled) on exit."""
+    pool = spawn_feature_pool(workers, memory_mb)
+    try:
+        yield pool
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def run_feature_build(
+    settings: Settings,
+    preset_path: Optional[Path] = None,
+    *,
+    partitions: Optional[list[Path]] = None,
+    workers: Optional[int] = None,
+    retries: Optional[int] = None,
+    memory_mb: Optional[int] = None,
+    full: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> list[PartitionResult]:
+    """Build ticks and labels for all (or the given) staging partitions in parallel.
+
+    `progress(done, total)` is called as partitions finish. Setting `cancel` drops queued
+    partitions and retries; only partitions that ran are returned.
+    """
+    preset_path = preset_path or default_preset(settings)
+    parts = staging_partitions(settings) if partitions is None else sorted(partitions)
+    if not parts:
+        return []
+    retries = settings.features.build_retries if retries is None else retries
+    memory_mb = memory_mb or settings.features.worker_memory_mb
+    staging = ensure_paths(settings).staging
+    for job in sorted({p.relative_to(staging).parts[-2] for p in parts}):
+        write_layout(settings, layout_for(settings, preset_path, job))
+
+    results: dict[Path, PartitionResult] = {}
+    attempts = {p: 0 for p in parts}
+    pending = list(parts)
+    while pending:
+        n = workers or min(len(pending), os.cpu_count() or 1)
+        retry: list[Path] = []
+        # A worker killed mid-task breaks the whole pool: finish this round, then retry on a new one
+        with feature_pool(n, memory_mb) as pool:
+            futures = {pool.submit(build_partition, settings, preset_path, p, full): p for p in pending}
+            for fut in as_completed(futures):
+                p = futures[fut]
+                if fut.cancelled():
+                    continue
+                attempts[p] += 1
+                try:
+                    res = fut.result()
+                except BrokenProcessPool as e:
+                    res = PartitionResult(partition=p.relative_to(staging).as_posix(), error=f"worker died: {e}")
+                except Exception as e:  # noqa: BLE001 - reported per partition
+                    res = PartitionResult(partition=p.relative_to(staging).as_posix(), error=repr(e))
+                res.attempts = attempts[p]
+                results[p] = res
+                if progress:
+                    progress(len(results), len(parts))
+                if cancel is not None and cancel.is_set():
+                    for other in futures:
+                        other.cancel()
+                elif not res.ok and attempts[p] <= retries:
+                    retry.append(p)
+        pending = [] if cancel is not None and cancel.is_set() else sorted(retry)
+    return [results[p] for p in parts if p in results]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+"""Fixed-width, columnar tick layout derived from the action preset.
+
+For one job the layout lists, in a stable order:
+- cooldown slots: every action whose recast exceeds the GCD (`cd_<id>` ms until usable,
+  plus `ch_<id>` available charges for multi-charge actions)
+- tracked statuses: `st_<status_id>` active flags (preset `status_ids_applied` plus the
+  per-job `features.tracked_statuses` config)
+- the dense action index used by the packed action mask
+
+The same layout always yields the same columns in the same order, so curated tick files
+of one job can be memory-mapped and sliced column-wise without any decoding.
+"""
+
+import hashlib
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable
+
+import orjson
+import polars as pl
+
+from ff14_dataset.io.presets import ActionCatalog, load_catalog
+
+
+GCD_RECAST_MS = 2_500
+
+
+@dataclass(frozen=True)
+class CooldownSlot:
+    ability_id: int
+    recast_ms: int
+    charges: int
+
+
+@dataclass(frozen=True)
+class TickLayout:
+    job: str
+    actions: tuple[int, ...]
+    gcd_actions: tuple[int, ...]
+    cooldowns: tuple[CooldownSlot, ...]
+    statuses: tuple[int, ...]
+    signature_actions: tuple[int, ...]
+
+    @property
+    def mask_words(self) -> int:
+        return (len(self.actions) + 63) // 64
+
+    def cooldown_columns(self) -> list[str]:
+        return [f"cd_{c.ability_id}" for c in self.cooldowns]
+
+    def charge_columns(self) -> list[str]:
+        return [f"ch_{c.ability_id}" for c in self.cooldowns if c.charges > 1]
+
+    def status_columns(self) -> list[str]:
+        return [f"st_{s}" for s in self.statuses]
+
+    def schema(self) -> dict[str, pl.DataType]:
+        cols: dict[str, pl.DataType] = {c: pl.Int32 for c in self.cooldown_columns()}
+        cols.update({c: pl.Int8 for c in self.charge_columns()})
+        cols.update({c: pl.Boolean for c in self.status_columns()})
+        return cols
+
+    def fingerprint(self) -> str:
+        return hashlib.sha256(orjson.dumps(asdict(self))).hexdigest()[:16]
+
+    def to_json(self) -> bytes:
+        return orjson.dumps({**asdict(self), "mask_words": self.mask_words, "fingerprint": self.fingerprint()})
+
+
+def layout_from_catalog(
+    catalog: ActionCatalog, job: str, extra_status_ids: Iterable[int] = ()
+) -> TickLayout:
+    usable = pl.col("category").fill_null("") != "Limit Break"
+    if "pvp" in catalog.frame.columns:
+        usable &= ~pl.col("pvp").fill_null(False)
+    mine_df = catalog.job(job).filter(usable).unique("id", keep="first", maintain_order=True).sort("id")
+    mine: dict[int, dict] = {int(r["id"]): r for r in mine_df.to_dicts()}
+    ids = sorted(mine)
+    # Jobs sharing an id, from PvE non-LB rows only
+    jobs_by_id = (
+        catalog.frame.filter(usable & pl.col("id").is_in(ids))
+        .group_by("id")
+        .agg(pl.col("job_abbr").fill_null("").unique())
+    )
+    shared = {int(i) for i, jobs in jobs_by_id.iter_rows() if set(jobs) != {job}}
+    statuses = {int(s) for r in mine.values() for s in r.get("status_ids_applied") or []}
+    statuses.update(int(s) for s in extra_status_ids)
+    return TickLayout(
+        job=job,
+        actions=tuple(ids),
+        gcd_actions=tuple(i for i in ids if mine[i].get("is_gcd")),
+        cooldowns=tuple(
+            CooldownSlot(i, int(mine[i]["base_recast_ms"]), max(1, int(mine[i].get("charges_max") or 0)))
+            for i in ids
+            if int(mine[i].get("base_recast_ms") or 0) > GCD_RECAST_MS
+        ),
+        statuses=tuple(sorted(statuses)),
+        # Actions only this job has: used to find which actor in a fight plays the job
+        signature_actions=tuple(i for i in ids if i not in shared),
+    )
+
+
+def layout_from_records(records: Iterable[dict], job: str, extra_status_ids: Iterable[int] = ()) -> TickLayout:
+    return layout_from_catalog(ActionCatalog.from_records(records), job, extra_status_ids)
+
+
+@lru_cache(maxsize=64)
+def _cached_layout(preset_path: str, mtime_ns: int, job: str, extra: tuple[int, ...]) -> TickLayout:
+    return layout_from_catalog(load_catalog(Path(preset_path)), job, extra)
+
+
+def load_layout(preset_path: Path, job: str, extra_status_ids: Iterable[int] = ()) -> TickLayout:
+    """Layout for `job`, memoized per preset file version."""
+    return _cached_layout(str(preset_path), preset_path.stat().st_mtime_ns, job, tuple(sorted(extra_status_ids)))
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+"""Bitset-packed action mask keyed by the preset's dense action index.
+
+Bit `i` of the mask is set when `layout.actions[i]` is usable at that tick:
+- not animation-locked by the previous cast,
+- GCD actions: the GCD has rolled (`gcd_remaining_ms == 0`),
+- cooldown slots: `cd_<id> == 0` (i.e. at least one charge available),
+- combo actions: the current combo step is one of their prerequisites.
+
+Bits are packed 64 per word into a fixed-size `Array(UInt64, layout.mask_words)` column,
+built with one horizontal sum per word, so the cost does not depend on row-wise Python.
+"""
+
+from typing import Mapping, Optional, Sequence
+
+import polars as pl
+
+from ff14_dataset.features.layout import TickLayout
+
+
+ANIMATION_LOCK_MS = 600
+
+
+def availability_exprs(
+    layout: TickLayout, combo_prerequisites: Optional[Mapping[int, Sequence[int]]] = None
+) -> list[pl.Expr]:
+    """One boolean expression per action, in `layout.actions` order."""
+    combo = combo_prerequisites or {}
+    gcds = set(layout.gcd_actions)
+    slots = {c.ability_id for c in layout.cooldowns}
+    unlocked = pl.col("last_cast_ago_ms").is_null() | (pl.col("last_cast_ago_ms") >= ANIMATION_LOCK_MS)
+    gcd_ready = unlocked & (pl.col("gcd_remaining_ms") <= 0)
+
+    exprs: list[pl.Expr] = []
+    for aid in layout.actions:
+        e = gcd_ready if aid in gcds else unlocked
+        if aid in slots:
+            e = e & (pl.col(f"cd_{aid}") == 0)
+        if aid in combo:
+            e = e & pl.col("combo_action_id").is_in(list(combo[aid]))
+        exprs.append(e.fill_null(False))
+    return exprs
+
+
+def pack_bits(bits: Sequence[pl.Expr], name: str = "action_mask") -> pl.Expr:
+    """Pack boolean expressions into an `Array(UInt64, ceil(n / 64))` expression."""
+    n_words = (len(bits) + 63) // 64
+    words = []
+    for w in range(n_words):
+        chunk = bits[w * 64 : (w + 1) * 64]
+        words.append(
+            pl.sum_horizontal(
+                b.cast(pl.UInt64) * pl.lit(1 << i, dtype=pl.UInt64) for i, b in enumerate(chunk)
+            ).alias(f"_w{w}")
+        )
+    return pl.concat_list(words).list.to_array(n_words).alias(name)
+
+
+def action_mask_expr(
+    layout: TickLayout, combo_prerequisites: Optional[Mapping[int, Sequence[int]]] = None
+) -> pl.Expr:
+    return pack_bits(availability_exprs(layout, combo_prerequisites))
+
+
+def add_action_mask(
+    ticks: pl.LazyFrame, layout: TickLayout, combo_prerequisites: Optional[Mapping[int, Sequence[int]]] = None
+) -> pl.LazyFrame:
+    return ticks.with_columns(action_mask_expr(layout, combo_prerequisites))
+
+
+def mask_bit(layout: TickLayout, ability_id: int, column: str = "action_mask") -> pl.Expr:
+    """Boolean expression reading one action's bit back out of the packed mask."""
+    i = layout.actions.index(ability_id)
+    word = pl.col(column).arr.get(i // 64)
+    return ((word // pl.lit(1 << (i % 64), dtype=pl.UInt64)) % 2 == 1).alias(f"can_{ability_id}")
@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+"""Tick-state reconstruction at `app.tick_ms` resolution.
+
+Staging events are turned into one row per (report, fight, actor, tick) with typed state
+columns. Every state column is an as-of lookup: a sorted event stream (casts, resources,
++1/-1 status deltas accumulated with a cumulative sum) is joined backward onto the tick
+grid with `join_asof`, so the cost is a sort plus a merge, never a Python loop per tick.
+
+With a `TickLayout` the ticks also carry the job's fixed-width columns (`cd_*`, `ch_*`,
+`st_*`): the grid is crossed with the layout slots, joined as-of per (actor, slot) and
+folded back into one typed column per slot.
+"""
+
+import os
+from pathlib import Path
+from typing import Collection, Optional
+
+import polars as pl
+
+from ff14_dataset.config import Settings
+from ff14_dataset.features.layout import TickLayout, load_layout
+from ff14_dataset.features.mask import add_action_mask
+from ff14_dataset.io.storage import ensure_paths
+
+
+FIGHT_KEYS = ["report_id", "fight_id"]
+ACTOR_KEYS = FIGHT_KEYS + ["actor_id"]
+
+COMBO_TIMEOUT_MS = 30_000
+DEFAULT_GCD_MS = 2_500
+# Spacing of two back-to-back GCDs; longer gaps are downtime, not recast
+GCD_GAP_MS = (1_500, 3_500)
+
+# Order of an event stream: `event_id` breaks ties between events of the same millisecond
+EVENT_ORDER = ["fight_ts_ms", "event_id"]
+
+_RESOURCES = pl.Struct({"hitPoints": pl.Int64, "maxHitPoints": pl.Int64, "mp": pl.Int64, "maxMP": pl.Int64})
+
+
+def _asof(grid: pl.LazyFrame, right: pl.LazyFrame) -> pl.LazyFrame:
+    # Both sides are globally sorted on fight_ts_ms, which implies sorted within each `by` group;
+    # the right side is an event stream, so the last of several same-ms events is well defined
+    return grid.join_asof(
+        right.sort(EVENT_ORDER).drop("event_id"),
+        on="fight_ts_ms",
+        by=ACTOR_KEYS,
+        strategy="backward",
+        check_sortedness=False,
+    )
+
+
+def gcd_estimate(gaps: pl.Expr) -> pl.Expr:
+    """Recast estimate from consecutive-GCD gaps: their median within `GCD_GAP_MS` (null if none)."""
+    return gaps.filter(gaps.is_between(*GCD_GAP_MS)).median()
+
+
+def tick_grid(events: pl.LazyFrame, actors: pl.LazyFrame, tick_ms: int) -> pl.LazyFrame:
+    """One row per actor per tick from the pull (0) to the last event of the fight."""
+    bounds = events.group_by(FIGHT_KEYS).agg(
+        pl.col("fight_ts_ms").max().clip(lower_bound=0).alias("_end"),
+        (pl.col("ts_ms") - pl.col("fight_ts_ms")).first().alias("_pull_utc_ms"),
+    )
+    return (
+        actors.join(bounds, on=FIGHT_KEYS)
+        .with_columns(pl.int_ranges(0, pl.col("_end") + 1, tick_ms, dtype=pl.Int64).alias("fight_ts_ms"))
+        .explode("fight_ts_ms")
+        .with_columns(
+            (pl.col("fight_ts_ms") // tick_ms).alias("tick_id"),
+            (pl.col("_pull_utc_ms") + pl.col("fight_ts_ms")).alias("ts_ms"),
+        )
+        .drop("_end", "_pull_utc_ms")
+        .sort("fight_ts_ms")
+    )
+
+
+def _status_counts(events: pl.LazyFrame, actor_col: str, types: tuple[str, str], name: str) -> pl.LazyFrame:
+    """Running count of active statuses from apply(+1)/remove(-1) events, clipped at 0."""
+    apply_t, remove_t = types
+    return (
+        events.filter(pl.col("event_type").is_in([apply_t, remove_t]))
+        .select(
+            *FIGHT_KEYS,
+            pl.col(actor_col).alias("actor_id"),
+            "fight_ts_ms",
+            "event_id",
+            pl.when(pl.col("event_type") == apply_t).then(1).otherwise(-1).alias("_delta"),
+        )
+        .sort(EVENT_ORDER)
+        .with_columns(pl.col("_delta").cum_sum().over(ACTOR_KEYS).clip(lower_bound=0).cast(pl.Int16).alias(name))
+        .drop("_delta")
+    )
+
+
+def _fold_slots(
+    frame: pl.LazyFrame, columns: dict[str, list[str]], masks: Optional[dict[str, str]] = None
+) -> pl.LazyFrame:
+    """Turn K rows per (actor, tick), ordered by slot, into one typed column per slot.
+
+    `columns` maps a value column to its output names; `masks` optionally names a boolean
+    column selecting which slots contribute to that value (e.g. only multi-charge slots).
+    """
+    masks = masks or {}
+    keys = ACTOR_KEYS + ["fight_ts_ms"]
+    live = {src: names for src, names in columns.items() if names}
+    folded = (
+        frame.sort(keys + ["_slot"])
+        .group_by(keys, maintain_order=True)
+        .agg(pl.col(src).filter(pl.col(masks[src])) if src in masks else pl.col(src) for src in live)
+    )
+    return folded.with_columns(pl.col(src).list.to_struct(fields=names) for src, names in live.items()).unnest(
+        *live
+    )
+
+
+def cooldown_state(casts: pl.LazyFrame, grid: pl.LazyFrame, layout: TickLayout) -> pl.LazyFrame:
+    """`cd_<id>` (ms until usable) and `ch_<id>` (charges) for every cooldown slot.
+
+    Recast debt after the k-th use follows the Lindley recursion
+    W_k = max(0, W_{k-1} - (t_k - t_{k-1})) + R, whose closed form
+    W_k = (k + 1) R - t_k + cummax_j(t_j - j R) is a cumulative max, so no loop is needed.
+    """
+    slots = pl.LazyFrame(
+        {
+            "_slot": list(range(len(layout.cooldowns))),
+            "ability_id": [c.ability_id for c in layout.cooldowns],
+            "_R": [c.recast_ms for c in layout.cooldowns],
+            "_N": [c.charges for c in layout.cooldowns],
+        },
+        schema={"_slot": pl.Int32, "ability_id": pl.Int64, "_R": pl.Int64, "_N": pl.Int64},
+    )
+    t = pl.col("fight_ts_ms")
+    by = ACTOR_KEYS + ["_slot"]
+    j = pl.int_range(pl.len()).over(by)
+    uses = (
+        casts.join(slots, on="ability_id")
+        .sort(EVENT_ORDER)
+        .with_columns(j.alias("_j"))
+        .with_columns(
+            ((pl.col("_j") + 1) * pl.col("_R") - t + (t - pl.col("_j") * pl.col("_R")).cum_max().over(by)).alias("_W"),
+            t.alias("_last_use"),
+        )
+        .select(*by, "fight_ts_ms", "_W", "_last_use")
+    )
+    cross = grid.select(*ACTOR_KEYS, "fight_ts_ms").join(slots.drop("ability_id"), how="cross").sort("fight_ts_ms")
+    debt = (pl.col("_W") - (t - pl.col("_last_use"))).clip(lower_bound=0).fill_null(0)
+    state = (
+        cross.join_asof(uses, on="fight_ts_ms", by=by, strategy="backward", check_sortedness=False)
+        .with_columns(debt.alias("_debt"))
+        .with_columns((pl.col("_N") - (pl.col("_debt") + pl.col("_R") - 1) // pl.col("_R")).alias("_charges"))
+        .select(
+            *ACTOR_KEYS,
+            "fight_ts_ms",
+            "_slot",
+            pl.when(pl.col("_charges") >= 1)
+            .then(0)
+            .otherwise(pl.col("_debt") - (pl.col("_N") - 1) * pl.col("_R"))
+            .cast(pl.Int32)
+            .alias("cd"),
+            pl.col("_charges").cast(pl.Int8).alias("ch"),
+            (pl.col("_N") > 1).alias("_has_ch"),
+        )
+    )
+    return _fold_slots(state, {"cd": layout.cooldown_columns(), "ch": layout.charge_columns()}, {"ch": "_has_ch"})
+
+
+def status_state(events: pl.LazyFrame, grid: pl.LazyFrame, layout: TickLayout) -> pl.LazyFrame:
+    """`st_<status_id>` flags: buffs on the actor and debuffs the actor applied."""
+    slots = pl.LazyFrame(
+        {"_slot": list(range(len(layout.statuses))), "status_id": list(layout.statuses)},
+        schema={"_slot": pl.Int32, "status_id": pl.Int64},
+    )
+    etype = pl.col("event_type")
+    changes = (
+        events.filter(etype.str.contains("buff|debuff") & pl.col("status_id").is_in(list(layout.statuses)))
+        .join(slots, on="status_id")
+        .select(
+            *FIGHT_KEYS,
+            pl.when(etype.str.contains("debuff")).then(pl.col("source_id")).otherwise(pl.col("target_id")).alias("actor_id"),
+            "fight_ts_ms",
+            "event_id",
+            "_slot",
+            (~etype.str.starts_with("remove")).alias("_on"),
+        )
+        .sort(EVENT_ORDER)
+        .drop("event_id")
+    )
+    cross = grid.select(*ACTOR_KEYS, "fight_ts_ms").join(slots.select("_slot"), how="cross").sort("fight_ts_ms")
+    state = cross.join_asof(
+        changes, on="fight_ts_ms", by=ACTOR_KEYS + ["_slot"], strategy="backward", check_sortedness=False
+    ).select(*ACTOR_KEYS, "fight_ts_ms", "_slot", pl.col("_on").fill_null(False).alias("st"))
+    return _fold_slots(state, {"st": layout.status_columns()})
+
+
+def build_ticks(
+    events: pl.LazyFrame | pl.DataFrame,
+    tick_ms: int = 100,
+    *,
+    gcd_ability_ids: Optional[Collection[int]] = None,
+    actor_ids: Optional[Collection[int]] = None,
+    layout: Optional[TickLayout] = None,
+) -> pl.LazyFrame:
+    """Reconstruct per-tick actor state from staging events.
+
+    Actors are all casting sources unless `actor_ids` is given (with a layout: the actors
+    casting one of the job's signature actions). Columns:
+    tick_id, report_id, fight_id, actor_id, ts_ms (UTC), fight_ts_ms, last_ability_id,
+    last_cast_ago_ms, target_id, last_gcd_id, gcd_remaining_ms, gcd_ms, combo_action_id,
+    hp, hp_max, mp, x, y, active_buffs, active_debuffs_applied, then the layout columns.
+    """
+    ev = events.lazy()
+    casts = ev.filter(pl.col("event_type") == "cast").select(
+        *FIGHT_KEYS,
+        pl.col("source_id").alias("actor_id"),
+        "fight_ts_ms",
+        "event_id",
+        pl.col("ability_id"),
+        pl.col("target_id"),
+    )
+    if actor_ids is not None:
+        casts = casts.filter(pl.col("actor_id").is_in(list(actor_ids)))
+    elif layout is not None:
+        players = casts.filter(pl.col("ability_id").is_in(list(layout.signature_actions))).select(ACTOR_KEYS).unique()
+        casts = casts.join(players, on=ACTOR_KEYS, how="semi")
+    if gcd_ability_ids is None and layout is not None:
+        gcd_ability_ids = layout.gcd_actions
+    actors = casts.select(ACTOR_KEYS).unique()
+    grid = tick_grid(ev, actors, tick_ms)
+
+    # Last cast of any kind
+    last_cast = casts.select(
+        *ACTOR_KEYS,
+        *EVENT_ORDER,
+        pl.col("ability_id").alias("last_ability_id"),
+        pl.col("fight_ts_ms").alias("_last_cast_ms"),
+        "target_id",
+    )
+
+    # Last GCD + per-actor GCD length estimated from the median spacing of consecutive GCDs
+    gcd_ids = list(gcd_ability_ids or [])
+    gcd_casts = casts.filter(pl.col("ability_id").is_in(gcd_ids)).sort(EVENT_ORDER)
+    gcd_len = (
+        gcd_casts.with_columns(pl.col("fight_ts_ms").diff().over(ACTOR_KEYS).alias("_gap"))
+        .group_by(ACTOR_KEYS)
+        .agg(gcd_estimate(pl.col("_gap")).alias("gcd_ms"))
+        .with_columns(pl.col("gcd_ms").fill_null(DEFAULT_GCD_MS).cast(pl.Int32))
+    )
+    last_gcd = gcd_casts.select(
+        *ACTOR_KEYS,
+        *EVENT_ORDER,
+        pl.col("ability_id").alias("last_gcd_id"),
+        pl.col("fight_ts_ms").alias("_last_gcd_ms"),
+    )
+
+    # Latest known resources/position of the actor (from its own events)
+    res = (
+        ev.filter(pl.col("resources").is_not_null())
+        .select(
+            *FIGHT_KEYS,
+            pl.col("source_id").alias("actor_id"),
+            *EVENT_ORDER,
+            pl.col("resources").str.json_decode(_RESOURCES).alias("_r"),
+            "x",
+            "y",
+        )
+        .select(
+            *ACTOR_KEYS,
+            *EVENT_ORDER,
+            pl.col("_r").struct.field("hitPoints").alias("hp"),
+            pl.col("_r").struct.field("maxHitPoints").alias("hp_max"),
+            pl.col("_r").struct.field("mp").alias("mp"),
+            pl.col("x").cast(pl.Float32),
+            pl.col("y").cast(pl.Float32),
+        )
+        .filter(pl.col("hp").is_not_null())
+    )
+
+    buffs = _status_counts(ev, "target_id", ("applybuff", "removebuff"), "active_buffs")
+    dots = _status_counts(ev, "source_id", ("applydebuff", "removedebuff"), "active_debuffs_applied")
+
+    t = pl.col("fight_ts_ms")
+    out = grid
+    for right in (last_cast, last_gcd, res, buffs, dots):
+        out = _asof(out, right)
+    out = (
+        out.join(gcd_len, on=ACTOR_KEYS, how="left")
+        .with_columns(pl.col("gcd_ms").fill_null(DEFAULT_GCD_MS))
+        .select(
+            "tick_id",
+            *ACTOR_KEYS,
+            "ts_ms",
+            "fight_ts_ms",
+            "last_ability_id",
+            (t - pl.col("_last_cast_ms")).cast(pl.Int32).alias("last_cast_ago_ms"),
+            "target_id",
+            "last_gcd_id",
+            (pl.col("_last_gcd_ms") + pl.col("gcd_ms") - t).clip(lower_bound=0).fill_null(0).cast(pl.Int32).alias("gcd_remaining_ms"),
+            "gcd_ms",
+            pl.when(t - pl.col("_last_gcd_ms") <= COMBO_TIMEOUT_MS).then(pl.col("last_gcd_id")).alias("combo_action_id"),
+            "hp",
+            "hp_max",
+            "mp",
+            "x",
+            "y",
+            pl.col("active_buffs").fill_null(0),
+            pl.col("active_debuffs_applied").fill_null(0),
+        )
+    )
+    keys = ACTOR_KEYS + ["fight_ts_ms"]
+    if layout is None:
+        return out.sort(keys)
+    if layout.cooldowns:
+        out = out.join(cooldown_state(casts, grid, layout), on=keys, how="left")
+    if layout.statuses:
+        out = out.join(status_state(ev, grid, layout), on=keys, how="left")
+    return out.sort(keys)
+
+
+def ticks_path_for(settings: Settings, staging_file: Path) -> Path:
+    """Curated ticks file mirroring a staging fight file: `<report>_<fight>.ticks.parquet`."""
+    paths = ensure_paths(settings)
+    rel = staging_file.relative_to(paths.staging)
+    return paths.curated / rel.parent / f"{staging_file.stem}.ticks.parquet"
+
+
+def partition_job(settings: Settings, staging_file: Path) -> str:
+    """Job of a staging file, from its `game_patch/encounter/job/report_date=...` partition."""
+    rel = staging_file.relative_to(ensure_paths(settings).staging)
+    return rel.parts[-3] if len(rel.parts) >= 4 else ""
+
+
+def layout_for(settings: Settings, preset_path: Path, job: str) -> TickLayout:
+    return load_layout(preset_path, job, settings.features.tracked_statuses.get(job, []))
+
+
+def write_layout(settings: Settings, layout: TickLayout) -> Path:
+    """Persist the layout next to the curated data so readers can map columns without the preset."""
+    p = ensure_paths(settings).curated / "_layouts" / f"{layout.job}.json"
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_bytes(layout.to_json())
+    return p
+
+
+def write_ticks_file(settings: Settings, staging_file: Path, layout: TickLayout) -> Path:
+    out = ticks_path_for(settings, staging_file)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".parquet.tmp")
+    ticks = build_ticks(pl.scan_parquet(staging_file), settings.app.tick_ms, layout=layout)
+    if settings.features.include_action_mask:
+        ticks = add_action_mask(ticks, layout, settings.features.combo_prerequisites.get(layout.job))
+    ticks.sink_parquet(tmp, compression="zstd", statistics=True)
+    os.replace(tmp, out)
+    return out
+
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+"""Sliding-window sequence samples for training, as memory-mappable Arrow IPC shards.
+
+Ticks and their labels are concatenated per fight and appended whole to uncompressed
+Arrow IPC shards (a sequence never straddles two shards). A window index lists, for every
+window of `length` ticks taken every `stride` ticks per (report, fight, actor), the shard
+and the row offset it starts at, so a training `Dataset` resolves item `i` with one index
+lookup and one zero-copy slice of a memory-mapped shard.
+
+Layout under `<curated>/_windows/<JOB>/L<length>_S<stride>/`:
+- `shard-00000.arrow`, ...: tick features + labels, fixed column order for the job
+- `index.arrow`: shard, row_offset, report_id, fight_id, actor_id, start_tick
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+import polars as pl
+
+from ff14_dataset.config import Settings
+from ff14_dataset.features.build import labels_path_for
+from ff14_dataset.features.ticks import ACTOR_KEYS
+from ff14_dataset.io.storage import ensure_paths
+
+
+MAX_WEAVES = 4  # label_ogcd_list is padded/truncated to this many slots (-1 = empty)
+
+
+@dataclass
+class WindowExport:
+    root: Path
+    shards: list[Path]
+    windows: int
+
+
+def windows_root(settings: Settings, job: str, length: int, stride: int) -> Path:
+    return ensure_paths(settings).curated / "_windows" / job / f"L{length}_S{stride}"
+
+
+def job_ticks_files(settings: Settings, job: str) -> list[Path]:
+    """Every curated ticks file of `job`, across patches, encounters and report months."""
+    return sorted(ensure_paths(settings).curated.glob(f"*/*/{job}/report_date=*/*.ticks.parquet"))
+
+
+def _sample_frame(ticks_file: Path) -> pl.DataFrame:
+    """Ticks + labels of one fight as dense columns (strings dropped, weave list fixed-width)."""
+    ticks = pl.scan_parquet(ticks_file)
+    labels = pl.scan_parquet(labels_path_for(ticks_file))
+    df = ticks.join(labels, on=ACTOR_KEYS + ["tick_id", "fight_ts_ms"], how="left", maintain_order="left")
+    if "label_ogcd_list" in df.collect_schema():
+        padded = pl.concat_list(pl.col("label_ogcd_list"), pl.lit([-1] * MAX_WEAVES, dtype=pl.List(pl.Int64)))
+        df = df.with_columns(padded.list.head(MAX_WEAVES).list.to_array(MAX_WEAVES).alias("label_ogcd_list"))
+    return df.sort(ACTOR_KEYS + ["fight_ts_ms"]).collect()
+
+
+def _window_index(df: pl.DataFrame, shard: int, base_row: int, length: int, stride: int) -> pl.DataFrame:
+    """Window starts for every actor sequence of a fight frame placed at `base_row` in a shard."""
+    seqs = (
+        df.with_row_index("_row")
+        .group_by(ACTOR_KEYS, maintain_order=True)
+        .agg(pl.col("_row").first().alias("_first"), pl.len().alias("_n"), pl.col("tick_id").first().alias("_tick0"))
+        .filter(pl.col("_n") >= length)
+    )
+    return (
+        seqs.with_columns(pl.int_ranges(0, pl.col("_n") - length + 1, stride, dtype=pl.Int64).alias("_off"))
+        .explode("_off")
+        .select(
+            pl.lit(shard, dtype=pl.Int32).alias("shard"),
+            (pl.lit(base_row) + pl.col("_first").cast(pl.Int64) + pl.col("_off")).alias("row_offset"),
+            *ACTOR_KEYS,
+            (pl.col("_tick0") + pl.col("_off")).alias("start_tick"),
+        )
+    )
+
+
+def export_windows(
+    settings: Settings,
+    ticks_files: Iterable[Path],
+    job: str,
+    *,
+    length: Optional[int] = None,
+    stride: Optional[int] = None,
+    shard_rows: int = 1_000_000,
+) -> WindowExport:
+    """Write window shards + index for one job's ticks files (all must share its layout)."""
+    length = length or settings.features.window_length
+    stride = stride or settings.features.window_stride
+    root = windows_root(settings, job, length, stride)
+    root.mkdir(parents=True, exist_ok=True)
+    for old in root.glob("*.arrow"):
+        old.unlink()
+
+    shards: list[Path] = []
+    index_parts: list[pl.DataFrame] = []
+    buf: list[pl.DataFrame] = []
+    buf_rows = 0
+
+    def flush() -> None:
+        nonlocal buf, buf_rows
+        if not buf:
+            return
+        path = root / f"shard-{len(shards):05d}.arrow"
+        # Uncompressed so readers can memory-map and slice without decoding
+        pl.concat(buf, how="vertical").drop("report_id").write_ipc(path, compression="uncompressed")
+        shards.append(path)
+        buf, buf_rows = [], 0
+
+    for f in sorted(ticks_files):
+        df = _sample_frame(f)
+        if df.height == 0:
+            continue
+        if buf_rows and buf_rows + df.height > shard_rows:
+            flush()
+        index_parts.append(_window_index(df, len(shards), buf_rows, length, stride))
+        buf.append(df)
+        buf_rows += df.height
+    flush()
+
+    index = pl.concat(index_parts, how="vertical") if index_parts else pl.DataFrame()
+    index.write_ipc(root / "index.arrow", compression="uncompressed")
+    return WindowExport(root=root, shards=shards, windows=index.height)
+
+
+class WindowReader:
+    """O(1) random access to exported windows (e.g. wrapped by a PyTorch `Dataset`)."""
+
+    def __init__(self, root: Path, length: int):
+        self.length = length
+        self.index = pl.read_ipc(root / "index.arrow", memory_map=True)
+        self._shard = self.index["shard"].to_list()
+        self._offset = self.index["row_offset"].to_list()
+        self.shards = [pl.read_ipc(p, memory_map=True) for p in sorted(root.glob("shard-*.arrow"))]
+
+    def __len__(self) -> int:
+        return len(self._offset)
+
+    def __getitem__(self, i: int) -> pl.DataFrame:
+        return self.shards[self._shard[i]].slice(self._offset[i], self.length)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+"""Prefect flows wrapping the pipeline stages.
+
+`build_features_flow` fans staging partitions out as one Prefect task each; the tasks run on
+a thread task runner but only dispatch into the shared feature process pool, so the heavy
+Polars work still lands on separate cores with the per-worker memory cap of
+`features.driver`. Prefect handles per-partition retries and observability; a worker that
+dies breaks the whole pool, so the first task to see it swaps in a fresh pool and the
+retries run there.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+
+from prefect import flow, task
+from prefect.cache_policies import NONE
+from prefect.task_runners import ThreadPoolTaskRunner
+
+from ff14_dataset.config import load_settings
+from ff14_dataset.features.driver import (
+    build_partition,
+    default_preset,
+    spawn_feature_pool,
+    staging_partitions,
+)
+from ff14_dataset.features.ticks import layout_for, write_layout
+from ff14_dataset.io.storage import ensure_paths
+
+
+class SharedFeaturePool:
+    """Feature pool shared by the flow's tasks, replaced as soon as a dead worker breaks it."""
+
+    def __init__(self, workers: int, memory_mb: Optional[int] = None):
+        self.workers = workers
+        self.memory_mb = memory_mb
+        self._lock = threading.Lock()
+        self._pool = spawn_feature_pool(workers, memory_mb)
+
+    def run(self, fn, *args):
+        with self._lock:
+            pool = self._pool
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._replace(pool)
+            raise  # Prefect retries the task, now on the fresh pool
+
+    def _replace(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is not broken:  # another task already swapped it
+                return
+            self._pool = spawn_feature_pool(self.workers, self.memory_mb)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool = self._pool
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+@task(cache_policy=NONE)
+def build_partition_task(pool: SharedFeaturePool, settings, preset_path: Path, partition: Path, full: bool) -> int:
+    res = pool.run(build_partition, settings, preset_path, partition, full)
+    return len(res.written)
+
+
+@flow(name="build-features", task_runner=ThreadPoolTaskRunner(max_workers=64))
+def build_features_flow(
+    config_path: str = "config/default.yaml",
+    preset: Optional[str] = None,
+    workers: Optional[int] = None,
+    memory_mb: Optional[int] = None,
+    full: bool = False,
+) -> int:
+    settings = load_settings(config_path)
+    preset_path = Path(preset) if preset else default_preset(settings)
+    parts = staging_partitions(settings)
+    if not parts:
+        return 0
+    staging = ensure_paths(settings).staging
+    for job in sorted({p.relative_to(staging).parts[-2] for p in parts}):
+        write_layout(settings, layout_for(settings, preset_path, job))
+
+    run = build_partition_task.with_options(retries=settings.features.build_retries, retry_delay_seconds=5)
+    n = workers or min(len(parts), os.cpu_count() or 1)
+    pool = SharedFeaturePool(n, memory_mb or settings.features.worker_memory_mb)
+    try:
+        futures = [run.submit(pool, settings, preset_path, p, full) for p in parts]
+        return sum(f.result() for f in futures)
+    finally:
+        pool.shutdown()
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import os
+from dataclasses import replace
 from pathlib import Path
+from typing import Callable, Optional
 
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import (
@@ -13,11 +15,14 @@ from PySide6.QtWidgets import (
     QFormLayout,
     QGroupBox,
     QHBoxLayout,
+    QHeaderView,
     QLabel,
     QLineEdit,
     QMainWindow,
+    QProgressBar,
     QPushButton,
     QSpinBox,
+    QTableView,
     QTabWidget,
     QTextEdit,
     QSizePolicy,
@@ -27,6 +32,8 @@ from PySide6.QtWidgets import (
 )
 
 from ff14_dataset.config import load_settings
+from ff14_dataset.gui.preview import DuckTableModel
+from ff14_dataset.gui.tasks import Task, TaskRunner
 
 
 class MainWindow(QMainWindow):
@@ -35,6 +42,14 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("FF14 Dataset Builder")
         self.resize(1100, 720)
         self.settings = load_settings()
+        # FF Logs calls and pipeline stages run here, never on the Qt event loop
+        self.runner = TaskRunner(self)
+        self.runner.start()
+        self._zones_task: Optional[Task] = None
+        self._job: Optional[Task] = None
+        self._job_log: Optional[QTextEdit] = None
+        self._job_summary: Callable[[object], str] = str
+        self._duck = None  # DuckCatalog, aperto alla prima anteprima
         self._init_ui()
 
     def _init_ui(self):
@@ -46,6 +61,19 @@ class MainWindow(QMainWindow):
         tabs.addTab(self._tab_settings(), "Impostazioni")
         self.setCentralWidget(tabs)
 
+        # Stato del job in background (raccolta, normalizzazione, features)
+        self.job_label = QLabel("")
+        self.job_progress = QProgressBar()
+        self.job_progress.setMaximumWidth(240)
+        self.job_progress.setVisible(False)
+        self.cancel_job_btn = QPushButton("Annulla")
+        self.cancel_job_btn.setEnabled(False)
+        self.cancel_job_btn.clicked.connect(self._on_cancel_job)
+        bar = self.statusBar()
+        bar.addWidget(self.job_label, 1)
+        bar.addPermanentWidget(self.job_progress)
+        bar.addPermanentWidget(self.cancel_job_btn)
+
     def _tab_fetch_grouped(self) -> QWidget:
         w = QWidget()
         root = QVBoxLayout(w)
@@ -121,18 +149,18 @@ class MainWindow(QMainWindow):
         self.conc_spin = QSpinBox()
         self.conc_spin.setRange(1, 16)
         self.conc_spin.setValue(self.settings.ingestion.concurrency)
-        self.conc_spin.setToolTip("Numero massimo di richieste HTTP parallele a FF Logs (non è il numero di fight in parallelo). Più alto = più veloce, ma attenzione ai rate limit.")
-        lim_form.addRow(QLabel("Richieste parallele"), self.conc_spin)
+        self.conc_spin.setToolTip("Richieste HTTP parallele iniziali verso FF Logs (non è il numero di fight in parallelo). Lo scheduler poi le adatta al budget rateLimitData, fino a ingestion.max_concurrency.")
+        lim_form.addRow(QLabel("Richieste parallele (iniziali)"), self.conc_spin)
 
         self.sleep_spin = QSpinBox()
         self.sleep_spin.setRange(0, 5000)
         self.sleep_spin.setValue(self.settings.ingestion.sleep_ms)
-        self.sleep_spin.setToolTip("Pausa tra richieste per rispettare i rate limit (millisecondi)")
-        lim_form.addRow(QLabel("Sleep (ms)"), self.sleep_spin)
+        self.sleep_spin.setToolTip("Pausa iniziale tra richieste (millisecondi): vale solo finché arriva il primo rateLimitData, poi il ritmo è adattivo")
+        lim_form.addRow(QLabel("Pausa iniziale (ms)"), self.sleep_spin)
 
         # Barra azioni
         actions = QHBoxLayout()
-        self.run_fetch_btn = QPushButton("Avvia raccolta (skeleton)")
+        self.run_fetch_btn = QPushButton("Avvia raccolta")
         self.run_fetch_btn.clicked.connect(self._on_run_fetch)
         actions.addWidget(self.run_fetch_btn)
         actions.addItem(QSpacerItem(20, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
@@ -248,23 +276,134 @@ class MainWindow(QMainWindow):
     def _tab_process(self) -> QWidget:
         w = QWidget()
         layout = QVBoxLayout(w)
-        layout.addWidget(QLabel("Processa raw → staging (skeleton)"))
-        layout.addWidget(QPushButton("Esegui normalizzazione (TODO)"))
+        layout.addWidget(QLabel("Processa raw → staging"))
+        self.run_normalize_btn = QPushButton("Esegui normalizzazione")
+        self.run_normalize_btn.clicked.connect(self._on_run_normalize)
+        layout.addWidget(self.run_normalize_btn)
+        self.process_log = QTextEdit()
+        self.process_log.setReadOnly(True)
+        layout.addWidget(self.process_log)
         return w
 
     def _tab_features(self) -> QWidget:
         w = QWidget()
         layout = QVBoxLayout(w)
-        layout.addWidget(QLabel("Costruisci features e labels (skeleton)"))
-        layout.addWidget(QPushButton("Calcola features (TODO)"))
+        layout.addWidget(QLabel("Costruisci features e labels"))
+        self.run_features_btn = QPushButton("Calcola features")
+        self.run_features_btn.clicked.connect(self._on_run_features)
+        layout.addWidget(self.run_features_btn)
+        self.features_log = QTextEdit()
+        self.features_log.setReadOnly(True)
+        layout.addWidget(self.features_log)
         return w
 
     def _tab_preview(self) -> QWidget:
         w = QWidget()
         layout = QVBoxLayout(w)
-        layout.addWidget(QLabel("Anteprima tabelle DuckDB (TODO)"))
+
+        # Filtri: diventano predicati SQL sulla vista (le colonne di partizione potano i file)
+        filt_group = QGroupBox("Tabella e filtri")
+        filt_form = QFormLayout(filt_group)
+        view_row = QHBoxLayout()
+        self.preview_view_combo = QComboBox()
+        self.preview_view_combo.setMinimumWidth(180)
+        view_row.addWidget(self.preview_view_combo)
+        reload_btn = QPushButton("Ricarica viste")
+        reload_btn.clicked.connect(self._on_reload_views)
+        view_row.addWidget(reload_btn)
+        view_row.addStretch()
+        filt_form.addRow(QLabel("Vista"), view_row)
+
+        self.preview_filters: dict[str, QLineEdit] = {}
+        part_row = QHBoxLayout()
+        for col, hint in [
+            ("game_patch", "7.3x"),
+            ("encounter_name", "encounter"),
+            ("job", "SAM"),
+            ("report_date", "2025-01"),
+            ("report_id", "report"),
+            ("fight_id", "fight"),
+        ]:
+            edit = QLineEdit()
+            edit.setPlaceholderText(hint)
+            edit.setToolTip(col)
+            edit.returnPressed.connect(self._on_preview_query)
+            self.preview_filters[col] = edit
+            part_row.addWidget(edit)
+        filt_form.addRow(QLabel("Partizione / fight"), part_row)
+
+        self.preview_where = QLineEdit()
+        self.preview_where.setPlaceholderText("es. event_type = 'damage' AND amount > 10000")
+        self.preview_where.returnPressed.connect(self._on_preview_query)
+        filt_form.addRow(QLabel("Filtro SQL"), self.preview_where)
+
+        actions = QHBoxLayout()
+        query_btn = QPushButton("Mostra")
+        query_btn.clicked.connect(self._on_preview_query)
+        actions.addWidget(query_btn)
+        actions.addStretch()
+        self.preview_status = QLabel("")
+        self.preview_status.setStyleSheet("color: gray;")
+        actions.addWidget(self.preview_status)
+
+        # Tabella virtualizzata: righe a altezza fissa, lette da DuckDB solo quando visibili
+        self.preview_model = DuckTableModel(self)
+        self.preview_table = QTableView()
+        self.preview_table.setModel(self.preview_model)
+        self.preview_table.setWordWrap(False)
+        vh = self.preview_table.verticalHeader()
+        vh.setSectionResizeMode(QHeaderView.Fixed)
+        vh.setDefaultSectionSize(self.preview_table.fontMetrics().height() + 6)
+
+        layout.addWidget(filt_group)
+        layout.addLayout(actions)
+        layout.addWidget(self.preview_table)
         return w
 
+    def _on_reload_views(self):
+        from ff14_dataset.io.duck import SUMMARIES, DuckCatalog
+
+        try:
+            if self._duck is None:
+                self._duck = DuckCatalog(self.settings)
+            names = self._duck.register_all()
+            tables = {r[0] for r in self._duck.con.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+            names += [n for n in SUMMARIES if n in tables]
+        except Exception as e:
+            self.preview_status.setText(f"Errore: {e}")
+            return
+        current = self.preview_view_combo.currentText()
+        self.preview_view_combo.clear()
+        self.preview_view_combo.addItems(names)
+        if current in names:
+            self.preview_view_combo.setCurrentText(current)
+        self.preview_status.setText(f"{len(names)} viste")
+
+    def _on_preview_query(self):
+        from ff14_dataset.io.duck import PagedQuery, view_columns
+
+        if self._duck is None:
+            self._on_reload_views()
+        view = self.preview_view_combo.currentText()
+        if self._duck is None or not view:
+            return
+        filters = {col: e.text().strip() for col, e in self.preview_filters.items() if e.text().strip()}
+        try:
+            # Filtri solo sulle colonne che la vista ha (es. fights non ha report_date)
+            columns = set(view_columns(self._duck.con, view))
+            query = PagedQuery(
+                self._duck.con,
+                view,
+                filters={c: v for c, v in filters.items() if c in columns},
+                where=self.preview_where.text(),
+            )
+            rows = len(query)
+        except Exception as e:
+            self.preview_status.setText(f"Errore: {e}")
+            return
+        self.preview_model.set_query(query)
+        self.preview_status.setText(f"{rows:,} righe".replace(",", "."))
+
     def _tab_settings(self) -> QWidget:
         w = QWidget()
         layout = QGridLayout(w)
@@ -286,7 +425,8 @@ class MainWindow(QMainWindow):
             self.data_path_edit.setText(path)
 
     def _on_run_fetch(self):
-        # Skeleton: just echo parameters; ingestion wiring comes later
+        from ff14_dataset.ingestion.pipeline import IngestionRequest, ingest_encounters
+
         boss_text = self.boss_combo.currentText().strip()
         tier_text = self.tier_combo.currentText().strip()
         job = self.job_combo.currentText().strip() or "SAM"
@@ -295,15 +435,128 @@ class MainWindow(QMainWindow):
         kills = self.kills_only.isChecked()
         conc = self.conc_spin.value()
         sleep_ms = self.sleep_spin.value()
+        # Boss scelto dal combo → id encounter; testo libero → nome o id
+        idx = self.boss_combo.findText(boss_text)
+        enc_id = self.boss_combo.itemData(idx) if idx >= 0 else None
+        encounter = str(enc_id) if enc_id is not None else boss_text
+        if not encounter:
+            self.fetch_log.append("Seleziona un boss.")
+            return
         self.fetch_log.append(f"Filtri → Tier: {tier_text}, Boss: {boss_text}, Job: {job}, Patch: {patch}, >=Percentile: {perc}, Kills: {kills}")
-        self.fetch_log.append(f"Limiti → Richieste parallele: {conc}, Sleep: {sleep_ms} ms")
-        self.fetch_log.append("Esecuzione raccolta: TODO (wiring a FFLogsClient/pipeline)")
+        self.fetch_log.append(f"Limiti iniziali → Richieste parallele: {conc}, Pausa: {sleep_ms} ms (poi adattivi)")
+
+        # Seminano solo lo scheduler adattivo (ritmo e concorrenza iniziali)
+        settings = replace(self.settings, ingestion=replace(self.settings.ingestion, concurrency=conc, sleep_ms=sleep_ms))
+        req = IngestionRequest(encounters=[encounter], patches=[patch], jobs=[job], min_percentile=perc, kills_only=kills)
+        self._start_job(
+            self.runner.run_async("Raccolta", lambda t: ingest_encounters(settings, req, progress=t.report)),
+            self.fetch_log,
+            lambda paths: f"Raccolta completata: {len(paths)} fight scaricati.",
+        )
+
+    def _on_run_normalize(self):
+        from ff14_dataset.processing.normalize import normalize_to_staging
+
+        def summary(r) -> str:
+            head = "Normalizzazione annullata" if r.cancelled else "Normalizzazione completata"
+            return (
+                f"{head}: {len(r.written)} scritti, {r.unchanged} invariati, {len(r.removed)} rimossi, "
+                f"{r.skipped_in_flight} ancora in download."
+            )
+
+        self._start_job(
+            self.runner.run_sync(
+                "Normalizzazione",
+                lambda t: normalize_to_staging(self.settings, progress=t.report, cancel=t.cancel_event),
+            ),
+            self.process_log,
+            summary,
+        )
+
+    def _on_run_features(self):
+        from ff14_dataset.features.driver import run_feature_build
+
+        def summary(results) -> str:
+            lines = [f"{r.partition}: {r.error}" for r in results if not r.ok]
+            ok = sum(r.ok for r in results)
+            written = sum(len(r.written) for r in results)
+            head = "Features annullate" if task.is_cancelled else "Features completate"
+            return "\n".join([f"{head}: {ok}/{len(results)} partizioni, {written} file scritti.", *lines])
+
+        task = self.runner.run_sync(
+            "Features", lambda t: run_feature_build(self.settings, progress=t.report, cancel=t.cancel_event)
+        )
+        self._start_job(task, self.features_log, summary)
+
+    # -- job in background -----------------------------------------------------------------
+
+    def _start_job(self, task: Task, log: QTextEdit, summary: Callable[[object], str]):
+        self._job, self._job_log, self._job_summary = task, log, summary
+        task.progress.connect(self._on_job_progress)
+        task.finished.connect(self._on_job_finished)
+        task.failed.connect(self._on_job_failed)
+        task.cancelled.connect(self._on_job_cancelled)
+        log.append(f"{task.name}: avviata…")
+        self.job_label.setText(f"{task.name} in corso…")
+        self.job_progress.setRange(0, 0)
+        self.job_progress.setVisible(True)
+        self._set_job_running(True)
+
+    def _set_job_running(self, flag: bool):
+        # Un job alla volta: scrivono tutti nello stesso albero dati
+        for w in [self.run_fetch_btn, self.run_normalize_btn, self.run_features_btn]:
+            w.setEnabled(not flag)
+        self.run_fetch_btn.setEnabled(not flag and self._zones_task is None)
+        self.cancel_job_btn.setEnabled(flag)
+
+    def _on_cancel_job(self):
+        if self._job is not None:
+            self.job_label.setText(f"{self._job.name}: annullamento…")
+            self.cancel_job_btn.setEnabled(False)
+            self._job.cancel()
+
+    def _on_job_progress(self, done: int, total: int):
+        if self.sender() is not self._job or self._job is None:
+            return
+        self.job_progress.setRange(0, max(total, 0))
+        self.job_progress.setValue(done)
+        if not self._job.is_cancelled:
+            self.job_label.setText(f"{self._job.name}: {done}/{total}")
+
+    def _on_job_finished(self, result: object):
+        if self._job_log is not None:
+            self._job_log.append(self._job_summary(result))
+        self._end_job()
+
+    def _on_job_failed(self, message: str):
+        if self._job_log is not None and self._job is not None:
+            self._job_log.append(f"{self._job.name}: errore: {message}")
+        self._end_job()
+
+    def _on_job_cancelled(self):
+        if self._job_log is not None and self._job is not None:
+            self._job_log.append(f"{self._job.name}: annullata (riprende dal punto raggiunto).")
+        self._end_job()
+
+    def _end_job(self):
+        self._job = self._job_log = None
+        self.job_label.setText("")
+        self.job_progress.setVisible(False)
+        self._set_job_running(False)
+
+    def closeEvent(self, event):
+        self.job_label.setText("Chiusura: attendo i job in corso…")
+        self.runner.stop()
+        if self._duck is not None:
+            self._duck.close()
+        super().closeEvent(event)
+
+    # -- tier/boss -------------------------------------------------------------------------
 
     def _on_load_bosses(self):
         # Lazy import to avoid GUI startup cost
-        import os
-        import asyncio
         from ff14_dataset.ingestion.fflogs_client import FFLogsClient
+        from ff14_dataset.io.http_cache import ResponseCache
 
         client_id = os.getenv("FFLOGS_CLIENT_ID")
         client_secret = os.getenv("FFLOGS_CLIENT_SECRET")
@@ -311,22 +564,48 @@ class MainWindow(QMainWindow):
             self.fetch_log.append("Errore: FFLOGS_CLIENT_ID/SECRET non impostati in .env")
             return
 
-        async def load():
-            client = FFLogsClient(client_id, client_secret, concurrency=self.conc_spin.value(), sleep_ms=self.sleep_spin.value())
+        concurrency, sleep_ms = self.conc_spin.value(), self.sleep_spin.value()
+
+        async def load(task: Task):
+            client = FFLogsClient(
+                client_id,
+                client_secret,
+                concurrency=concurrency,
+                sleep_ms=sleep_ms,
+                max_concurrency=self.settings.ingestion.max_concurrency,
+                cache=ResponseCache.from_settings(self.settings),
+            )
             try:
                 data = await client.list_zones()
             finally:
                 await client.close()
             return data
 
-        try:
-            self._set_loading(True, "Caricamento tier/boss da FF Logs…")
-            data = asyncio.run(load())
-        except Exception as e:
-            self.fetch_log.append(f"Errore caricando boss: {e}")
-            return
-        finally:
+        # Un cambio di tipo fight sostituisce il caricamento ancora in corso
+        if self._zones_task is not None:
+            self._zones_task.cancel()
+        self._set_loading(True, "Caricamento tier/boss da FF Logs…")
+        self._zones_task = self.runner.run_async("Tier/boss", load)
+        self._zones_task.finished.connect(self._on_zones_loaded)
+        self._zones_task.failed.connect(self._on_zones_failed)
+        self._zones_task.cancelled.connect(self._on_zones_cancelled)
+
+    def _on_zones_failed(self, message: str):
+        if self.sender() is self._zones_task:
+            self._zones_task = None
             self._set_loading(False)
+            self.fetch_log.append(f"Errore caricando boss: {message}")
+
+    def _on_zones_cancelled(self):
+        if self.sender() is self._zones_task:
+            self._zones_task = None
+            self._set_loading(False)
+
+    def _on_zones_loaded(self, data: dict):
+        if self.sender() is not self._zones_task:
+            return  # risultato di un caricamento sostituito
+        self._zones_task = None
+        self._set_loading(False)
 
         zones = data.get("worldData", {}).get("zones", [])
         sel = self.fight_type_combo.currentText()
@@ -473,16 +752,17 @@ class MainWindow(QMainWindow):
     def showEvent(self, event):
         super().showEvent(event)
         try:
-            if not hasattr(self, "_zones_by_id"):
+            if not hasattr(self, "_zones_by_id") and self._zones_task is None:
                 self._on_load_bosses()
         except Exception:
             pass
 
     def _set_loading(self, flag: bool, msg: str = ""):
+        # Il caricamento gira in background: la finestra resta reattiva
         if flag:
+            if not self.loading_label.text():
+                QApplication.setOverrideCursor(Qt.BusyCursor)
             self.loading_label.setText(msg)
-            QApplication.processEvents()
-            QApplication.setOverrideCursor(Qt.WaitCursor)
         else:
             self.loading_label.setText("")
             QApplication.restoreOverrideCursor()
@@ -495,12 +775,12 @@ class MainWindow(QMainWindow):
             self.patch_combo,
             self.conc_spin,
             self.sleep_spin,
-            self.run_fetch_btn,
         ]:
             try:
                 w.setEnabled(not flag)
             except Exception:
                 pass
+        self.run_fetch_btn.setEnabled(not flag and self._job is None)
 
 
 def main():
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+"""Preview tab model: a DuckDB view as a lazily paged, virtualized Qt table.
+
+`DuckTableModel` reports the filtered row count up front and fetches rows only when the
+view asks for them (i.e. when they scroll into view), a page at a time through
+`io.duck.PagedQuery`; nothing else of the table is ever loaded.
+"""
+
+from typing import Any, Optional
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, QObject, Qt
+
+from ff14_dataset.io.duck import PagedQuery
+
+
+# Long cells (original_json, resources, list columns) are cut in the table, full in the tooltip
+MAX_CELL_CHARS = 200
+
+
+class DuckTableModel(QAbstractTableModel):
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.query: Optional[PagedQuery] = None
+
+    def set_query(self, query: Optional[PagedQuery]) -> None:
+        self.beginResetModel()
+        self.query = query
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() or self.query is None else len(self.query)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() or self.query is None else len(self.query.columns)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid() or self.query is None or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        value = self.query.row(index.row())[index.column()]
+        if value is None:
+            return ""
+        text = str(value)
+        if role == Qt.DisplayRole and len(text) > MAX_CELL_CHARS:
+            return text[:MAX_CELL_CHARS] + "…"
+        return text
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role != Qt.DisplayRole or self.query is None:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.query.columns[section]
+        return section + 1
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+"""Background execution for the GUI: one persistent asyncio loop on a QThread.
+
+FF Logs calls and pipeline stages never run on the Qt event loop. `TaskRunner.run_async`
+schedules a coroutine on the loop (one loop for the whole session, so clients and caches can
+be reused across calls); `run_sync` runs a blocking stage (normalize, feature build) in the
+loop's thread pool. Both return a `Task` whose signals are delivered to GUI-thread slots as
+queued calls: `progress(done, total)`, then exactly one of `finished(result)`,
+`failed(message)` or `cancelled()`.
+
+Cancelling a coroutine cancels its asyncio task at the next await (ingestion resumes from
+its manifest). A blocking stage cannot be interrupted: it receives the task, checks
+`task.cancel_event` between files/partitions and returns early, so it still `finished`.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Optional
+
+from PySide6.QtCore import QObject, QThread, Signal
+
+
+class Task(QObject):
+    progress = Signal(int, int)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, name: str, *, interruptible: bool, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.name = name
+        self.interruptible = interruptible
+        self.cancel_event = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._aio: Optional[asyncio.Task] = None
+
+    def report(self, done: int, total: int) -> None:
+        """Progress callback for pipeline functions; safe to call from any thread."""
+        self.progress.emit(done, total)
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self) -> None:
+        # Event first: a wrapper that has not recorded its asyncio task yet will see it
+        self.cancel_event.set()
+        aio, loop = self._aio, self._loop
+        if self.interruptible and aio is not None and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(aio.cancel)
+
+
+class _LoopThread(QThread):
+    def __init__(self, loop: asyncio.AbstractEventLoop, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.loop = loop
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+
+class TaskRunner(QObject):
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._loop = asyncio.new_event_loop()
+        self._thread = _LoopThread(self._loop, self)
+        self._lock = threading.Lock()
+        self._tasks: set[Task] = set()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def run_async(self, name: str, fn: Callable[[Task], Awaitable[Any]]) -> Task:
+        """Run the coroutine `fn(task)` on the loop; cancelling the task interrupts it."""
+        task = Task(name, interruptible=True)
+        return self._submit(task, lambda: fn(task))
+
+    def run_sync(self, name: str, fn: Callable[[Task], Any]) -> Task:
+        """Run the blocking `fn(task)` in the loop's thread pool; it polls `task.cancel_event`."""
+        task = Task(name, interruptible=False)
+        return self._submit(task, lambda: self._loop.run_in_executor(None, fn, task))
+
+    def _submit(self, task: Task, make: Callable[[], Awaitable[Any]]) -> Task:
+        async def wrapper() -> Any:
+            task._aio = asyncio.current_task()
+            if task.cancel_event.is_set():
+                raise asyncio.CancelledError
+            return await make()
+
+        task._loop = self._loop
+        with self._lock:
+            self._tasks.add(task)
+        fut = asyncio.run_coroutine_threadsafe(wrapper(), self._loop)
+        fut.add_done_callback(lambda f: self._done(task, f))
+        return task
+
+    def _done(self, task: Task, fut: Future) -> None:
+        with self._lock:
+            self._tasks.discard(task)
+        if fut.cancelled():
+            task.cancelled.emit()
+            return
+        exc = fut.exception()
+        if exc is not None:
+            task.failed.emit(f"{type(exc).__name__}: {exc}")
+        else:
+            task.finished.emit(fut.result())
+
+    def stop(self) -> None:
+        """Cancel every task, wait for running stages to return, then stop the loop."""
+        if not self._thread.isRunning():
+            return
+        with self._lock:
+            tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+
+        async def shutdown() -> None:
+            pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            await asyncio.gather(*pending, return_exceptions=True)
+            await self._loop.shutdown_default_executor()
+            self._loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop)
+        self._thread.wait()
+        self._loop.close()
@@ -1,17 +1,46 @@
 from __future__ import annotations
 
 import asyncio
+import re
 import time
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
 import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from ff14_dataset.io.http_cache import CacheMiss, ResponseCache
+from ff14_dataset.ingestion.ratelimit import RATE_LIMIT_SELECTION, RateLimitScheduler, RateLimitStatus
+
 
 AUTH_URL = "https://www.fflogs.com/oauth/token"
 GQL_URL = "https://www.fflogs.com/api/v2/client"
 
+# FF Logs class/spec names (FFXIV uses the job name for both)
+FFLOGS_CLASS_BY_JOB: Dict[str, str] = {
+    "PLD": "Paladin",
+    "WAR": "Warrior",
+    "DRK": "DarkKnight",
+    "GNB": "Gunbreaker",
+    "WHM": "WhiteMage",
+    "SCH": "Scholar",
+    "AST": "Astrologian",
+    "SGE": "Sage",
+    "MNK": "Monk",
+    "DRG": "Dragoon",
+    "NIN": "Ninja",
+    "SAM": "Samurai",
+    "RPR": "Reaper",
+    "VPR": "Viper",
+    "BRD": "Bard",
+    "MCH": "Machinist",
+    "DNC": "Dancer",
+    "BLM": "BlackMage",
+    "SMN": "Summoner",
+    "RDM": "RedMage",
+    "PCT": "Pictomancer",
+}
+
 
 @dataclass
 class FFLogsAuth:
@@ -21,12 +50,134 @@ class FFLogsAuth:
     token_expiry: float = 0.0
 
 
+@dataclass
+class GqlRequest:
+    """One sub-query for `FFLogsClient.gql_many`.
+
+    `selection` is a single top-level field (e.g. `reportData { report(code: $code) { ... } }`)
+    that may reference `$variables`; their GraphQL types go in `var_types`.
+    """
+
+    key: str
+    selection: str
+    variables: Dict[str, Any] = field(default_factory=dict)
+    var_types: Dict[str, str] = field(default_factory=dict)
+    cost: int = 1
+    cache_kind: Optional[str] = None
+
+
+@dataclass
+class GqlResult:
+    key: str
+    data: Optional[Dict[str, Any]]
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and self.data is not None
+
+
+_VAR_RE = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)")
+_FIELD_RE = re.compile(r"\s*([A-Za-z_][A-Za-z0-9_]*)")
+
+
+def chunk_requests(requests: Sequence[GqlRequest], max_cost: int, max_chars: int) -> List[List[GqlRequest]]:
+    """Greedily pack requests into batches bounded by total cost and selection size."""
+    batches: List[List[GqlRequest]] = []
+    cur: List[GqlRequest] = []
+    cost = chars = 0
+    for r in requests:
+        size = len(r.selection)
+        if cur and (cost + r.cost > max_cost or chars + size > max_chars):
+            batches.append(cur)
+            cur, cost, chars = [], 0, 0
+        cur.append(r)
+        cost += r.cost
+        chars += size
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def build_batch_query(requests: Sequence[GqlRequest]) -> tuple[str, Dict[str, Any], List[str]]:
+    """Merge sub-queries into one aliased document; returns (query, variables, aliases)."""
+    decls: List[str] = []
+    variables: Dict[str, Any] = {}
+    parts: List[str] = []
+    aliases: List[str] = []
+    for i, r in enumerate(requests):
+        alias = f"q{i}"
+        # Prefix variables per alias so identical names across sub-queries don't collide
+        sel = _VAR_RE.sub(lambda m, a=alias: f"${a}_{m.group(1)}", r.selection.strip())
+        for name, typ in r.var_types.items():
+            decls.append(f"${alias}_{name}: {typ}")
+            variables[f"{alias}_{name}"] = r.variables.get(name)
+        parts.append(f"{alias}: {sel}")
+        aliases.append(alias)
+    parts.append(RATE_LIMIT_SELECTION)
+    header = f"query({', '.join(decls)})" if decls else "query"
+    return header + " {\n" + "\n".join(parts) + "\n}", variables, aliases
+
+
+def split_batch_response(
+    requests: Sequence[GqlRequest], aliases: Sequence[str], payload: Dict[str, Any]
+) -> List[GqlResult]:
+    """Map an aliased response back to per-request results, isolating errors by alias path."""
+    data = payload.get("data") or {}
+    by_alias: Dict[str, List[Dict[str, Any]]] = {a: [] for a in aliases}
+    shared: List[Dict[str, Any]] = []
+    for err in payload.get("errors") or []:
+        path = err.get("path") or []
+        if path and path[0] in by_alias:
+            by_alias[path[0]].append(err)
+        else:
+            shared.append(err)
+
+    results: List[GqlResult] = []
+    for r, alias in zip(requests, aliases):
+        m = _FIELD_RE.match(r.selection)
+        top = m.group(1) if m else alias
+        value = data.get(alias)
+        errors = by_alias[alias] + shared
+        results.append(GqlResult(key=r.key, data={top: value} if value is not None else None, errors=errors))
+    return results
+
+
+def _retry_after_s(resp: httpx.Response) -> Optional[float]:
+    try:
+        return float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
 class FFLogsClient:
-    def __init__(self, client_id: str, client_secret: str, concurrency: int = 3, sleep_ms: int = 300):
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        concurrency: int = 3,
+        sleep_ms: int = 300,
+        max_concurrency: Optional[int] = None,
+        batch_max_cost: int = 50,
+        batch_max_chars: int = 50_000,
+        cache: Optional[ResponseCache] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
         self.auth = FFLogsAuth(client_id, client_secret)
-        self.semaphore = asyncio.Semaphore(concurrency)
-        self.sleep_ms = sleep_ms
-        self._client = httpx.AsyncClient(http2=True, timeout=60)
+        # concurrency and sleep_ms only seed the scheduler; rateLimitData and 429s drive it
+        # afterwards, growing concurrency up to max_concurrency while budget is left
+        self.scheduler = RateLimitScheduler(
+            max_concurrency=max(concurrency, max_concurrency or concurrency),
+            initial_concurrency=concurrency,
+            initial_rate_per_s=1000.0 / sleep_ms if sleep_ms > 0 else 10.0,
+        )
+        self.max_throttle_retries = 5
+        self.batch_max_cost = batch_max_cost
+        self.batch_max_chars = batch_max_chars
+        self.requests_sent = 0
+        self.cache = cache
+        # `transport` swaps the network for e.g. an httpx.MockTransport (tests, stub servers)
+        self._client = httpx.AsyncClient(http2=transport is None, timeout=60, transport=transport)
 
     async def close(self):
         await self._client.aclose()
@@ -43,22 +194,108 @@ class FFLogsClient:
         self.auth.access_token = data["access_token"]
         self.auth.token_expiry = time.time() + float(data.get("expires_in", 3600)) * 0.9
 
+    @property
+    def offline(self) -> bool:
+        return self.cache is not None and self.cache.offline
+
     async def _ensure_token(self) -> None:
+        if self.offline:
+            raise CacheMiss("offline mode: not requesting an FF Logs token")
         if not self.auth.access_token or time.time() > self.auth.token_expiry:
             await self._refresh_token()
 
-    async def _gql(self, query: str, variables: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    def rate_limit_status(self) -> RateLimitStatus:
+        return self.scheduler.status()
+
+    async def _post(self, query: str, variables: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        if self.offline:
+            raise CacheMiss("offline mode: not sending an FF Logs request")
         await self._ensure_token()
-        async with self.semaphore:
-            # gentle pacing
-            await asyncio.sleep(self.sleep_ms / 1000.0)
-            headers = {"Authorization": f"Bearer {self.auth.access_token}"}
-            resp = await self._client.post(GQL_URL, json={"query": query, "variables": variables or {}}, headers=headers)
+        for _ in range(self.max_throttle_retries + 1):
+            async with self.scheduler.slot():
+                headers = {"Authorization": f"Bearer {self.auth.access_token}"}
+                resp = await self._client.post(GQL_URL, json={"query": query, "variables": variables or {}}, headers=headers)
+                self.requests_sent += 1
+            if resp.status_code == 429:
+                self.scheduler.on_throttled(_retry_after_s(resp))
+                continue
             resp.raise_for_status()
-            data = resp.json()
-            if "errors" in data:
-                raise httpx.HTTPError(str(data["errors"]))
-            return data["data"]
+            payload = resp.json()
+            self.scheduler.on_success()
+            rl = (payload.get("data") or {}).get("rateLimitData")
+            if rl:
+                self.scheduler.observe(rl["limitPerHour"], rl["pointsSpentThisHour"], rl["pointsResetIn"])
+            return payload
+        resp.raise_for_status()
+        return resp.json()
+
+    async def refresh_rate_limit(self) -> RateLimitStatus:
+        """Query the current point budget explicitly (e.g. before starting a crawl)."""
+        await self._gql(f"query {{ {RATE_LIMIT_SELECTION} }}")
+        return self.scheduler.status()
+
+    def _cache_key(self, kind: Optional[str], query: str, variables: Dict[str, Any] | None) -> Optional[str]:
+        # Offline, every request is a cache lookup (uncached kinds simply miss)
+        if self.cache is None or not (self.offline or (kind is not None and self.cache.enabled_for(kind))):
+            return None
+        return ResponseCache.make_key(GQL_URL, query, variables)
+
+    async def _gql(
+        self, query: str, variables: Dict[str, Any] | None = None, cache_kind: Optional[str] = None
+    ) -> Dict[str, Any]:
+        key = self._cache_key(cache_kind, query, variables)
+        if key is not None:
+            hit = self.cache.get_json(key, cache_kind or "")
+            if hit is not None:
+                return hit
+        data = await self._post(query, variables)
+        if "errors" in data:
+            raise httpx.HTTPError(str(data["errors"]))
+        if key is not None:
+            self.cache.put_json(key, cache_kind, data["data"])
+        return data["data"]
+
+    async def gql_many(self, requests: Sequence[GqlRequest]) -> List[GqlResult]:
+        """Run many sub-queries as aliased batches (one POST per batch).
+
+        Results come back in input order. A failing sub-query only marks its own result
+        as errored; a transport failure marks every request of that batch. Sub-queries with
+        a `cache_kind` are served from the response cache when possible and only the misses
+        are sent.
+        """
+        cached: Dict[int, GqlResult] = {}
+        keys: Dict[int, str] = {}
+        pending: List[GqlRequest] = []
+        pending_idx: List[int] = []
+        for i, r in enumerate(requests):
+            key = self._cache_key(r.cache_kind, r.selection, r.variables)
+            hit = self.cache.get_json(key, r.cache_kind or "") if key is not None else None
+            if hit is not None:
+                cached[i] = GqlResult(key=r.key, data=hit)
+                continue
+            if key is not None:
+                keys[i] = key
+            pending.append(r)
+            pending_idx.append(i)
+
+        batches = chunk_requests(pending, self.batch_max_cost, self.batch_max_chars)
+
+        async def run(batch: List[GqlRequest]) -> List[GqlResult]:
+            query, variables, aliases = build_batch_query(batch)
+            try:
+                payload = await self._post(query, variables)
+            except httpx.HTTPError as e:
+                return [GqlResult(key=r.key, data=None, errors=[{"message": str(e)}]) for r in batch]
+            return split_batch_response(batch, aliases, payload)
+
+        fetched: List[GqlResult] = []
+        for res in await asyncio.gather(*(run(b) for b in batches)):
+            fetched.extend(res)
+        for i, res in zip(pending_idx, fetched):
+            cached[i] = res
+            if i in keys and res.ok:
+                self.cache.put_json(keys[i], requests[i].cache_kind, res.data)
+        return [cached[i] for i in range(len(requests))]
 
     # Placeholder queries (to be completed)
     async def list_reports(self, guild_id: Optional[str] = None, encounter_id: Optional[int] = None) -> Dict[str, Any]:
@@ -69,7 +306,7 @@ class FFLogsClient:
           }
         }
         """
-        return await self._gql(query, {"encounter": encounter_id})
+        return await self._gql(query, {"encounter": encounter_id}, cache_kind="zones")
 
     async def list_zones(self) -> Dict[str, Any]:
         query = """
@@ -84,4 +321,75 @@ class FFLogsClient:
           }
         }
         """
-        return await self._gql(query)
+        return await self._gql(query, cache_kind="zones")
+
+    async def fetch_report_fights(self, codes: Sequence[str]) -> Dict[str, GqlResult]:
+        """Fetch report metadata + fights for many reports in batched requests."""
+        selection = """
+        reportData {
+          report(code: $code) {
+            code
+            startTime
+            endTime
+            zone { id name }
+            fights { id encounterID name kill startTime endTime difficulty }
+          }
+        }
+        """
+        reqs = [
+            GqlRequest(key=c, selection=selection, variables={"code": c}, var_types={"code": "String"}, cache_kind="report")
+            for c in codes
+        ]
+        return {r.key: r for r in await self.gql_many(reqs)}
+
+    async def encounter_rankings(self, encounter_id: int, job: str, page: int = 1) -> Dict[str, Any]:
+        """Top character rankings for a job on an encounter (FF Logs JSON scalar)."""
+        cls = FFLOGS_CLASS_BY_JOB.get(job.upper(), job)
+        query = f"""
+        query($encounter: Int, $cls: String, $page: Int) {{
+          worldData {{
+            encounter(id: $encounter) {{
+              characterRankings(className: $cls, specName: $cls, page: $page)
+            }}
+          }}
+          {RATE_LIMIT_SELECTION}
+        }}
+        """
+        data = await self._gql(query, {"encounter": encounter_id, "cls": cls, "page": page}, cache_kind="rankings")
+        enc = (data.get("worldData") or {}).get("encounter") or {}
+        return enc.get("characterRankings") or {}
+
+    async def iter_event_pages(
+        self,
+        code: str,
+        fight_id: int,
+        start_time: float,
+        end_time: float,
+        *,
+        limit: int = 10000,
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], Optional[float]]]:
+        """Yield `(events, next_page_ts)` per page, following `nextPageTimestamp`.
+
+        Only one page is held in memory at a time; callers should persist each page
+        before pulling the next one.
+        """
+        query = f"""
+        query($code: String, $fights: [Int], $start: Float, $end: Float, $limit: Int) {{
+          reportData {{
+            report(code: $code) {{
+              events(fightIDs: $fights, startTime: $start, endTime: $end, limit: $limit, includeResources: true) {{
+                data
+                nextPageTimestamp
+              }}
+            }}
+          }}
+          {RATE_LIMIT_SELECTION}
+        }}
+        """
+        cursor: Optional[float] = start_time
+        while cursor is not None:
+            variables = {"code": code, "fights": [fight_id], "start": cursor, "end": end_time, "limit": limit}
+            data = await self._gql(query, variables, cache_kind="events")
+            page = data["reportData"]["report"]["events"]
+            cursor = page.get("nextPageTimestamp")
+            yield page.get("data") or [], cursor
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+"""SQLite manifest of ingestion work units for crash-safe, resumable crawls.
+
+A unit is one (report_code, fight_id). While its events are paginated the manifest keeps
+the next page cursor and the byte size of the raw file at that cursor, so a restarted run
+truncates any half-written page and continues from the last checkpoint.
+"""
+
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal, Optional, Set, Tuple
+
+
+UnitStatus = Literal["in_flight", "done"]
+
+
+@dataclass
+class UnitState:
+    report_code: str
+    fight_id: int
+    status: UnitStatus
+    next_page_ts: Optional[float]
+    bytes_written: int
+    events: int
+    path: str
+
+
+class IngestManifest:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._con = sqlite3.connect(str(path))
+        self._con.execute("PRAGMA journal_mode=WAL;")
+        self._con.execute("PRAGMA synchronous=NORMAL;")
+        self._con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS units (
+                report_code TEXT NOT NULL,
+                fight_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                next_page_ts REAL,
+                bytes_written INTEGER NOT NULL DEFAULT 0,
+                events INTEGER NOT NULL DEFAULT 0,
+                path TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (report_code, fight_id)
+            )
+            """
+        )
+        self._con.commit()
+
+    def close(self) -> None:
+        self._con.close()
+
+    def get(self, report_code: str, fight_id: int) -> Optional[UnitState]:
+        row = self._con.execute(
+            "SELECT report_code, fight_id, status, next_page_ts, bytes_written, events, path "
+            "FROM units WHERE report_code = ? AND fight_id = ?",
+            (report_code, fight_id),
+        ).fetchone()
+        return UnitState(*row) if row else None
+
+    def completed(self) -> Set[Tuple[str, int]]:
+        rows = self._con.execute("SELECT report_code, fight_id FROM units WHERE status = 'done'")
+        return {(code, int(fid)) for code, fid in rows}
+
+    def in_flight_paths(self) -> Set[str]:
+        return {row[0] for row in self._con.execute("SELECT path FROM units WHERE status = 'in_flight'")}
+
+    def start(self, report_code: str, fight_id: int, path: Path, start_ts: float) -> UnitState:
+        self._con.execute(
+            "INSERT OR REPLACE INTO units VALUES (?, ?, 'in_flight', ?, 0, 0, ?, ?)",
+            (report_code, fight_id, start_ts, str(path), time.time()),
+        )
+        self._con.commit()
+        return UnitState(report_code, fight_id, "in_flight", start_ts, 0, 0, str(path))
+
+    def checkpoint(
+        self, report_code: str, fight_id: int, next_page_ts: Optional[float], bytes_written: int, events: int
+    ) -> None:
+        """Record that everything before `next_page_ts` is durably in the first `bytes_written` bytes."""
+        self._con.execute(
+            "UPDATE units SET next_page_ts = ?, bytes_written = ?, events = ?, updated_at = ? "
+            "WHERE report_code = ? AND fight_id = ?",
+            (next_page_ts, bytes_written, events, time.time(), report_code, fight_id),
+        )
+        self._con.commit()
+
+    def complete(self, report_code: str, fight_id: int, bytes_written: int, events: int) -> None:
+        self._con.execute(
+            "UPDATE units SET status = 'done', next_page_ts = NULL, bytes_written = ?, events = ?, updated_at = ? "
+            "WHERE report_code = ? AND fight_id = ?",
+            (bytes_written, events, time.time(), report_code, fight_id),
+        )
+        self._con.commit()
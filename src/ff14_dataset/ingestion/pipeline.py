@@ -9,17 +9,28 @@ Responsibilities
 - Save raw JSON (events + metadata) partitioned by patch/encounter/job/report_date
 """
 
-from dataclasses import dataclass
+import asyncio
+import logging
+import os
+import shutil
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Callable, Dict, Iterable, Optional
 
 import orjson
 
 from ff14_dataset.config import Settings
-from ff14_dataset.io.storage import partition_path
+from ff14_dataset.ingestion.fflogs_client import FFLogsClient
+from ff14_dataset.ingestion.manifest import IngestManifest
+from ff14_dataset.io.http_cache import ResponseCache
+from ff14_dataset.io.ndjson import Compression, NdjsonAppender, ndjson_suffix
+from ff14_dataset.io.segments import SegmentStore, fight_ref
+from ff14_dataset.io.storage import ensure_paths, partition_path
 
 
+log = logging.getLogger(__name__)
+
 @dataclass
 class IngestionRequest:
     encounters: list[str]
@@ -27,6 +38,27 @@ class IngestionRequest:
     jobs: list[str]
     min_percentile: int
     kills_only: bool
+    max_ranking_pages: int = 1
+
+
+@dataclass
+class FightUnit:
+    """One (report, fight) pair selected for download.
+
+    `job` is the first requested job that ranked the fight and decides where it is downloaded;
+    `jobs` lists every requested job that ranked it (the fight is placed under each).
+    """
+
+    report_code: str
+    fight_id: int
+    encounter_id: int
+    encounter_name: str
+    job: str
+    report_start_ms: int
+    start_time: float
+    end_time: float
+    kill: bool
+    jobs: list[str] = field(default_factory=list)
 
 
 def save_raw_json(base: Path, name: str, payload: dict) -> Path:
@@ -41,13 +73,250 @@ def compute_report_month(ts_ms: int) -> str:
     return f"{dt.year:04d}-{dt.month:02d}"
 
 
-async def ingest_encounters(settings: Settings, req: IngestionRequest) -> None:
-    """Skeleton: this will use FFLogsClient to pull reports/fights/events and save raw JSON.
-    Implementation intentionally omitted here (to be filled in subsequent steps).
+def client_from_env(settings: Settings) -> FFLogsClient:
+    client_id = os.getenv("FFLOGS_CLIENT_ID")
+    client_secret = os.getenv("FFLOGS_CLIENT_SECRET")
+    if not client_id or not client_secret:
+        raise RuntimeError("FFLOGS_CLIENT_ID/FFLOGS_CLIENT_SECRET are not set")
+    return FFLogsClient(
+        client_id,
+        client_secret,
+        concurrency=settings.ingestion.concurrency,
+        sleep_ms=settings.ingestion.sleep_ms,
+        max_concurrency=settings.ingestion.max_concurrency,
+        batch_max_cost=settings.ingestion.batch_max_cost,
+        cache=ResponseCache.from_settings(settings),
+    )
+
+
+async def resolve_encounters(client: FFLogsClient, encounters: Iterable[str]) -> list[tuple[int, str]]:
+    """Map encounter names or numeric IDs to `(encounter_id, encounter_name)`."""
+    zones = (await client.list_zones()).get("worldData", {}).get("zones", []) or []
+    by_id: Dict[int, str] = {}
+    by_name: Dict[str, int] = {}
+    for z in zones:
+        for e in z.get("encounters", []) or []:
+            by_id[int(e["id"])] = e.get("name") or str(e["id"])
+            by_name[(e.get("name") or "").lower()] = int(e["id"])
+
+    out: list[tuple[int, str]] = []
+    for enc in encounters:
+        enc = str(enc).strip()
+        if enc.isdigit():
+            out.append((int(enc), by_id.get(int(enc), enc)))
+        elif enc.lower() in by_name:
+            out.append((by_name[enc.lower()], enc))
+    return out
+
+
+async def collect_fight_units(client: FFLogsClient, req: IngestionRequest) -> list[FightUnit]:
+    """Select fights from encounter rankings, then fetch their boundaries in batched queries."""
+    # One download per fight, remembering every job that ranked it
+    picks: Dict[tuple[str, int], tuple[int, str, list[str]]] = {}
+    for enc_id, enc_name in await resolve_encounters(client, req.encounters):
+        for job in req.jobs:
+            for page in range(1, req.max_ranking_pages + 1):
+                ranking = await client.encounter_rankings(enc_id, job, page)
+                for r in ranking.get("rankings", []) or []:
+                    pct = r.get("rankPercent")
+                    if pct is not None and pct < req.min_percentile:
+                        continue
+                    rep = r.get("report") or {}
+                    if rep.get("code") and rep.get("fightID") is not None:
+                        jobs = picks.setdefault((rep["code"], int(rep["fightID"])), (enc_id, enc_name, []))[2]
+                        if job not in jobs:
+                            jobs.append(job)
+                if not ranking.get("hasMorePages"):
+                    break
+
+    reports = await client.fetch_report_fights(sorted({code for code, _ in picks}))
+    units: list[FightUnit] = []
+    for (code, fight_id), (enc_id, enc_name, jobs) in picks.items():
+        res = reports.get(code)
+        if res is None or not res.ok:
+            continue
+        report = res.data["reportData"]["report"] or {}
+        for f in report.get("fights", []) or []:
+            if int(f["id"]) != fight_id:
+                continue
+            if req.kills_only and not f.get("kill"):
+                break
+            units.append(
+                FightUnit(
+                    report_code=code,
+                    fight_id=fight_id,
+                    encounter_id=enc_id,
+                    encounter_name=enc_name,
+                    job=jobs[0],
+                    report_start_ms=int(report.get("startTime") or 0),
+                    start_time=float(f["startTime"]),
+                    end_time=float(f["endTime"]),
+                    kill=bool(f.get("kill")),
+                    jobs=list(jobs),
+                )
+            )
+            break
+    return units
+
+
+def fight_dir(settings: Settings, unit: FightUnit) -> Path:
+    month = compute_report_month(unit.report_start_ms)
+    return partition_path(settings, "raw", settings.app.game_patch, unit.encounter_name, unit.job, month)
+
+
+def place_fight(settings: Settings, unit: FightUnit, src: Path, store: Optional[SegmentStore] = None) -> list[Path]:
+    """Make a downloaded fight (`src`) appear under the raw partition of each of `unit.jobs`.
+
+    Files are hard-linked (copied where links are unsupported) next to a `.fight.json` naming
+    that job; in the segment store the fight is linked to the extra partitions. Idempotent.
+    """
+    if store is None and not src.exists():
+        return []  # raw file removed since it was downloaded
+    name = f"{unit.report_code}_{unit.fight_id}"
+    out: list[Path] = []
+    for job in unit.jobs or [unit.job]:
+        job_unit = replace(unit, job=job)
+        out_dir = fight_dir(settings, job_unit)
+        if store:
+            if out_dir != src.parent:
+                store.link_fight(out_dir, unit.report_code, unit.fight_id)
+            out.append(fight_ref(out_dir, unit.report_code, unit.fight_id))
+            continue
+        path = out_dir / src.name
+        if path != src:
+            if not path.exists() or path.stat().st_size != src.stat().st_size:
+                out_dir.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(path.name + ".tmp")
+                tmp.unlink(missing_ok=True)
+                try:
+                    os.link(src, tmp)
+                except OSError:
+                    shutil.copyfile(src, tmp)
+                os.replace(tmp, path)
+            save_raw_json(out_dir, f"{name}.fight", asdict(job_unit))
+        out.append(path)
+    return out
+
+
+async def stream_fight_events(
+    client: FFLogsClient,
+    unit: FightUnit,
+    out_path: Path,
+    compression: Compression = "none",
+    manifest: Optional[IngestManifest] = None,
+    store: Optional[SegmentStore] = None,
+) -> int:
+    """Download all event pages of a fight, appending each page to `out_path` as it arrives.
+
+    With a manifest, every page is checkpointed (cursor + file size) and an interrupted
+    unit resumes from its last cursor after dropping any partially written page. With a
+    segment store, `out_path` is the fight's `fight_ref` and pages go to the store instead.
     """
-    # Example of target path computation (placeholder values)
-    for enc in req.encounters or ["aac-cruiserweight-m4-savage"]:
-        report_month = "2025-01"
-        out = partition_path(settings, "raw", settings.app.game_patch, enc, req.jobs[0] if req.jobs else "SAM", report_month)
-        save_raw_json(out, "_placeholder_readme", {"note": "raw json files will be stored here"})
+    code, fid = unit.report_code, unit.fight_id
+    state = manifest.get(code, fid) if manifest else None
+    if state and state.status == "in_flight" and state.next_page_ts is not None and state.path == str(out_path):
+        cursor, size, written = state.next_page_ts, state.bytes_written, state.events
+    else:
+        cursor, size, written = unit.start_time, 0, 0
+        if manifest:
+            manifest.start(code, fid, out_path, cursor)
+
+    writer = (
+        store.appender(out_path.parent, code, fid) if store else NdjsonAppender(out_path, compression)
+    )
+    with writer as w:
+        w.truncate(size)
+        async for events, next_ts in client.iter_event_pages(code, fid, cursor, unit.end_time):
+            size = w.append(events)
+            written += len(events)
+            if manifest and next_ts is not None:
+                manifest.checkpoint(code, fid, next_ts, size, written)
+    if manifest:
+        manifest.complete(code, fid, size, written)
+    return written
+
+
+async def ingest_encounters(
+    settings: Settings,
+    req: IngestionRequest,
+    client: Optional[FFLogsClient] = None,
+    *,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> list[Path]:
+    """Pull ranked fights for the requested encounters/jobs and stream their events to raw NDJSON.
+
+    Each fight lands in its raw partition as `<report>_<fight>.ndjson[.zst]` next to a
+    `<report>_<fight>.fight.json` metadata file, or, with `ingestion.raw_layout: segments`,
+    in the partition's segment files with its metadata in the segment index (the returned
+    paths are then `fight_ref`s). Units already completed in the ingest manifest are
+    skipped; in-flight ones resume from their last page cursor, which also makes cancelling
+    the task safe. A fight ranked by several requested jobs is downloaded once and placed
+    under each job's partition (`place_fight`), including fights completed in earlier runs.
+    A fight that fails is logged and left in flight for the next run; the others still land
+    and only their paths are returned. `progress(done, total)` is called as fights finish.
+    """
+    own_client = client is None
+    client = client or client_from_env(settings)
+    compression = settings.ingestion.raw_compression
+    manifest = IngestManifest(ensure_paths(settings).manifest_file)
+    store = (
+        SegmentStore(ensure_paths(settings).raw, settings.ingestion.segment_max_mb * 1024 * 1024)
+        if settings.ingestion.raw_layout == "segments"
+        else None
+    )
+    try:
+        done = manifest.completed()
+        units: list[FightUnit] = []
+        placed: list[Path] = []
+        for u in await collect_fight_units(client, req):
+            if (u.report_code, u.fight_id) in done:
+                placed += place_fight(settings, u, Path(manifest.get(u.report_code, u.fight_id).path), store)
+            else:
+                units.append(u)
+        # Bound fights in flight: each one holds at most one page in memory
+        sem = asyncio.Semaphore(max(1, settings.ingestion.concurrency))
+        finished = 0
+        if progress:
+            progress(0, len(units))
+
+        async def run(unit: FightUnit) -> list[Path]:
+            nonlocal finished
+            try:
+                async with sem:
+                    out_dir = fight_dir(settings, unit)
+                    name = f"{unit.report_code}_{unit.fight_id}"
+                    if store:
+                        store.put_fight(out_dir, unit.report_code, unit.fight_id, asdict(unit))
+                        path = fight_ref(out_dir, unit.report_code, unit.fight_id)
+                    else:
+                        save_raw_json(out_dir, f"{name}.fight", asdict(unit))
+                        path = out_dir / f"{name}{ndjson_suffix(compression)}"
+                    await stream_fight_events(client, unit, path, compression, manifest, store)
+                return place_fight(settings, unit, path, store)
+            finally:
+                finished += 1
+                if progress:
+                    progress(finished, len(units))
+
+        # Every fight runs to completion before the finally below closes the shared handles
+        results = await asyncio.gather(*(run(u) for u in units), return_exceptions=True)
+        for unit, res in zip(units, results):
+            if isinstance(res, BaseException):
+                if not isinstance(res, Exception):
+                    raise res
+                log.warning(
+                    "fight %s#%d failed, it resumes on the next run: %r",
+                    unit.report_code,
+                    unit.fight_id,
+                    res,
+                )
+                continue
+            placed += res
+        return placed
+    finally:
+        manifest.close()
+        if store:
+            store.close()
+        if own_client:
+            await client.close()
 
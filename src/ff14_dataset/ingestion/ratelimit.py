@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+"""Adaptive request pacing driven by FF Logs `rateLimitData` and HTTP 429 responses.
+
+The scheduler is a token bucket whose refill rate is derived from the points left in the
+current hourly window, combined with an AIMD concurrency limit: starting from
+`initial_concurrency`, it grows up to `max_concurrency` while budget is plentiful and shrinks
+when the budget runs low or the API throttles us.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+
+RATE_LIMIT_SELECTION = "rateLimitData { limitPerHour pointsSpentThisHour pointsResetIn }"
+
+
+@dataclass
+class RateLimitStatus:
+    rate_per_s: float
+    concurrency: int
+    inflight: int
+    limit_per_hour: Optional[float]
+    remaining_points: Optional[float]
+    reset_in_s: Optional[float]
+    points_per_request: float
+    paused_for_s: float
+
+
+class RateLimitScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = 3,
+        initial_concurrency: Optional[int] = None,
+        initial_rate_per_s: float = 3.0,
+        min_rate_per_s: float = 0.05,
+        max_rate_per_s: float = 20.0,
+        low_budget_ratio: float = 0.15,
+        burst: float = 3.0,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_rate_per_s = min_rate_per_s
+        self.max_rate_per_s = max_rate_per_s
+        self.low_budget_ratio = low_budget_ratio
+        self.burst = burst
+
+        self._rate = min(max(initial_rate_per_s, min_rate_per_s), max_rate_per_s)
+        start = self.max_concurrency if initial_concurrency is None else initial_concurrency
+        self._concurrency = min(max(1, start), self.max_concurrency)
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._inflight = 0
+        self._successes = 0
+
+        self._limit: Optional[float] = None
+        self._spent: Optional[float] = None
+        self._reset_at: Optional[float] = None
+        self._points_per_request = 1.0
+        self._requests_since_obs = 0
+
+        self._cond = asyncio.Condition()
+        self._bucket_lock = asyncio.Lock()
+
+    # --- monitoring ---------------------------------------------------------
+    @property
+    def current_rate(self) -> float:
+        return self._rate
+
+    @property
+    def remaining_points(self) -> Optional[float]:
+        if self._limit is None or self._spent is None:
+            return None
+        return max(0.0, self._limit - self._spent)
+
+    def status(self) -> RateLimitStatus:
+        now = time.monotonic()
+        return RateLimitStatus(
+            rate_per_s=self._rate,
+            concurrency=self._concurrency,
+            inflight=self._inflight,
+            limit_per_hour=self._limit,
+            remaining_points=self.remaining_points,
+            reset_in_s=max(0.0, self._reset_at - now) if self._reset_at is not None else None,
+            points_per_request=self._points_per_request,
+            paused_for_s=max(0.0, self._paused_until - now),
+        )
+
+    # --- acquisition --------------------------------------------------------
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._inflight < self._concurrency)
+            self._inflight += 1
+        try:
+            await self._take_token()
+            yield
+        finally:
+            async with self._cond:
+                self._inflight -= 1
+                self._cond.notify_all()
+
+    async def _take_token(self) -> None:
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self._rate)
+                self._last_refill = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    self._requests_since_obs += 1
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self._rate)
+
+    # --- feedback -----------------------------------------------------------
+    def observe(self, limit_per_hour: float, points_spent: float, reset_in_s: float) -> None:
+        """Feed a `rateLimitData` sample and retune rate/concurrency from it."""
+        now = time.monotonic()
+        if self._spent is not None and self._requests_since_obs > 0 and points_spent >= self._spent:
+            sample = (points_spent - self._spent) / self._requests_since_obs
+            # EMA keeps the per-request cost estimate stable across uneven query sizes
+            self._points_per_request = max(0.01, 0.7 * self._points_per_request + 0.3 * sample)
+        self._requests_since_obs = 0
+        self._limit = float(limit_per_hour)
+        self._spent = float(points_spent)
+        self._reset_at = now + max(0.0, float(reset_in_s))
+
+        remaining = max(0.0, self._limit - self._spent)
+        budget_rate = remaining / max(1.0, float(reset_in_s)) / self._points_per_request
+        ratio = remaining / self._limit if self._limit > 0 else 0.0
+        if ratio < self.low_budget_ratio:
+            # Scale down smoothly as the window empties instead of hitting the wall at zero
+            budget_rate *= ratio / self.low_budget_ratio
+            self._concurrency = max(1, self._concurrency - 1)
+        target = min(max(budget_rate, self.min_rate_per_s), self.max_rate_per_s)
+        self._rate = 0.5 * self._rate + 0.5 * target
+
+    def on_success(self) -> None:
+        self._successes += 1
+        remaining = self.remaining_points
+        healthy = remaining is None or (self._limit and remaining / self._limit > 2 * self.low_budget_ratio)
+        if healthy and self._successes >= self._concurrency * 4:
+            self._successes = 0
+            self._concurrency = min(self.max_concurrency, self._concurrency + 1)
+
+    def on_throttled(self, retry_after_s: Optional[float] = None) -> None:
+        """Back off after a 429: pause, halve the rate and the concurrency."""
+        pause = retry_after_s if retry_after_s is not None else max(1.0, 1.0 / self._rate)
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        self._rate = max(self.min_rate_per_s, self._rate / 2)
+        self._concurrency = max(1, self._concurrency // 2)
+        self._successes = 0
+        self._tokens = 0.0
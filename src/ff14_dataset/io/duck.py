@@ -1,18 +1,95 @@
 from __future__ import annotations
 
+"""DuckDB catalog over the partitioned data layers.
+
+Every table is a view over `<layer>/<game_patch>/<encounter>/<job>/report_date=YYYY-MM/` files
+read with `hive_partitioning=true`; `game_patch`, `encounter_name` and `job` are derived from
+the file path, so predicates on any of the four partition columns prune files before any
+footer is read (DuckDB pushes filters on `filename` expressions into the file list).
+
+Summary tables are materialized per source file and refreshed incrementally: a bookkeeping
+table remembers each file's size/mtime, and a refresh only deletes and re-inserts the rows of
+files that were added, changed or removed.
+
+`PagedQuery` serves the GUI preview: row-addressable access to a filtered view that only
+ever holds a few pages in memory, so fights with millions of events browse without loading
+the table.
+"""
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Mapping, Optional
+
 import duckdb
 
 from ff14_dataset.config import Settings
 from ff14_dataset.io.storage import ensure_paths
 
 
+PARTITION_GLOB = "*/*/*/report_date=*"
+_PATH_PART = {"game_patch": -5, "encounter_name": -4, "job": -3}  # split_part index in a file path
+
+
+@dataclass(frozen=True)
+class CatalogTable:
+    layer: str  # raw | staging | curated
+    pattern: str  # file name pattern inside a partition
+    reader: str = "read_parquet"
+    # path-derived columns to add (skip ones the files carry themselves)
+    path_columns: tuple[str, ...] = ("game_patch", "encounter_name", "job")
+
+
+TABLES: dict[str, CatalogTable] = {
+    "events": CatalogTable("staging", "*.parquet"),
+    "ticks": CatalogTable("curated", "*.ticks.parquet"),
+    "labels": CatalogTable("curated", "*.labels.parquet"),
+    # metrics.job is the actor's job; fights carry encounter_name/job from the ingest request
+    "metrics": CatalogTable("curated", "metrics_fight_job.parquet", path_columns=("game_patch", "encounter_name")),
+    "fights": CatalogTable("raw", "*.fight.json", reader="read_json_auto", path_columns=("game_patch",)),
+}
+
+# View name -> query over registered views
+DERIVED_VIEWS: dict[str, str] = {
+    "participants": "SELECT game_patch, encounter_name, job, report_date, report_id, fight_id, actor_id "
+    "FROM metrics",
+}
+
+# Summary name -> (source table, aggregate over `src`; grouped per source file via GROUP BY ALL)
+SUMMARIES: dict[str, tuple[str, str]] = {
+    "fight_summary": (
+        "events",
+        "SELECT game_patch, encounter_name, job, report_date, report_id, fight_id, "
+        "count(*) AS events, max(fight_ts_ms) AS duration_ms, count(DISTINCT source_id) AS actors, "
+        "sum(amount) FILTER (WHERE event_type = 'damage') AS damage, "
+        "count(*) FILTER (WHERE event_type = 'death') AS deaths, _file FROM src GROUP BY ALL",
+    ),
+    "job_summary": (
+        "metrics",
+        "SELECT game_patch, encounter_name, report_date, job, count(*) AS parses, "
+        "median(rDPS) AS rdps_median, quantile_cont(rDPS, 0.9) AS rdps_p90, "
+        "avg(gcd_uptime_pct) AS gcd_uptime_avg, sum(deaths) AS deaths, _file FROM src GROUP BY ALL",
+    ),
+}
+
+
+# Unique sort key per view for keyset paging (`event_id`/`tick_id` are per-fight row indexes
+# in time order); other views are small and page by OFFSET over ORDER BY ALL
+PAGE_KEYS: dict[str, tuple[str, ...]] = {
+    "events": ("report_id", "fight_id", "event_id"),
+    "ticks": ("report_id", "fight_id", "actor_id", "tick_id"),
+    "labels": ("report_id", "fight_id", "actor_id", "tick_id"),
+}
+
+
 def connect_duck(settings: Settings) -> duckdb.DuckDBPyConnection:
     paths = ensure_paths(settings)
     con = duckdb.connect(str(paths.duckdb_file))
-    # Suggested pragmas for local analytics
-    con.execute("PRAGMA threads=auto;")
-    con.execute("PRAGMA memory_limit='60%';")
+    # Local analytics: threads default to all cores; cap memory at ~60% of RAM where known
+    if hasattr(os, "sysconf") and "SC_PHYS_PAGES" in os.sysconf_names:
+        ram_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+        con.execute(f"SET memory_limit = '{int(ram_mb * 0.6)}MiB'")
     return con
 
 
@@ -20,3 +97,223 @@ def register_parquet_view(con: duckdb.DuckDBPyConnection, name: str, glob_path:
     # Glob path should be like /.../staging/**.parquet
     con.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM parquet_scan('{glob_path.as_posix()}');")
 
+
+def _sql_str(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+
+def _sql_ident(s: str) -> str:
+    return '"' + s.replace('"', '""') + '"'
+
+
+def _scan_sql(table: CatalogTable, files: str | list[str]) -> str:
+    """SELECT over `files` (glob or list) with the four partition columns attached."""
+    src = _sql_str(files) if isinstance(files, str) else "[" + ", ".join(_sql_str(f) for f in files) + "]"
+    opts = "hive_partitioning = true, filename = true"
+    if table.reader == "read_parquet":
+        opts += ", union_by_name = true"  # ticks columns differ per job layout
+    derived = "".join(f"split_part(filename, '/', {_PATH_PART[c]}) AS {c}, " for c in table.path_columns)
+    return f"SELECT * EXCLUDE (filename), {derived}filename AS _file FROM {table.reader}({src}, {opts})"
+
+
+class DuckCatalog:
+    """Registers every layer as pruned views and maintains incremental summary tables."""
+
+    def __init__(self, settings: Settings, con: Optional[duckdb.DuckDBPyConnection] = None):
+        self.settings = settings
+        self.paths = ensure_paths(settings)
+        self.con = con or connect_duck(settings)
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS _catalog_files ("
+            "summary VARCHAR, path VARCHAR, size BIGINT, mtime_ns BIGINT, PRIMARY KEY (summary, path))"
+        )
+
+    def _root(self, table: CatalogTable) -> Path:
+        return getattr(self.paths, table.layer)
+
+    def files(self, name: str) -> list[Path]:
+        table = TABLES[name]
+        return sorted(self._root(table).glob(f"{PARTITION_GLOB}/{table.pattern}"))
+
+    def glob(self, name: str) -> str:
+        table = TABLES[name]
+        return (self._root(table) / PARTITION_GLOB / table.pattern).as_posix()
+
+    def register_all(self) -> list[str]:
+        """(Re)create a view per table that has files, then the derived views; returns names."""
+        registered = []
+        for name, table in TABLES.items():
+            if not self.files(name):
+                continue
+            scan = _scan_sql(table, self.glob(name))
+            self.con.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * EXCLUDE (_file) FROM ({scan})")
+            registered.append(name)
+        for name, sql in DERIVED_VIEWS.items():
+            try:
+                self.con.execute(f"CREATE OR REPLACE VIEW {name} AS {sql}")
+                registered.append(name)
+            except duckdb.CatalogException:
+                continue  # source view not registered (no files yet)
+        return registered
+
+    def refresh_summary(self, name: str) -> tuple[int, int]:
+        """Bring a materialized summary up to date; returns (files re-read, files dropped)."""
+        source, agg = SUMMARIES[name]
+        table = TABLES[source]
+        current = {f.as_posix(): f.stat() for f in self.files(source)}
+        known = {
+            p: (size, mtime)
+            for p, size, mtime in self.con.execute(
+                "SELECT path, size, mtime_ns FROM _catalog_files WHERE summary = ?", [name]
+            ).fetchall()
+        }
+        exists = bool(
+            self.con.execute("SELECT 1 FROM information_schema.tables WHERE table_name = ?", [name]).fetchone()
+        )
+        if not exists:
+            self.con.execute("DELETE FROM _catalog_files WHERE summary = ?", [name])
+            known = {}
+        stale = [p for p in known if p not in current or known[p] != (current[p].st_size, current[p].st_mtime_ns)]
+        todo = [p for p, st in current.items() if known.get(p) != (st.st_size, st.st_mtime_ns)]
+
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            if stale and exists:
+                self.con.execute(f"DELETE FROM {name} WHERE _file IN (SELECT unnest(?))", [stale])
+            if todo:
+                query = f"WITH src AS ({_scan_sql(table, todo)}) {agg}"
+                if exists:
+                    self.con.execute(f"INSERT INTO {name} BY NAME {query}")
+                else:
+                    self.con.execute(f"CREATE TABLE {name} AS {query}")
+            self.con.execute(
+                "DELETE FROM _catalog_files WHERE summary = ? AND path IN (SELECT unnest(?))", [name, stale + todo]
+            )
+            if todo:
+                self.con.executemany(
+                    "INSERT INTO _catalog_files VALUES (?, ?, ?, ?)",
+                    [(name, p, current[p].st_size, current[p].st_mtime_ns) for p in todo],
+                )
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+        return len(todo), len([p for p in stale if p not in current])
+
+    def refresh_summaries(self) -> dict[str, tuple[int, int]]:
+        return {name: self.refresh_summary(name) for name, (source, _) in SUMMARIES.items() if self.files(source)}
+
+    def close(self) -> None:
+        self.con.close()
+
+
+def view_columns(con: duckdb.DuckDBPyConnection, view: str) -> list[str]:
+    return [r[0] for r in con.execute(f"DESCRIBE {_sql_ident(view)}").fetchall()]
+
+
+class PagedQuery:
+    """Rows of `SELECT * FROM view WHERE ... ORDER BY key`, by position, a page at a time.
+
+    `filters` become `column = ?` predicates (on partition columns they prune files before
+    any is opened) and `where` is ANDed in as raw SQL. With a unique key, the page after or
+    before a cached one seeks from that page's last/first key (one LIMIT query, whatever the
+    depth); a jump to an uncached page uses LIMIT/OFFSET. At most `max_pages` pages are kept.
+    """
+
+    def __init__(
+        self,
+        con: duckdb.DuckDBPyConnection,
+        view: str,
+        *,
+        filters: Optional[Mapping[str, Any]] = None,
+        where: str = "",
+        key: Optional[tuple[str, ...]] = None,
+        page_rows: int = 500,
+        max_pages: int = 16,
+    ):
+        self.con = con
+        self.view = view
+        self.page_rows = page_rows
+        self.max_pages = max_pages
+        self.columns = view_columns(con, view)
+        key = PAGE_KEYS.get(view, ()) if key is None else key
+        self.key = tuple(key) if set(key) <= set(self.columns) else ()
+        self._key_idx = [self.columns.index(k) for k in self.key]
+
+        preds, self._params = [], []
+        for col, value in (filters or {}).items():
+            if col not in self.columns:
+                raise ValueError(f"{view} has no column {col!r}")
+            preds.append(f"{_sql_ident(col)} = ?")
+            self._params.append(value)
+        if where.strip():
+            preds.append(f"({where})")
+        self._where = " AND ".join(preds)
+        self._count: Optional[int] = None
+        self._pages: OrderedDict[int, list[tuple]] = OrderedDict()
+
+    def __len__(self) -> int:
+        if self._count is None:
+            sql = f"SELECT count(*) FROM {_sql_ident(self.view)}" + (f" WHERE {self._where}" if self._where else "")
+            self._count = self.con.execute(sql, self._params).fetchone()[0]
+        return self._count
+
+    def row(self, i: int) -> tuple:
+        page, offset = divmod(i, self.page_rows)
+        return self.page(page)[offset]
+
+    def page(self, n: int) -> list[tuple]:
+        rows = self._pages.get(n)
+        if rows is None:
+            rows = self._pages[n] = self._fetch(n)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(n)
+        return rows
+
+    def _bound(self, row: tuple) -> Optional[list]:
+        bound = [row[i] for i in self._key_idx]
+        return None if any(v is None for v in bound) else bound
+
+    def _fetch(self, n: int) -> list[tuple]:
+        prev, nxt = self._pages.get(n - 1), self._pages.get(n + 1)
+        if self.key and prev and len(prev) == self.page_rows and (bound := self._bound(prev[-1])):
+            return self._seek(bound, descending=False)
+        if self.key and nxt and (bound := self._bound(nxt[0])):
+            return self._seek(bound, descending=True)[::-1]
+        return self._select("", [], descending=False, offset=n * self.page_rows)
+
+    def _seek(self, bound: list, *, descending: bool) -> list[tuple]:
+        """Up to a page of rows after (before) key `bound`.
+
+        `key > bound` is split into ranges over successively shorter key prefixes: first the
+        rest of the same fight (`report_id = ? AND fight_id = ? AND event_id > ?`), then the
+        following fights of the report, and so on. Equalities on the leading columns let
+        min/max statistics skip every other file, and usually the first range fills the page.
+        """
+        op = "<" if descending else ">"
+        rows: list[tuple] = []
+        for depth in reversed(range(len(self.key))):
+            preds = [f"{_sql_ident(k)} = ?" for k in self.key[:depth]]
+            preds.append(f"{_sql_ident(self.key[depth])} {op} ?")
+            rows += self._select(
+                " AND ".join(preds), bound[: depth + 1], descending=descending, limit=self.page_rows - len(rows)
+            )
+            if len(rows) == self.page_rows:
+                break
+        return rows
+
+    def _select(
+        self, seek: str, bound: list, *, descending: bool, offset: int = 0, limit: Optional[int] = None
+    ) -> list[tuple]:
+        where = " AND ".join(p for p in (self._where, seek) if p)
+        direction = " DESC" if descending else ""
+        order = ", ".join(_sql_ident(k) + direction for k in self.key) if self.key else "ALL"
+        sql = (
+            f"SELECT * FROM {_sql_ident(self.view)}"
+            + (f" WHERE {where}" if where else "")
+            + f" ORDER BY {order} LIMIT {limit or self.page_rows}"
+            + (f" OFFSET {offset}" if offset else "")
+        )
+        return self.con.execute(sql, [*self._params, *bound]).fetchall()
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+"""Persistent HTTP response cache shared by the FF Logs client and the Job Guide scraper.
+
+Entries are addressed by a SHA-256 of (url, query, variables) and stored as blobs under
+`<data_root>/<cache dir>/ab/<key>`, with a small SQLite index for TTL and LRU eviction.
+TTLs are per request kind: `None` keeps an entry forever (report data is immutable once
+uploaded) and `0` disables caching for that kind.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import orjson
+
+from ff14_dataset.config import Settings
+
+
+DEFAULT_TTL_S: Dict[str, Optional[float]] = {
+    "zones": 24 * 3600,
+    "rankings": 3600,
+    "report": None,
+    "events": 0,
+    "jobguide": 7 * 24 * 3600,
+}
+
+
+class CacheMiss(LookupError):
+    """Raised in offline mode when a response is not in the cache."""
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int = 2 * 1024**3,
+        ttl_s: Optional[Dict[str, Optional[float]]] = None,
+        offline: bool = False,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_s = {**DEFAULT_TTL_S, **(ttl_s or {})}
+        self.offline = offline
+        root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(str(root / "index.sqlite"), check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL;")
+        self._con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at)")
+        self._con.commit()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> Optional["ResponseCache"]:
+        cfg = settings.cache
+        if not cfg.enabled:
+            return None
+        offline = cfg.offline or os.getenv("FF14DS_OFFLINE", "") in ("1", "true", "yes")
+        return cls(
+            settings.paths.data_root / cfg.dir,
+            max_bytes=int(cfg.max_mb) * 1024**2,
+            ttl_s=cfg.ttl_s,
+            offline=offline,
+        )
+
+    @staticmethod
+    def make_key(url: str, query: Optional[str] = None, variables: Optional[Dict[str, Any]] = None) -> str:
+        blob = orjson.dumps({"u": url, "q": query, "v": variables or {}}, option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(blob).hexdigest()
+
+    def enabled_for(self, kind: str) -> bool:
+        return self.ttl_s.get(kind, 0) != 0
+
+    def _blob_path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str, kind: str) -> Optional[bytes]:
+        """Return the cached body, or None on miss/expiry (CacheMiss when offline)."""
+        now = time.time()
+        with self._lock:
+            row = self._con.execute("SELECT created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            ttl = self.ttl_s.get(kind, 0)
+            fresh = row is not None and (ttl is None or now - row[0] <= ttl)
+            # Offline mode serves stale entries too: anything is better than nothing
+            if row is not None and (fresh or self.offline):
+                try:
+                    data = self._blob_path(key).read_bytes()
+                except FileNotFoundError:
+                    self._con.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._con.commit()
+                else:
+                    self._con.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._con.commit()
+                    return data
+        if self.offline:
+            raise CacheMiss(f"offline mode: no cached response for {kind} ({key[:12]})")
+        return None
+
+    def put(self, key: str, kind: str, data: bytes) -> None:
+        if not self.enabled_for(kind):
+            return
+        p = self._blob_path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, p)
+        now = time.time()
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", (key, kind, len(data), now, now)
+            )
+            self._con.commit()
+            self._evict()
+
+    def _evict(self) -> None:
+        (total,) = self._con.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+        for key, size in self._con.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            self._blob_path(key).unlink(missing_ok=True)
+            self._con.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._con.commit()
+
+    def get_json(self, key: str, kind: str) -> Optional[Any]:
+        data = self.get(key, kind)
+        return orjson.loads(data) if data is not None else None
+
+    def put_json(self, key: str, kind: str, value: Any) -> None:
+        self.put(key, kind, orjson.dumps(value))
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+"""Append-only NDJSON writer (plain or zstd) used to stream event pages to disk."""
+
+import io
+from pathlib import Path
+from typing import Iterable, Literal, Optional
+
+import orjson
+
+try:  # optional: only needed for compressed raw files
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+
+Compression = Literal["none", "zstd"]
+
+
+def ndjson_suffix(compression: Compression) -> str:
+    return ".ndjson.zst" if compression == "zstd" else ".ndjson"
+
+
+def encode_ndjson(records: Iterable[dict]) -> bytes:
+    return b"".join(orjson.dumps(r) + b"\n" for r in records)
+
+
+class NdjsonAppender:
+    """Append batches of records to an NDJSON file, one flush per batch.
+
+    With zstd every batch is written as an independent frame; concatenated frames are a
+    valid zstd stream, so a file can be extended (or truncated at a frame boundary and
+    resumed) without rewriting earlier pages.
+    """
+
+    def __init__(self, path: Path, compression: Compression = "none", level: int = 3):
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        self.path = path
+        self.compression = compression
+        self._compressor = zstandard.ZstdCompressor(level=level) if compression == "zstd" else None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(path, "ab")
+
+    def append(self, records: Iterable[dict]) -> int:
+        """Write one batch and flush it; returns the file size afterwards."""
+        data = encode_ndjson(records)
+        if data:
+            if self._compressor is not None:
+                data = self._compressor.compress(data)
+            self._fh.write(data)
+            self._fh.flush()
+        return self._fh.tell()
+
+    def truncate(self, size: int) -> None:
+        self._fh.truncate(size)
+        self._fh.seek(size)
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self) -> "NdjsonAppender":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def open_ndjson_reader(path: Path, compression: Optional[Compression] = None):
+    """Binary line iterator over a plain or zstd NDJSON file."""
+    if compression is None:
+        compression = "zstd" if path.name.endswith(".zst") else "none"
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("reading .zst files requires the 'zstandard' package")
+        raw = open(path, "rb")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True))
+    return open(path, "rb")
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+"""Indexed, columnar view of an action preset (`config/presets/actions-*.json`).
+
+`ActionCatalog` keeps the preset records as one Polars frame (one row per job x action;
+role actions repeat under every job) and builds hash indexes from a key value to its row
+positions on first use: by `id`, `name_en`, `job_abbr`, tag and `cooldown_group`, plus
+`(job_abbr, value)` composites for per-job lookups. Catalogs are memoized per process and
+preset file version, so every stage shares one parsed copy.
+
+Bulk id -> attribute lookups over events should join against `catalog.lookup(...)`;
+the indexes serve per-action questions (which jobs have id X, which ids carry tag Y).
+
+`ff14ds-cli compile-presets` writes each preset as uncompressed Arrow IPC to
+`<presets_dir>/_compiled/<stem>.arrow` plus `<stem>.meta.json` (format version, source
+size/mtime/sha256, preset header). `load_catalog` memory-maps a compiled file whose source
+still matches instead of parsing the JSON, so pool workers share one page-cached copy.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Hashable, Iterable, Optional
+
+import orjson
+import polars as pl
+
+
+# Typed where inference fails (all-empty lists come out as List(Null))
+RECORD_SCHEMA: dict[str, pl.DataType] = {
+    "id": pl.Int64,
+    "job_id": pl.Int64,
+    "job_abbr": pl.Utf8,
+    "name": pl.Utf8,
+    "name_en": pl.Utf8,
+    "category": pl.Utf8,
+    "is_gcd": pl.Boolean,
+    "base_recast_ms": pl.Int64,
+    "base_cast_ms": pl.Int64,
+    "charges_max": pl.Int64,
+    "cooldown_group": pl.Int64,
+    "status_ids_applied": pl.List(pl.Int64),
+    "pvp": pl.Boolean,
+    "icon": pl.Utf8,
+    "aliases": pl.List(pl.Utf8),
+    "tags": pl.List(pl.Utf8),
+}
+COMPILED_DIR = "_compiled"
+COMPILED_FORMAT = 1
+
+
+class ActionCatalog:
+    __slots__ = ("frame", "meta", "_indexes")
+
+    def __init__(self, frame: pl.DataFrame, meta: Optional[dict] = None):
+        self.frame = frame
+        self.meta = meta or {}  # preset header: schema, game_patch, language, generated_at
+        self._indexes: dict[str, dict[Hashable, tuple[int, ...]]] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], meta: Optional[dict] = None) -> "ActionCatalog":
+        records = list(records)
+        keys = dict.fromkeys(k for r in records for k in r)
+        schema = {k: RECORD_SCHEMA.get(k) for k in keys}
+        frame = pl.DataFrame(
+            records, schema_overrides={k: t for k, t in schema.items() if t is not None}
+        )
+        return cls(frame, meta)
+
+    @classmethod
+    def from_json(cls, path: Path) -> "ActionCatalog":
+        doc = orjson.loads(path.read_bytes())
+        return cls.from_records(
+            doc.get("records", []), {k: v for k, v in doc.items() if k != "records"}
+        )
+
+    def __len__(self) -> int:
+        return self.frame.height
+
+    # -- indexes -------------------------------------------------------------------------
+
+    def index(self, column: str, *, by_job: bool = False) -> dict[Hashable, tuple[int, ...]]:
+        """Value -> row positions for `column` (list columns index every element).
+
+        With `by_job` the keys are `(job_abbr, value)` pairs, so per-job lookups are one probe.
+        """
+        name = f"{column}@job_abbr" if by_job else column
+        idx = self._indexes.get(name)
+        if idx is None:
+            acc: dict[Hashable, list[int]] = {}
+            if column in self.frame.columns:
+                values = self.frame[column].to_list()
+                is_list = isinstance(self.frame.schema[column], pl.List)
+                jobs = self.frame["job_abbr"].to_list() if by_job else None
+                for i, v in enumerate(values):
+                    for x in (v or ()) if is_list else (v,):
+                        acc.setdefault((jobs[i], x) if jobs is not None else x, []).append(i)
+            idx = self._indexes[name] = {k: tuple(v) for k, v in acc.items()}
+        return idx
+
+    def rows(self, column: str, value: Hashable, job: Optional[str] = None) -> tuple[int, ...]:
+        if job is None:
+            return self.index(column).get(value, ())
+        return self.index(column, by_job=True).get((job, value), ())
+
+    def select(self, rows: Iterable[int]) -> pl.DataFrame:
+        return self.frame[list(rows)]
+
+    def records(self, rows: Optional[Iterable[int]] = None) -> list[dict[str, Any]]:
+        return (self.frame if rows is None else self.select(rows)).to_dicts()
+
+    # -- lookups -------------------------------------------------------------------------
+
+    def by_id(self, action_id: int, job: Optional[str] = None) -> list[dict[str, Any]]:
+        return self.records(self.rows("id", action_id, job))
+
+    def by_name(self, name_en: str, job: Optional[str] = None) -> list[dict[str, Any]]:
+        return self.records(self.rows("name_en", name_en, job))
+
+    def job(self, job: str) -> pl.DataFrame:
+        return self.select(self.index("job_abbr").get(job, ()))
+
+    def jobs_of(self, action_id: int) -> set[str]:
+        job_abbr = self.frame["job_abbr"]
+        return {job_abbr[i] or "" for i in self.index("id").get(action_id, ())}
+
+    def ids_with_tag(
+        self, tag: str, job: Optional[str] = None, *, pvp: bool = False
+    ) -> tuple[int, ...]:
+        rows = self.rows("tags", tag, job)
+        if not pvp and "pvp" in self.frame.columns:
+            is_pvp = self.frame["pvp"]
+            rows = tuple(i for i in rows if not is_pvp[i])
+        ids = self.frame["id"]
+        return tuple(sorted({ids[i] for i in rows}))
+
+    def cooldown_group(self, group: int, job: Optional[str] = None) -> tuple[int, ...]:
+        ids = self.frame["id"]
+        return tuple(sorted({ids[i] for i in self.rows("cooldown_group", group, job)}))
+
+    def lookup(self, *columns: str, job: Optional[str] = None) -> pl.DataFrame:
+        """(id, *columns) table, one row per id, for joining onto events by `ability_id`."""
+        frame = self.job(job) if job is not None else self.frame
+        return frame.select("id", *columns).unique("id", keep="first", maintain_order=True)
+
+
+def compiled_paths(preset_path: Path) -> tuple[Path, Path]:
+    """(Arrow IPC file, meta sidecar) of a preset's compiled form."""
+    d = preset_path.parent / COMPILED_DIR
+    return d / f"{preset_path.stem}.arrow", d / f"{preset_path.stem}.meta.json"
+
+
+def source_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while chunk := fh.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def compiled_meta(preset_path: Path) -> Optional[dict]:
+    """Sidecar of a compiled preset that matches the current source, else None.
+
+    Size and mtime decide when they match; otherwise (copied or touched file) the source
+    hash does.
+    """
+    arrow, meta_path = compiled_paths(preset_path)
+    if not (arrow.exists() and meta_path.exists()):
+        return None
+    meta = orjson.loads(meta_path.read_bytes())
+    if meta.get("format") != COMPILED_FORMAT:
+        return None
+    st = preset_path.stat()
+    if (meta.get("source_size"), meta.get("source_mtime_ns")) == (st.st_size, st.st_mtime_ns):
+        return meta
+    return meta if meta.get("source_sha256") == source_hash(preset_path) else None
+
+
+def compile_preset(preset_path: Path, *, force: bool = False) -> tuple[Path, bool]:
+    """Write the compiled form of `preset_path`; returns (arrow path, whether it was rewritten)."""
+    arrow, meta_path = compiled_paths(preset_path)
+    if not force and compiled_meta(preset_path) is not None:
+        return arrow, False
+    st = preset_path.stat()
+    digest = source_hash(preset_path)
+    catalog = ActionCatalog.from_json(preset_path)
+    arrow.parent.mkdir(parents=True, exist_ok=True)
+    tmp = arrow.with_suffix(".arrow.tmp")
+    catalog.frame.rechunk().write_ipc(tmp, compression="uncompressed")
+    os.replace(tmp, arrow)
+    # Sidecar last: it only ever describes a complete Arrow file
+    meta = {
+        "format": COMPILED_FORMAT,
+        "source": preset_path.name,
+        "source_size": st.st_size,
+        "source_mtime_ns": st.st_mtime_ns,
+        "source_sha256": digest,
+        "rows": catalog.frame.height,
+        "header": catalog.meta,
+    }
+    tmp = meta_path.with_suffix(".json.tmp")
+    tmp.write_bytes(orjson.dumps(meta, option=orjson.OPT_INDENT_2))
+    os.replace(tmp, meta_path)
+    return arrow, True
+
+
+def compile_presets(presets_dir: Path, *, force: bool = False) -> list[tuple[Path, bool]]:
+    return [compile_preset(p, force=force) for p in sorted(presets_dir.glob("actions-*.json"))]
+
+
+@lru_cache(maxsize=8)
+def _cached_catalog(path: str, mtime_ns: int) -> ActionCatalog:
+    preset_path = Path(path)
+    meta = compiled_meta(preset_path)
+    if meta is not None:
+        frame = pl.read_ipc(compiled_paths(preset_path)[0], memory_map=True, rechunk=False)
+        return ActionCatalog(frame, meta.get("header"))
+    return ActionCatalog.from_json(preset_path)
+
+
+def load_catalog(preset_path: Path) -> ActionCatalog:
+    """Catalog of `preset_path`, memoized per process and file version (mtime).
+
+    Served from the memory-mapped compiled preset when it is up to date.
+    """
+    return _cached_catalog(str(preset_path), preset_path.stat().st_mtime_ns)
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+"""Raw segment store: zstd NDJSON segment files per partition plus an offset index.
+
+Instead of one raw file (and one `.fight.json`) per fight, event pages are appended as
+independent zstd frames to `seg-NNNNN.ndjson.zst` files in the raw partition, rolling over
+at `ingestion.segment_max_mb`. A SQLite index (`raw/_segments.sqlite`) records every frame as
+(report, fight, page) -> (segment, offset, length) together with the fight metadata, so a
+fight is read back by seeking straight to its frames, even while other fights were
+interleaved into the same segment. A fight downloaded once but needed under several job
+partitions is linked to the extra ones (`link_fight`) instead of being stored again.
+
+A frame is indexed only after it is flushed; bytes of frames that never got indexed (a
+crash mid-page) or that were dropped on resume stay in the segment but are never read.
+Elsewhere a stored fight is addressed by a virtual path `<partition>/<report>_<fight>.seg`
+(see `fight_ref`), which the manifest and the normalize index use like a raw file path.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+import orjson
+
+from ff14_dataset.io.ndjson import encode_ndjson, zstandard
+
+
+SEGMENT_PREFIX = "seg-"
+SEGMENT_SUFFIX = ".ndjson.zst"
+INDEX_FILE = "_segments.sqlite"
+FIGHT_REF_SUFFIX = ".seg"
+
+
+def is_segment(path: Path) -> bool:
+    return path.name.startswith(SEGMENT_PREFIX) and path.name.endswith(SEGMENT_SUFFIX)
+
+
+def fight_ref(partition: Path, report_code: str, fight_id: int) -> Path:
+    return partition / f"{report_code}_{fight_id}{FIGHT_REF_SUFFIX}"
+
+
+def is_fight_ref(path: Path) -> bool:
+    return path.suffix == FIGHT_REF_SUFFIX
+
+
+class SegmentStore:
+    def __init__(self, raw_root: Path, max_segment_bytes: int = 256 * 1024 * 1024, level: int = 3):
+        if zstandard is None:
+            raise RuntimeError("the raw segment store requires the 'zstandard' package")
+        self.root = raw_root
+        self.max_segment_bytes = max_segment_bytes
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._lock = threading.Lock()
+        self._open: dict[Path, tuple[Path, BinaryIO]] = {}
+        raw_root.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(str(raw_root / INDEX_FILE), check_same_thread=False)
+        self._con.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS fights (
+                report_code TEXT NOT NULL,
+                fight_id INTEGER NOT NULL,
+                partition TEXT NOT NULL,
+                meta BLOB NOT NULL,
+                PRIMARY KEY (report_code, fight_id)
+            );
+            CREATE TABLE IF NOT EXISTS frames (
+                report_code TEXT NOT NULL,
+                fight_id INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                events INTEGER NOT NULL,
+                PRIMARY KEY (report_code, fight_id, page)
+            );
+            CREATE TABLE IF NOT EXISTS fight_partitions (
+                report_code TEXT NOT NULL,
+                fight_id INTEGER NOT NULL,
+                partition TEXT NOT NULL,
+                PRIMARY KEY (report_code, fight_id, partition)
+            );
+            """
+        )
+        self._con.commit()
+
+    # -- writing -------------------------------------------------------------------------
+
+    def _segment_for(self, partition: Path) -> tuple[Path, BinaryIO]:
+        cur = self._open.get(partition)
+        if cur and cur[1].tell() < self.max_segment_bytes:
+            return cur
+        if cur:
+            cur[1].close()
+        partition.mkdir(parents=True, exist_ok=True)
+        existing = sorted(partition.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+        n = int(existing[-1].name[len(SEGMENT_PREFIX) :].split(".", 1)[0]) if existing else 0
+        path = partition / f"{SEGMENT_PREFIX}{n:05d}{SEGMENT_SUFFIX}"
+        if path.exists() and path.stat().st_size >= self.max_segment_bytes:
+            path = partition / f"{SEGMENT_PREFIX}{n + 1:05d}{SEGMENT_SUFFIX}"
+        fh = open(path, "ab")
+        self._open[partition] = (path, fh)
+        return path, fh
+
+    def put_fight(self, partition: Path, report_code: str, fight_id: int, meta: dict) -> None:
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO fights VALUES (?, ?, ?, ?)",
+                (report_code, fight_id, partition.relative_to(self.root).as_posix(), orjson.dumps(meta)),
+            )
+            self._con.commit()
+
+    def link_fight(self, partition: Path, report_code: str, fight_id: int) -> None:
+        """List a stored fight under one more partition as well (its frames are shared)."""
+        with self._lock:
+            self._con.execute(
+                "INSERT OR IGNORE INTO fight_partitions VALUES (?, ?, ?)",
+                (report_code, fight_id, partition.relative_to(self.root).as_posix()),
+            )
+            self._con.commit()
+
+    def append_page(self, partition: Path, report_code: str, fight_id: int, records: list[dict]) -> int:
+        """Append one page as a frame; returns the fight's indexed compressed bytes afterwards."""
+        if not records:
+            return self.fight_bytes(report_code, fight_id)
+        frame = self._compressor.compress(encode_ndjson(records))
+        with self._lock:
+            path, fh = self._segment_for(partition)
+            offset = fh.tell()
+            fh.write(frame)
+            fh.flush()
+            page = self._con.execute(
+                "SELECT COALESCE(MAX(page) + 1, 0) FROM frames WHERE report_code = ? AND fight_id = ?",
+                (report_code, fight_id),
+            ).fetchone()[0]
+            self._con.execute(
+                "INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (report_code, fight_id, page, path.relative_to(self.root).as_posix(), offset, len(frame), len(records)),
+            )
+            self._con.commit()
+        return self.fight_bytes(report_code, fight_id)
+
+    def truncate_fight(self, report_code: str, fight_id: int, keep_bytes: int) -> None:
+        """Forget the fight's frames beyond the first `keep_bytes` compressed bytes (resume)."""
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT page, length FROM frames WHERE report_code = ? AND fight_id = ? ORDER BY page",
+                (report_code, fight_id),
+            ).fetchall()
+            total, cut = 0, None
+            for page, length in rows:
+                if total + length > keep_bytes:
+                    cut = page
+                    break
+                total += length
+            if cut is not None:
+                self._con.execute(
+                    "DELETE FROM frames WHERE report_code = ? AND fight_id = ? AND page >= ?",
+                    (report_code, fight_id, cut),
+                )
+                self._con.commit()
+
+    def appender(self, partition: Path, report_code: str, fight_id: int) -> "FightAppender":
+        return FightAppender(self, partition, report_code, fight_id)
+
+    # -- reading -------------------------------------------------------------------------
+
+    def fight_meta(self, report_code: str, fight_id: int) -> dict:
+        with self._lock:
+            row = self._con.execute(
+                "SELECT meta FROM fights WHERE report_code = ? AND fight_id = ?", (report_code, fight_id)
+            ).fetchone()
+        return orjson.loads(row[0]) if row else {}
+
+    def fight_bytes(self, report_code: str, fight_id: int) -> int:
+        with self._lock:
+            return self._con.execute(
+                "SELECT COALESCE(SUM(length), 0) FROM frames WHERE report_code = ? AND fight_id = ?",
+                (report_code, fight_id),
+            ).fetchone()[0]
+
+    def fights(self) -> list[tuple[str, int, Path, dict]]:
+        """(report_code, fight_id, partition dir, meta) of every fight with indexed frames.
+
+        A fight linked to extra partitions is listed once per partition (same meta).
+        """
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT f.report_code, f.fight_id, p.partition, f.meta FROM fights f "
+                "JOIN (SELECT report_code, fight_id, partition FROM fights "
+                "      UNION SELECT report_code, fight_id, partition FROM fight_partitions) p "
+                "  ON p.report_code = f.report_code AND p.fight_id = f.fight_id "
+                "WHERE EXISTS (SELECT 1 FROM frames x WHERE x.report_code = f.report_code AND x.fight_id = f.fight_id) "
+                "ORDER BY p.partition, f.report_code, f.fight_id"
+            ).fetchall()
+        return [(code, fid, self.root / part, orjson.loads(meta)) for code, fid, part, meta in rows]
+
+    def fingerprint(self, report_code: str, fight_id: int) -> tuple[int, int, str]:
+        """(compressed bytes, frames, frame-list signature) identifying the fight's content."""
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT segment, offset, length FROM frames WHERE report_code = ? AND fight_id = ? ORDER BY page",
+                (report_code, fight_id),
+            ).fetchall()
+        sig = hashlib.blake2b(orjson.dumps(rows), digest_size=16).hexdigest() if rows else ""
+        return sum(r[2] for r in rows), len(rows), sig
+
+    def read_fight(self, report_code: str, fight_id: int) -> bytes:
+        """Decompressed NDJSON of the fight's pages, in page order."""
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT segment, offset, length FROM frames WHERE report_code = ? AND fight_id = ? ORDER BY page",
+                (report_code, fight_id),
+            ).fetchall()
+        dctx = zstandard.ZstdDecompressor()
+        out: list[bytes] = []
+        handles: dict[str, BinaryIO] = {}
+        try:
+            for segment, offset, length in rows:
+                fh = handles.get(segment) or handles.setdefault(segment, open(self.root / segment, "rb"))
+                fh.seek(offset)
+                out.append(dctx.decompress(fh.read(length)))
+        finally:
+            for fh in handles.values():
+                fh.close()
+        return b"".join(out)
+
+    def close(self) -> None:
+        for _, fh in self._open.values():
+            fh.close()
+        self._open.clear()
+        self._con.close()
+
+    def __enter__(self) -> "SegmentStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+class FightAppender:
+    """`NdjsonAppender`-shaped writer of one fight's pages into a store (sizes are per fight)."""
+
+    def __init__(self, store: SegmentStore, partition: Path, report_code: str, fight_id: int):
+        self.store = store
+        self.partition = partition
+        self.report_code = report_code
+        self.fight_id = fight_id
+
+    def append(self, records: list[dict]) -> int:
+        return self.store.append_page(self.partition, self.report_code, self.fight_id, records)
+
+    def truncate(self, size: int) -> None:
+        self.store.truncate_fight(self.report_code, self.fight_id, size)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "FightAppender":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def open_store(raw_root: Path, max_segment_mb: int, level: int = 3) -> Optional[SegmentStore]:
+    """Store over `raw_root` if it has a segment index, else None."""
+    if not (raw_root / INDEX_FILE).exists():
+        return None
+    return SegmentStore(raw_root, max_segment_mb * 1024 * 1024, level)
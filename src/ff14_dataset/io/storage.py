@@ -18,6 +18,7 @@ class DataPaths:
     staging: Path
     curated: Path
     duckdb_file: Path
+    manifest_file: Path
 
 
 def ensure_paths(settings: Settings) -> DataPaths:
@@ -26,9 +27,10 @@ def ensure_paths(settings: Settings) -> DataPaths:
     staging = root / settings.paths.staging
     curated = root / settings.paths.curated
     duck = root / settings.paths.duckdb_file
+    manifest = root / settings.paths.manifest_file
     for p in (raw, staging, curated):
         p.mkdir(parents=True, exist_ok=True)
-    return DataPaths(root=root, raw=raw, staging=staging, curated=curated, duckdb_file=duck)
+    return DataPaths(root=root, raw=raw, staging=staging, curated=curated, duckdb_file=duck, manifest_file=manifest)
 
 
 def partition_path(
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+"""`metrics_fight_job` for every job in one pass over a staging partition.
+
+Plugins are turned into small lookup tables (job x ability / status id), so identifying
+actors, selecting their GCDs, DoTs, buffs and mitigation casts are joins rather than one
+scan per job. Per actor:
+- aDPS: own damage plus the share of others' damage owed to the actor's %-damage raid
+  buffs (`RAID_DAMAGE_BUFFS`), per second; rDPS: aDPS minus the share of own damage owed
+  to buffs from others. A hit's buffed share is split between its active buffs by
+  log(1 + bonus), so across a fight given and received damage balance out
+- gcd_uptime_pct: union of `[cast, cast + gcd)` over GCD casts, gcd estimated per actor
+- dot_uptime_pct: union of the job's DoTs over all targets
+- buff_window_uptime_pct: intersection of the job's `buff_window` self buffs
+- windows_json: `{"dots": [[start, end], ...], "buff_window": [...]}` in fight ms
+"""
+
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Mapping, Optional, Sequence
+
+import polars as pl
+
+from ff14_dataset.config import Settings
+from ff14_dataset.features.ticks import DEFAULT_GCD_MS, gcd_estimate
+from ff14_dataset.io.storage import ensure_paths
+from ff14_dataset.metrics import intervals as iv
+from ff14_dataset.metrics.registry import JobMetricsPlugin, resolved_plugins
+
+
+FIGHT_KEYS = ["report_id", "fight_id"]
+ACTOR_KEYS = FIGHT_KEYS + ["actor_id"]
+METRICS_FILE = "metrics_fight_job.parquet"
+
+# Party %-damage buffs (status id -> damage increase); crit/DH buffs are not attributed
+RAID_DAMAGE_BUFFS: dict[int, float] = {
+    1185: 0.05,  # Brotherhood
+    1297: 0.05,  # Embolden
+    1822: 0.05,  # Technical Finish
+    1878: 0.06,  # Divination
+    2599: 0.03,  # Arcane Circle
+    2703: 0.05,  # Searing Light
+    2964: 0.06,  # Radiant Finale (3 Coda)
+    3685: 0.05,  # Starry Muse
+}
+
+
+def _table(plugins: Sequence[JobMetricsPlugin], field: str, col: str) -> pl.LazyFrame:
+    rows = [(p.job, i) for p in plugins for i in getattr(p, field)]
+    return pl.LazyFrame(rows, schema={"job": pl.String, col: pl.Int64}, orient="row")
+
+
+def _actors(events: pl.LazyFrame, plugins: Sequence[JobMetricsPlugin]) -> pl.LazyFrame:
+    """(fight, actor, job) for actors casting any job's signature actions (majority vote)."""
+    return (
+        events.filter(pl.col("event_type") == "cast")
+        .select(*FIGHT_KEYS, pl.col("source_id").alias("actor_id"), "ability_id")
+        .join(_table(plugins, "signature", "ability_id"), on="ability_id", how="inner")
+        .group_by(ACTOR_KEYS)
+        .agg(pl.col("job").mode().sort().first())
+    )
+
+
+def _on_actor(frame: pl.LazyFrame, side: str) -> pl.LazyFrame:
+    return frame.rename({side: "actor_id"})
+
+
+def _gcd_intervals(
+    events: pl.LazyFrame, actors: pl.LazyFrame, plugins: Sequence[JobMetricsPlugin]
+) -> pl.LazyFrame:
+    gcds = (
+        events.filter(pl.col("event_type") == "cast")
+        .select(
+            *FIGHT_KEYS,
+            pl.col("source_id").alias("actor_id"),
+            "ability_id",
+            pl.col("fight_ts_ms").alias("start"),
+        )
+        .join(actors, on=ACTOR_KEYS, how="inner")
+        .join(_table(plugins, "gcds", "ability_id"), on=["job", "ability_id"], how="semi")
+        .sort([*ACTOR_KEYS, "start"])
+    )
+    # Recast estimate shared with the tick builder, so gcd_ms and gcd_uptime_pct agree
+    est = gcds.group_by(ACTOR_KEYS).agg(
+        gcd_estimate(pl.col("start").diff()).cast(pl.Int64).alias("_gcd")
+    )
+    return gcds.join(est, on=ACTOR_KEYS, how="left").select(
+        *ACTOR_KEYS,
+        "start",
+        (pl.col("start") + pl.col("_gcd").fill_null(DEFAULT_GCD_MS)).alias("end"),
+    )
+
+
+def _damage(
+    events: pl.LazyFrame, actors: pl.LazyFrame, raid_buffs: Mapping[int, float]
+) -> pl.LazyFrame:
+    """Per actor: own damage, the part of it owed to external raid buffs (`_received`) and the
+    part of other actors' damage owed to the raid buffs it applied (`_given`)."""
+    hits = (
+        events.filter(pl.col("event_type") == "damage")
+        .select(
+            *FIGHT_KEYS,
+            pl.col("source_id").alias("actor_id"),
+            "fight_ts_ms",
+            pl.col("amount").fill_null(0),
+        )
+        .join(actors, on=ACTOR_KEYS, how="semi")
+        .sort("fight_ts_ms")
+    )
+    # The same buff from two sources does not stack: the earlier application owns the overlap
+    buffs = iv.status_intervals(events, raid_buffs, FIGHT_KEYS).filter(
+        pl.col("source_id") != pl.col("target_id")
+    )
+    buffs = iv.claim_first(_on_actor(buffs, "target_id"), [*ACTOR_KEYS, "status_id"], ["source_id"])
+    # Raid buffs stack multiplicatively: track log(multiplier) as a step function over time
+    w = pl.col("status_id").replace_strict(
+        {k: math.log1p(v) for k, v in raid_buffs.items()}, default=0.0, return_dtype=pl.Float64
+    )
+    steps = (
+        pl.concat(
+            [
+                buffs.select(*ACTOR_KEYS, pl.col("start").alias("fight_ts_ms"), w.alias("_w")),
+                buffs.select(*ACTOR_KEYS, pl.col("end").alias("fight_ts_ms"), (-w).alias("_w")),
+            ]
+        )
+        .group_by([*ACTOR_KEYS, "fight_ts_ms"])
+        .agg(pl.col("_w").sum())
+        .sort([*ACTOR_KEYS, "fight_ts_ms"])
+        .with_columns(pl.col("_w").cum_sum().over(ACTOR_KEYS).alias("_log_mult"))
+        .select(*ACTOR_KEYS, "fight_ts_ms", pl.col("fight_ts_ms").alias("_seg"), "_log_mult")
+    )
+    log_mult = pl.col("_log_mult").fill_null(0.0)
+    buffed = hits.join_asof(
+        steps.sort("fight_ts_ms"),
+        on="fight_ts_ms",
+        by=ACTOR_KEYS,
+        strategy="backward",
+        check_sortedness=False,
+    ).with_columns((pl.col("amount") * (1 - (-log_mult).exp())).alias("_r"))
+    # A hit under multiplier M owes amount * (1 - 1/M) to its buffs, log(1 + b) / log(M) of it
+    # to each. Between two step points the active buffs are fixed, so with C(t) = sum of
+    # _r / log(M) over hits before step point t, a buff over [s, e) is owed
+    # log(1 + b) * (C(e) - C(s))
+    per_seg = (
+        buffed.filter(log_mult > 1e-9)
+        .group_by([*ACTOR_KEYS, "_seg"])
+        .agg((pl.col("_r") / pl.col("_log_mult")).sum().alias("_d"))
+    )
+    d = pl.col("_d").fill_null(0.0)
+    cum = (
+        steps.join(per_seg, on=[*ACTOR_KEYS, "_seg"], how="left")
+        .sort([*ACTOR_KEYS, "fight_ts_ms"])
+        .select(*ACTOR_KEYS, "fight_ts_ms", (d.cum_sum().over(ACTOR_KEYS) - d).alias("_C"))
+    )
+    given = (
+        buffs.join(
+            cum.rename({"fight_ts_ms": "start", "_C": "_C_start"}),
+            on=[*ACTOR_KEYS, "start"],
+            how="left",
+        )
+        .join(
+            cum.rename({"fight_ts_ms": "end", "_C": "_C_end"}), on=[*ACTOR_KEYS, "end"], how="left"
+        )
+        .group_by(*FIGHT_KEYS, pl.col("source_id").alias("actor_id"))
+        .agg((w * (pl.col("_C_end") - pl.col("_C_start"))).sum().alias("_given"))
+    )
+    own = buffed.group_by(ACTOR_KEYS).agg(
+        pl.col("amount").sum().alias("_damage"), pl.col("_r").sum().alias("_received")
+    )
+    return (
+        actors.select(ACTOR_KEYS)
+        .join(own, on=ACTOR_KEYS, how="left")
+        .join(given, on=ACTOR_KEYS, how="left")
+    )
+
+
+def compute_job_metrics(
+    staging_events: pl.LazyFrame | pl.DataFrame,
+    plugins: Sequence[JobMetricsPlugin],
+    raid_buffs: Optional[Mapping[int, float]] = None,
+) -> pl.DataFrame:
+    """`metrics_fight_job` rows for every actor of the plugins' jobs (one or many fights).
+
+    Plugins must be resolved (non-empty `signature` and `gcds`), see `registry.resolve`.
+    """
+    raid_buffs = RAID_DAMAGE_BUFFS if raid_buffs is None else raid_buffs
+    ev = staging_events.lazy()
+    actors = _actors(ev, plugins)
+    fights = iv.fight_durations(ev, FIGHT_KEYS)
+    flags = pl.LazyFrame(
+        {
+            "job": [p.job for p in plugins],
+            "_has_dots": [bool(p.dots) for p in plugins],
+            "_k": [len(p.buff_window) for p in plugins],
+        },
+        schema={"job": pl.String, "_has_dots": pl.Boolean, "_k": pl.Int32},
+    )
+
+    status_ids = sorted({s for p in plugins for s in (*p.dots, *p.buff_window)})
+    statuses = iv.status_intervals(ev, status_ids, FIGHT_KEYS)
+    dots = iv.union(
+        _on_actor(statuses, "source_id")
+        .join(actors, on=ACTOR_KEYS, how="inner")
+        .join(_table(plugins, "dots", "status_id"), on=["job", "status_id"], how="semi"),
+        ACTOR_KEYS,
+    )
+    buff_window = iv.intersect_sets(
+        _on_actor(statuses.filter(pl.col("source_id") == pl.col("target_id")), "target_id")
+        .join(actors, on=ACTOR_KEYS, how="inner")
+        .join(_table(plugins, "buff_window", "status_id"), on=["job", "status_id"], how="semi")
+        .join(flags.select("job", "_k"), on="job", how="left"),
+        [*ACTOR_KEYS, "_k"],
+        "status_id",
+        "_k",
+    ).drop("_k")
+    gcd = iv.union(_gcd_intervals(ev, actors, plugins), ACTOR_KEYS)
+
+    casts = ev.filter(pl.col("event_type") == "cast").select(
+        *FIGHT_KEYS, pl.col("source_id").alias("actor_id"), "ability_id"
+    )
+    mitigation = (
+        casts.join(actors, on=ACTOR_KEYS, how="inner")
+        .join(_table(plugins, "mitigation", "ability_id"), on=["job", "ability_id"], how="semi")
+        .group_by(ACTOR_KEYS)
+        .agg(pl.len().cast(pl.Int64).alias("mitigation_events"))
+    )
+    deaths = (
+        ev.filter(pl.col("event_type") == "death")
+        .group_by(*FIGHT_KEYS, pl.col("target_id").alias("actor_id"))
+        .agg(pl.len().cast(pl.Int64).alias("deaths"))
+    )
+    windows = (
+        actors.select(ACTOR_KEYS)
+        .join(dots.group_by(ACTOR_KEYS).agg(iv.as_pairs("dots")), on=ACTOR_KEYS, how="left")
+        .join(
+            buff_window.group_by(ACTOR_KEYS).agg(iv.as_pairs("buff_window")),
+            on=ACTOR_KEYS,
+            how="left",
+        )
+        .select(
+            *ACTOR_KEYS, pl.struct("dots", "buff_window").struct.json_encode().alias("windows_json")
+        )
+    )
+
+    def pct(covered: str, defined: pl.Expr = pl.lit(True)) -> pl.Expr:
+        share = (100.0 * pl.col(covered).fill_null(0) / pl.col("duration_ms")).clip(
+            upper_bound=100.0
+        )
+        return pl.when(defined).then(share)
+
+    per_s = 1000.0 / pl.col("duration_ms")
+    damage, given = pl.col("_damage").fill_null(0), pl.col("_given").fill_null(0.0)
+    return (
+        actors.join(fights, on=FIGHT_KEYS, how="left")
+        .join(flags, on="job", how="left")
+        .join(_damage(ev, actors, raid_buffs), on=ACTOR_KEYS, how="left")
+        .join(iv.coverage(gcd, ACTOR_KEYS, "_gcd_ms"), on=ACTOR_KEYS, how="left")
+        .join(iv.coverage(dots, ACTOR_KEYS, "_dot_ms"), on=ACTOR_KEYS, how="left")
+        .join(iv.coverage(buff_window, ACTOR_KEYS, "_buff_ms"), on=ACTOR_KEYS, how="left")
+        .join(mitigation, on=ACTOR_KEYS, how="left")
+        .join(deaths, on=ACTOR_KEYS, how="left")
+        .join(windows, on=ACTOR_KEYS, how="left")
+        .select(
+            *ACTOR_KEYS,
+            "job",
+            "duration_ms",
+            ((damage - pl.col("_received").fill_null(0) + given) * per_s).alias("rDPS"),
+            ((damage + given) * per_s).alias("aDPS"),
+            pct("_gcd_ms").alias("gcd_uptime_pct"),
+            pct("_dot_ms", pl.col("_has_dots")).alias("dot_uptime_pct"),
+            pct("_buff_ms", pl.col("_k") > 0).alias("buff_window_uptime_pct"),
+            pl.col("deaths").fill_null(0),
+            pl.col("mitigation_events").fill_null(0),
+            # Job gauges are not in the FF Logs event stream
+            pl.lit(None, dtype=pl.Int64).alias("resource_issues"),
+            "windows_json",
+        )
+        .sort(ACTOR_KEYS)
+        .collect()
+    )
+
+
+def metrics_path_for(settings: Settings, partition: Path) -> Path:
+    """Curated metrics file for a staging partition directory."""
+    paths = ensure_paths(settings)
+    return paths.curated / partition.relative_to(paths.staging) / METRICS_FILE
+
+
+def write_partition_metrics(
+    settings: Settings, partition: Path, plugins: Sequence[JobMetricsPlugin]
+) -> Path:
+    out = metrics_path_for(settings, partition)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".parquet.tmp")
+    compute_job_metrics(pl.scan_parquet(partition / "*.parquet"), plugins).write_parquet(
+        tmp, compression="zstd", statistics=True
+    )
+    os.replace(tmp, out)
+    return out
+
+
+def build_metrics(
+    settings: Settings,
+    partitions: Sequence[Path],
+    preset_path: Path,
+    *,
+    jobs: Sequence[str] = (),
+    workers: Optional[int] = None,
+) -> list[Path]:
+    """Metrics for each staging partition, all jobs at once (`jobs` narrows the plugins)."""
+    if not partitions:
+        return []
+    plugins = resolved_plugins(preset_path, jobs)
+    n = workers or min(len(partitions), max(1, (os.cpu_count() or 2) // 2))
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(lambda p: write_partition_metrics(settings, p, plugins), partitions))
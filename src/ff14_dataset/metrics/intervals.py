@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+"""Interval algebra over Polars frames of `[start, end)` fight-ms intervals.
+
+Every operation is a sweep over sorted boundary points: starts contribute +1, ends -1,
+and the running sum per key group says how many (unioned) inputs cover each segment.
+Union is `count >= 1`, k-way intersection is `count == k`, and coverage is the summed
+segment length, so status uptimes for a whole partition cost a couple of sorts.
+"""
+
+from typing import Iterable, Sequence
+
+import polars as pl
+
+from ff14_dataset.features.ticks import EVENT_ORDER
+
+
+APPLY_TYPES = ("applybuff", "applydebuff")
+REMOVE_TYPES = ("removebuff", "removedebuff")
+
+
+def fight_durations(events: pl.LazyFrame, fight_keys: Sequence[str]) -> pl.LazyFrame:
+    return events.group_by(fight_keys).agg(pl.col("fight_ts_ms").max().alias("duration_ms"))
+
+
+def status_intervals(
+    events: pl.LazyFrame, status_ids: Iterable[int], fight_keys: Sequence[str]
+) -> pl.LazyFrame:
+    """Active spans of the given statuses per (fight, source, target, status).
+
+    Apply/remove events are reduced to alternating edges (re-applies while active and
+    repeated removes are dropped), taken in event order so a remove and re-apply in the
+    same millisecond keep their log order; a status never removed lasts to the end of the
+    fight and one removed before any apply (e.g. pre-pull buffs) starts at 0.
+    """
+    group = [*fight_keys, "source_id", "target_id", "status_id"]
+    t = pl.col("fight_ts_ms")
+    edges = (
+        events.filter(
+            pl.col("status_id").is_in(list(status_ids))
+            & pl.col("event_type").is_in(APPLY_TYPES + REMOVE_TYPES)
+        )
+        .select(*group, *EVENT_ORDER, pl.col("event_type").is_in(APPLY_TYPES).alias("_on"))
+        .sort([*group, *EVENT_ORDER])
+        .filter(pl.col("_on") != pl.col("_on").shift(1).over(group).fill_null(~pl.col("_on")))
+        .with_columns(
+            t.shift(-1).over(group).alias("_next"), pl.int_range(pl.len()).over(group).alias("_i")
+        )
+        .join(fight_durations(events, fight_keys), on=list(fight_keys), how="left")
+    )
+    return edges.filter(pl.col("_on") | (pl.col("_i") == 0)).select(
+        *group,
+        pl.when(pl.col("_on")).then(t).otherwise(0).alias("start"),
+        pl.when(pl.col("_on"))
+        .then(pl.col("_next").fill_null(pl.col("duration_ms")))
+        .otherwise(t)
+        .alias("end"),
+    )
+
+
+def sweep(
+    frames: Sequence[pl.LazyFrame], keys: Sequence[str], min_count: int | str
+) -> pl.LazyFrame:
+    """Maximal spans where at least `min_count` of the input intervals overlap, per key group.
+
+    `min_count` may name a key column, giving every group its own threshold.
+    """
+    keys = list(keys)
+    need = pl.col(min_count) if isinstance(min_count, str) else pl.lit(min_count)
+    bounds = pl.concat(
+        [
+            part
+            for f in frames
+            for part in (
+                f.select(*keys, pl.col("start").alias("t"), pl.lit(1, dtype=pl.Int32).alias("d")),
+                f.select(*keys, pl.col("end").alias("t"), pl.lit(-1, dtype=pl.Int32).alias("d")),
+            )
+        ],
+        how="vertical",
+    )
+    segs = (
+        bounds.group_by([*keys, "t"])
+        .agg(pl.col("d").sum())
+        .sort([*keys, "t"])
+        .with_columns(
+            pl.col("d").cum_sum().over(keys).alias("_c"),
+            pl.col("t").shift(-1).over(keys).alias("_next"),
+        )
+        .filter((pl.col("_c") >= need) & (pl.col("_next") > pl.col("t")))
+        .select(*keys, pl.col("t").alias("start"), pl.col("_next").alias("end"))
+    )
+    # Merge touching segments (coverage steps 2 -> 1 split a span without ending it)
+    run = (
+        (pl.col("start") != pl.col("end").shift(1).over(keys)).fill_null(True).cum_sum().over(keys)
+    )
+    return (
+        segs.with_columns(run.alias("_run"))
+        .group_by([*keys, "_run"])
+        .agg(pl.col("start").min(), pl.col("end").max())
+        .drop("_run")
+        .sort([*keys, "start"])
+    )
+
+
+def union(frame: pl.LazyFrame, keys: Sequence[str]) -> pl.LazyFrame:
+    return sweep([frame], keys, 1)
+
+
+def claim_first(
+    frame: pl.LazyFrame, keys: Sequence[str], tiebreak: Sequence[str] = ()
+) -> pl.LazyFrame:
+    """Clip each key group's intervals to be disjoint, keeping every other column.
+
+    Where intervals overlap, the earlier-starting one keeps the overlap (then the longer one,
+    then the lowest `tiebreak` values); their union is that of `union(frame, keys)`.
+    """
+    keys = list(keys)
+    order = [*keys, "start", "end", *tiebreak]
+    claimed = pl.col("end").cum_max().shift(1).over(keys)
+    return (
+        frame.sort(order, descending=[False] * (len(keys) + 1) + [True] + [False] * len(tiebreak))
+        .with_columns(pl.max_horizontal("start", claimed.fill_null(pl.col("start"))).alias("start"))
+        .filter(pl.col("start") < pl.col("end"))
+    )
+
+
+def intersect(frames: Sequence[pl.LazyFrame], keys: Sequence[str]) -> pl.LazyFrame:
+    return sweep([union(f, keys) for f in frames], keys, len(frames))
+
+
+def intersect_sets(
+    frame: pl.LazyFrame, keys: Sequence[str], set_col: str, count_col: str
+) -> pl.LazyFrame:
+    """Spans where all `count_col` sets (distinct `set_col` values) of a group are active.
+
+    Equivalent to `intersect` over each group's sets, but for any number of groups with
+    different set counts in one sweep; `count_col` must be one of `keys`.
+    """
+    return sweep([union(frame, [*keys, set_col]).drop(set_col)], keys, count_col)
+
+
+def coverage(frame: pl.LazyFrame, keys: Sequence[str], name: str = "covered_ms") -> pl.LazyFrame:
+    """Total length of (already disjoint) intervals per key group."""
+    return frame.group_by(list(keys)).agg((pl.col("end") - pl.col("start")).sum().alias(name))
+
+
+def as_pairs(name: str) -> pl.Expr:
+    """Aggregation collecting a group's intervals as `[[start, end], ...]` (for windows_json)."""
+    return pl.concat_list("start", "end").alias(name)
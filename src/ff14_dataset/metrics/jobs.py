@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+"""Metrics plugins for the jobs other than SAM (see `metrics.sam`).
+
+Only the status ids are declared here; signature, GCD and mitigation ids come from the
+preset (`registry.resolve`). `dots` lists every rank of a job's DoT (or uptime debuff) so
+low-level syncs count too; `buff_window` lists self buffs the job keeps up continuously.
+DRK, MNK, NIN, MCH, DNC, SMN, RDM and PCT keep neither, so their DoT and buff window uptimes
+stay null.
+"""
+
+from ff14_dataset.metrics.registry import JobMetricsPlugin, register
+
+
+PLD = register(JobMetricsPlugin(job="PLD", dots=(248,)))  # Circle of Scorn
+WAR = register(JobMetricsPlugin(job="WAR", buff_window=(2677,)))  # Surging Tempest
+GNB = register(JobMetricsPlugin(job="GNB", dots=(1837, 1838)))  # Sonic Break, Bow Shock
+
+WHM = register(JobMetricsPlugin(job="WHM", dots=(143, 144, 1871)))  # Aero, Aero II, Dia
+SCH = register(JobMetricsPlugin(job="SCH", dots=(179, 189, 1895)))  # Bio, Bio II, Biolysis
+AST = register(JobMetricsPlugin(job="AST", dots=(838, 843, 1881)))  # Combust I-III
+# Eukrasian Dosis I-III, Eukrasian Dyskrasia
+SGE = register(JobMetricsPlugin(job="SGE", dots=(2614, 2615, 2616, 3897)))
+
+DRG = register(
+    JobMetricsPlugin(
+        job="DRG",
+        dots=(118, 2719),  # Chaos Thrust, Chaotic Spring
+        buff_window=(2720,),  # Power Surge
+    )
+)
+RPR = register(JobMetricsPlugin(job="RPR", dots=(2586,)))  # Death's Design
+# Hunter's Instinct, Swiftscaled
+VPR = register(JobMetricsPlugin(job="VPR", buff_window=(3668, 3669)))
+
+# Venomous Bite, Windbite, Caustic Bite, Stormbite
+BRD = register(JobMetricsPlugin(job="BRD", dots=(124, 129, 1200, 1201)))
+
+# Thunder III, Thunder IV, High Thunder, High Thunder II
+BLM = register(JobMetricsPlugin(job="BLM", dots=(163, 1210, 3871, 3872)))
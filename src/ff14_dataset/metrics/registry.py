@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+"""Per-job metric plugins, declared as data.
+
+A plugin only lists ids; all arithmetic lives in `metrics.compute`, which evaluates every
+registered job in one pass. Fields left empty are filled from the action preset:
+- signature: actions only this job has (identifies which actor plays the job)
+- gcds: preset `is_gcd` actions (GCD uptime)
+- mitigation: actions tagged `mitigation_self` / `mitigation_party`
+`dots` (debuffs the actor keeps on enemies) and `buff_window` (self buffs that must all be
+up at once) have no preset source and are declared per job in `metrics.sam` and
+`metrics.jobs`; jobs without them report those uptimes as null.
+"""
+
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterable
+
+from ff14_dataset.features.layout import load_layout
+from ff14_dataset.io.presets import load_catalog
+from ff14_dataset.scraper.jobguide import JOB_SLUG_TO_ABBR
+
+
+MITIGATION_TAGS = ("mitigation_self", "mitigation_party")
+
+
+@dataclass(frozen=True)
+class JobMetricsPlugin:
+    job: str
+    signature: tuple[int, ...] = ()
+    gcds: tuple[int, ...] = ()
+    mitigation: tuple[int, ...] = ()
+    dots: tuple[int, ...] = ()
+    buff_window: tuple[int, ...] = ()
+
+
+_REGISTRY: dict[str, JobMetricsPlugin] = {}
+
+
+def register(plugin: JobMetricsPlugin) -> JobMetricsPlugin:
+    _REGISTRY[plugin.job] = plugin
+    return plugin
+
+
+def plugin_for(job: str) -> JobMetricsPlugin:
+    return _REGISTRY.get(job) or JobMetricsPlugin(job)
+
+
+def resolve(plugin: JobMetricsPlugin, preset_path: Path) -> JobMetricsPlugin:
+    """Fill the plugin's empty id lists from the preset."""
+    layout = load_layout(preset_path, plugin.job)
+    catalog = load_catalog(preset_path)
+    mitigation = tuple(
+        sorted({i for tag in MITIGATION_TAGS for i in catalog.ids_with_tag(tag, plugin.job)})
+    )
+    return replace(
+        plugin,
+        signature=plugin.signature or layout.signature_actions,
+        gcds=plugin.gcds or layout.gcd_actions,
+        mitigation=plugin.mitigation or mitigation,
+    )
+
+
+def resolved_plugins(preset_path: Path, jobs: Iterable[str] = ()) -> list[JobMetricsPlugin]:
+    """Resolved plugins for `jobs` (default: every job in `JOB_SLUG_TO_ABBR`)."""
+    # Registers the built-in plugins
+    import ff14_dataset.metrics.jobs  # noqa: F401
+    import ff14_dataset.metrics.sam  # noqa: F401
+
+    jobs = list(jobs) or sorted(JOB_SLUG_TO_ABBR.values())
+    return [resolve(plugin_for(job), preset_path) for job in jobs]
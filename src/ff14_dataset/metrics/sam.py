@@ -1,11 +1,46 @@
 from __future__ import annotations
 
-"""SAM-specific metrics and windows (skeleton)."""
+"""SAM metrics plugin: Higanbana uptime and the Fugetsu + Fuka buff window.
 
-from typing import Dict, Any
+The arithmetic (rDPS/aDPS, uptimes, windows_json) is shared by every job and lives in
+`metrics.compute`; this module only declares SAM's ids.
+"""
 
+from typing import Mapping, Optional
 
-def compute_sam_metrics(staging_events) -> Dict[str, Any]:
-    # Placeholder for rDPS/aDPS, uptime, buff windows, resource usage etc.
-    return {"rDPS": None, "aDPS": None, "higanbana_uptime": None}
+import polars as pl
 
+from ff14_dataset.metrics.registry import JobMetricsPlugin, register
+
+
+SAM_GCDS = (
+    7477, 7478, 7479, 7480, 7481, 7482, 7483, 7484, 7485, 7486, 7487, 7488, 7489, 7867,
+    16485, 16486, 25780, 25781, 25782, 36963, 36965, 36966, 36967, 36968,
+)
+# Casting any of these marks an actor as SAM
+SAM_SIGNATURE = (7477, 7478, 7479, 7480, 7481, 7482, 7487, 7489, 7867, 36963)
+SAM_MITIGATION = (7498, 36962, 7549)  # Third Eye, Tengentsu, Feint
+
+HIGANBANA = 1228
+FUGETSU = 1298
+FUKA = 1299
+
+SAM = register(
+    JobMetricsPlugin(
+        job="SAM",
+        signature=SAM_SIGNATURE,
+        gcds=SAM_GCDS,
+        mitigation=SAM_MITIGATION,
+        dots=(HIGANBANA,),
+        buff_window=(FUGETSU, FUKA),
+    )
+)
+
+
+def compute_sam_metrics(
+    staging_events: pl.LazyFrame | pl.DataFrame, raid_buffs: Optional[Mapping[int, float]] = None
+) -> pl.DataFrame:
+    """`metrics_fight_job` rows for every SAM in the given events (one or many fights)."""
+    from ff14_dataset.metrics.compute import compute_job_metrics
+
+    return compute_job_metrics(staging_events, [SAM], raid_buffs)
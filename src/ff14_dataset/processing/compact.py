@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+"""Staging compaction: merge small per-fight Parquet files into sorted, target-sized parts.
+
+Per `report_date=...` partition, files smaller than `compaction.target_file_mb` are binned
+(in name order) up to that size and each bin is rewritten as one `part-<digest>.parquet`
+sorted by (report_id, fight_id, source_id, ts_ms), zstd-compressed with statistics and
+`compaction.row_group_rows` rows per group, so scans skip row groups on fight/actor/time.
+
+The swap is journaled: a `<part>.inputs` file lists the merged inputs before the part is
+moved into place, inputs are deleted only afterwards, and an interrupted run is finished
+(part present) or rolled back (part missing) the next time the partition is compacted.
+The normalize fingerprint index is repointed to the part, curated ticks/labels of merged
+fight files are dropped (they rebuild per part), and `_files.json` records every file's
+row count and min/max of report_id, fight_id and ts_ms.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+import orjson
+import polars as pl
+
+from ff14_dataset.config import Settings
+from ff14_dataset.io.storage import ensure_paths
+
+
+SORT_KEYS = ["report_id", "fight_id", "source_id", "ts_ms"]
+STATS_KEYS = ["report_id", "fight_id", "ts_ms"]
+SIDECAR = "_files.json"
+
+
+@dataclass
+class CompactionReport:
+    partitions: int = 0
+    merged: int = 0
+    parts: list[Path] = field(default_factory=list)
+
+
+def _journal(part: Path) -> Path:
+    return part.with_name(part.name + ".inputs")
+
+
+def _recover(settings: Settings, partition: Path) -> None:
+    for journal in partition.glob("part-*.parquet.inputs"):
+        part = journal.with_name(journal.name.removesuffix(".inputs"))
+        if part.exists():
+            for name in orjson.loads(journal.read_bytes()):
+                _drop_curated(settings, partition / name)
+                (partition / name).unlink(missing_ok=True)
+        else:
+            part.with_suffix(".parquet.tmp").unlink(missing_ok=True)
+        journal.unlink()
+
+
+def plan_bins(files: Iterable[Path], target_bytes: int) -> list[list[Path]]:
+    """Greedy bins of small files (name order) up to `target_bytes`; single-file bins dropped."""
+    bins: list[list[Path]] = []
+    cur: list[Path] = []
+    size = 0
+    for f in sorted(files):
+        s = f.stat().st_size
+        if s >= target_bytes:
+            continue
+        if cur and size + s > target_bytes:
+            bins.append(cur)
+            cur, size = [], 0
+        cur.append(f)
+        size += s
+    if cur:
+        bins.append(cur)
+    return [b for b in bins if len(b) > 1]
+
+
+def file_stats(path: Path) -> dict:
+    """Row count and min/max of the stats keys (answered from Parquet footers)."""
+    row = (
+        pl.scan_parquet(path)
+        .select(
+            pl.len().alias("rows"),
+            *(pl.col(k).min().alias(f"min_{k}") for k in STATS_KEYS),
+            *(pl.col(k).max().alias(f"max_{k}") for k in STATS_KEYS),
+        )
+        .collect()
+        .row(0, named=True)
+    )
+    return {
+        "rows": row["rows"],
+        "bytes": path.stat().st_size,
+        "min": {k: row[f"min_{k}"] for k in STATS_KEYS},
+        "max": {k: row[f"max_{k}"] for k in STATS_KEYS},
+    }
+
+
+def write_sidecar(partition: Path) -> Path:
+    out = partition / SIDECAR
+    stats = {f.name: file_stats(f) for f in sorted(partition.glob("*.parquet"))}
+    tmp = out.with_suffix(".json.tmp")
+    tmp.write_bytes(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
+    os.replace(tmp, out)
+    return out
+
+
+def _drop_curated(settings: Settings, staging_file: Path) -> None:
+    from ff14_dataset.features.build import labels_path_for
+    from ff14_dataset.features.ticks import ticks_path_for
+
+    ticks = ticks_path_for(settings, staging_file)
+    labels_path_for(ticks).unlink(missing_ok=True)
+    ticks.unlink(missing_ok=True)
+
+
+def merge_files(settings: Settings, inputs: list[Path]) -> Path:
+    """Merge one bin into a sorted part file and swap it in place of its inputs."""
+    from ff14_dataset.processing.normalize import FingerprintIndex
+
+    partition = inputs[0].parent
+    digest = hashlib.blake2b("\n".join(f.name for f in inputs).encode(), digest_size=6).hexdigest()
+    part = partition / f"part-{digest}.parquet"
+    tmp = part.with_suffix(".parquet.tmp")
+    cfg = settings.compaction
+    pl.scan_parquet(inputs).sort(SORT_KEYS).sink_parquet(
+        tmp, compression="zstd", statistics=True, row_group_size=cfg.row_group_rows
+    )
+    # Repoint first: if we die before the swap, normalize just re-creates the fight files
+    index = FingerprintIndex(ensure_paths(settings).staging / "_normalize_index.sqlite")
+    try:
+        index.repoint([str(f) for f in inputs], str(part))
+    finally:
+        index.close()
+    journal = _journal(part)
+    journal.write_bytes(orjson.dumps([f.name for f in inputs if f != part]))
+    os.replace(tmp, part)
+    for f in inputs:
+        if f != part:
+            _drop_curated(settings, f)
+            f.unlink(missing_ok=True)
+    _drop_curated(settings, part)  # a re-merged part's ticks are stale as well
+    journal.unlink()
+    return part
+
+
+def evict_fights(settings: Settings, part: Path, fights: Iterable[tuple[str, int]]) -> None:
+    """Rewrite a part without the given (report_id, fight_id) pairs (their raw file changed)."""
+    fights = list(fights)
+    if not part.exists() or not fights:
+        return
+    keep = ~pl.struct("report_id", "fight_id").is_in(
+        pl.Series([{"report_id": r, "fight_id": f} for r, f in fights])
+    )
+    tmp = part.with_suffix(".parquet.tmp")
+    pl.scan_parquet(part).filter(keep).sink_parquet(
+        tmp, compression="zstd", statistics=True, row_group_size=settings.compaction.row_group_rows
+    )
+    if pl.scan_parquet(tmp).select(pl.len()).collect().item() == 0:
+        tmp.unlink()
+        part.unlink()
+    else:
+        os.replace(tmp, part)
+    _drop_curated(settings, part)
+
+
+def compact_partition(settings: Settings, partition: Path) -> list[Path]:
+    _recover(settings, partition)
+    cfg = settings.compaction
+    files = list(partition.glob("*.parquet"))
+    if len(files) < cfg.min_files:
+        return []
+    parts = [merge_files(settings, b) for b in plan_bins(files, cfg.target_file_mb * 1024 * 1024)]
+    write_sidecar(partition)
+    return parts
+
+
+def compact_staging(
+    settings: Settings, partitions: Optional[list[Path]] = None
+) -> CompactionReport:
+    """Compact every (or the given) staging partition; runs one partition at a time."""
+    staging = ensure_paths(settings).staging
+    parts_dirs = partitions or sorted(
+        {f.parent for f in staging.glob("*/*/*/report_date=*/*.parquet")}
+    )
+    rep = CompactionReport(partitions=len(parts_dirs))
+    for p in parts_dirs:
+        before = len(list(p.glob("*.parquet")))
+        new = compact_partition(settings, p)
+        rep.parts += new
+        rep.merged += before - len(list(p.glob("*.parquet"))) + len(new)
+    return rep
@@ -1,29 +1,431 @@
 from __future__ import annotations
 
-"""Transform raw JSON into normalized staging Parquet (skeleton)."""
+"""Transform raw event NDJSON into normalized staging Parquet.
 
+Each raw fight file (`<report>_<fight>.ndjson[.zst]`) is scanned lazily as text lines, which
+are kept verbatim as `original_json` and decoded with an explicit schema (`str.json_decode`),
+flattened with columnar expressions only and streamed to the mirrored staging
+partition via `sink_parquet`. Files are processed in parallel threads (Polars releases the
+GIL), each plan running on the streaming engine in bounded memory.
+
+Runs are incremental: a fingerprint index (path, size, mtime, content hash) under the
+staging root records what each output was built from, so only new or changed raw files
+are normalized and outputs of deleted raw files are removed.
+
+Fights kept in the raw segment store (`io.segments`) take part as `fight_ref` paths: their
+fingerprint is (compressed bytes, frames, frame-list hash) from the offset index, and their
+lines are parsed in memory.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Iterable, Optional
 
+import orjson
 import polars as pl
 
+from ff14_dataset.config import Settings
+from ff14_dataset.ingestion.manifest import IngestManifest
+from ff14_dataset.io.segments import SegmentStore, fight_ref, is_fight_ref, is_segment, open_store
+from ff14_dataset.io.storage import ensure_paths
+
+
+_RESOURCES = pl.Struct(
+    {
+        "hitPoints": pl.Int64,
+        "maxHitPoints": pl.Int64,
+        "mp": pl.Int64,
+        "maxMP": pl.Int64,
+        "tp": pl.Int64,
+        "maxTP": pl.Int64,
+        "absorb": pl.Int64,
+        "x": pl.Int64,
+        "y": pl.Int64,
+        "facing": pl.Int64,
+    }
+)
+
+# Explicit schema: inference on the first rows would drop sparse fields (overkill, stack, ...)
+RAW_EVENT_SCHEMA: dict[str, pl.DataType] = {
+    "timestamp": pl.Float64,
+    "type": pl.Utf8,
+    "fight": pl.Int64,
+    "sourceID": pl.Int64,
+    "targetID": pl.Int64,
+    "abilityGameID": pl.Int64,
+    "hitType": pl.Int64,
+    "amount": pl.Int64,
+    "unmitigatedAmount": pl.Int64,
+    "overheal": pl.Int64,
+    "overkill": pl.Int64,
+    "absorbed": pl.Int64,
+    "directHit": pl.Boolean,
+    "multiplier": pl.Float64,
+    "stack": pl.Int64,
+    "packetID": pl.Int64,
+    "sourceResources": _RESOURCES,
+    "targetResources": _RESOURCES,
+}
+
+EVENTS_SCHEMA: dict[str, pl.DataType] = {
+    "event_id": pl.Int64,
+    "fight_id": pl.Int64,
+    "report_id": pl.Utf8,
+    "ts_ms": pl.Int64,
+    "fight_ts_ms": pl.Int64,
+    "event_type": pl.Utf8,
+    "source_id": pl.Int64,
+    "target_id": pl.Int64,
+    "ability_id": pl.Int64,
+    "amount": pl.Int64,
+    "overheal": pl.Int64,
+    "overkill": pl.Int64,
+    "crit": pl.Boolean,
+    "dh": pl.Boolean,
+    "hit_type": pl.Int64,
+    "absorbed": pl.Int64,
+    "stack": pl.Int64,
+    "status_id": pl.Int64,
+    "resources": pl.Utf8,
+    "x": pl.Float64,
+    "y": pl.Float64,
+    "original_json": pl.Utf8,
+}
+
+# FF Logs reports buff/debuff abilities as status id + 1_000_000
+STATUS_ID_OFFSET = 1_000_000
+HIT_TYPE_CRIT = 2
 
-def normalize_events(raw_files: list[Path]) -> pl.DataFrame:
-    # Placeholder: return empty schema with expected columns
-    return pl.DataFrame(
-        schema={
-            "event_id": pl.Int64,
-            "fight_id": pl.Int64,
-            "report_id": pl.Utf8,
-            "ts_ms": pl.Int64,
-            "event_type": pl.Utf8,
-            "source_id": pl.Int64,
-            "target_id": pl.Int64,
-            "ability_id": pl.Int64,
-            "amount": pl.Int64,
-            "crit": pl.Boolean,
-            "dh": pl.Boolean,
-            "x": pl.Float64,
-            "y": pl.Float64,
-        }
+
+def _fight_meta(raw_file: Path) -> dict:
+    stem = raw_file.name.split(".", 1)[0]
+    meta_path = raw_file.with_name(f"{stem}.fight.json")
+    meta = orjson.loads(meta_path.read_bytes()) if meta_path.exists() else {}
+    code, _, fight = stem.rpartition("_")
+    meta.setdefault("report_code", code)
+    meta.setdefault("fight_id", int(fight) if fight.isdigit() else None)
+    return meta
+
+
+# Lines are read as one text column: JSON never contains a raw 0x1f byte and nothing is quoted
+_LINES_CSV = {
+    "has_header": False,
+    "separator": "\x1f",
+    "quote_char": None,
+    "schema": {"_line": pl.Utf8},
+    "raise_if_empty": False,
+}
+
+
+def _decode_lines(lines: pl.LazyFrame) -> pl.LazyFrame:
+    """Raw NDJSON lines (`_line`) -> the line plus its fields, parsed with RAW_EVENT_SCHEMA."""
+    return (
+        lines.filter(pl.col("_line").str.len_bytes() > 0)
+        .with_columns(pl.col("_line").str.json_decode(pl.Struct(RAW_EVENT_SCHEMA)).alias("_ev"))
+        .unnest("_ev")
     )
 
+
+def scan_raw_events(raw_file: Path, store: Optional[SegmentStore] = None) -> pl.LazyFrame:
+    """Lazy plan flattening one raw fight file (or a store's `fight_ref`) into `events`."""
+    if is_fight_ref(raw_file):
+        if store is None:
+            raise ValueError(f"{raw_file} is a segment fight but no segment store was given")
+        code, fid = _fight_of(raw_file)
+        meta = {"report_code": code, "fight_id": fid, **store.fight_meta(code, fid)}
+        lines = pl.scan_csv(store.read_fight(code, fid), **_LINES_CSV)
+        return _flatten(_decode_lines(lines), meta, pl.col("_line"))
+    lines = pl.scan_csv(raw_file, **_LINES_CSV)
+    return _flatten(_decode_lines(lines), _fight_meta(raw_file), pl.col("_line"))
+
+
+def _flatten(lf: pl.LazyFrame, meta: dict, original: pl.Expr) -> pl.LazyFrame:
+    report_start = int(meta.get("report_start_ms") or 0)
+    fight_start = int(meta.get("start_time") or 0)
+    ts = pl.col("timestamp").cast(pl.Int64)
+    is_status = pl.col("type").str.contains("buff|debuff")
+    src = pl.col("sourceResources")
+    return (
+        lf.with_row_index("event_id")
+        .select(
+            pl.col("event_id").cast(pl.Int64),
+            pl.coalesce(pl.col("fight"), pl.lit(meta["fight_id"])).cast(pl.Int64).alias("fight_id"),
+            pl.lit(meta["report_code"], dtype=pl.Utf8).alias("report_id"),
+            (ts + report_start).alias("ts_ms"),
+            (ts - fight_start).alias("fight_ts_ms"),
+            pl.col("type").alias("event_type"),
+            pl.col("sourceID").alias("source_id"),
+            pl.col("targetID").alias("target_id"),
+            pl.col("abilityGameID").alias("ability_id"),
+            pl.col("amount"),
+            pl.col("overheal"),
+            pl.col("overkill"),
+            (pl.col("hitType") == HIT_TYPE_CRIT).alias("crit"),
+            pl.col("directHit").fill_null(False).alias("dh"),
+            pl.col("hitType").alias("hit_type"),
+            pl.col("absorbed"),
+            pl.col("stack"),
+            pl.when(is_status & (pl.col("abilityGameID") >= STATUS_ID_OFFSET))
+            .then(pl.col("abilityGameID") - STATUS_ID_OFFSET)
+            .when(is_status)
+            .then(pl.col("abilityGameID"))
+            .alias("status_id"),
+            src.struct.json_encode().alias("resources"),
+            # FF Logs positions are integer hundredths of a yalm
+            (src.struct.field("x") / 100.0).alias("x"),
+            (src.struct.field("y") / 100.0).alias("y"),
+            original.alias("original_json"),
+        )
+    )
+
+
+def normalize_events(raw_files: list[Path]) -> pl.LazyFrame:
+    """Lazy union of normalized events for ad-hoc use; empty frame with schema if no input."""
+    if not raw_files:
+        return pl.LazyFrame(schema=EVENTS_SCHEMA)
+    return pl.concat([scan_raw_events(p) for p in raw_files], how="vertical")
+
+
+def iter_raw_event_files(settings: Settings) -> Iterable[Path]:
+    raw = ensure_paths(settings).raw
+    yield from sorted(raw.rglob("*.ndjson"))
+    yield from sorted(p for p in raw.rglob("*.ndjson.zst") if not is_segment(p))
+
+
+def iter_segment_fights(store: Optional[SegmentStore]) -> Iterable[Path]:
+    """`fight_ref` of every fight in the raw segment store."""
+    if store is not None:
+        yield from (fight_ref(part, code, fid) for code, fid, part, _ in store.fights())
+
+
+def staging_path_for(settings: Settings, raw_file: Path) -> Path:
+    """Mirror a raw file's partition path into the staging layer as `<report>_<fight>.parquet`."""
+    paths = ensure_paths(settings)
+    rel = raw_file.relative_to(paths.raw)
+    return paths.staging / rel.parent / f"{raw_file.name.split('.', 1)[0]}.parquet"
+
+
+def _fight_of(raw_file: Path) -> tuple[str, int]:
+    code, fight = raw_file.name.split(".", 1)[0].rsplit("_", 1)
+    return code, int(fight)
+
+
+def write_staging_file(settings: Settings, raw_file: Path, store: Optional[SegmentStore] = None) -> Path:
+    out = staging_path_for(settings, raw_file)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".parquet.tmp")
+    scan_raw_events(raw_file, store).sink_parquet(tmp, compression="zstd", statistics=True)
+    os.replace(tmp, out)
+    return out
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        while chunk := fh.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class NormalizeReport:
+    written: list[Path]
+    unchanged: int
+    removed: list[Path]
+    skipped_in_flight: int
+    cancelled: bool = False
+
+
+class FingerprintIndex:
+    """SQLite index of raw files already normalized, keyed by path relative to the raw root."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(str(path))
+        self._con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                raw_path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                output_path TEXT NOT NULL
+            )
+            """
+        )
+        self._con.commit()
+
+    def all(self) -> dict[str, tuple[int, int, str, str]]:
+        rows = self._con.execute("SELECT raw_path, size, mtime_ns, content_hash, output_path FROM files")
+        return {r[0]: (r[1], r[2], r[3], r[4]) for r in rows}
+
+    def upsert(self, raw_path: str, size: int, mtime_ns: int, content_hash: str, output_path: str) -> None:
+        self._con.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", (raw_path, size, mtime_ns, content_hash, output_path)
+        )
+        self._con.commit()
+
+    def repoint(self, output_paths: list[str], new_output: str) -> None:
+        """Point entries whose output was merged (compaction) at the merged file."""
+        self._con.executemany(
+            "UPDATE files SET output_path = ? WHERE output_path = ?", [(new_output, p) for p in output_paths]
+        )
+        self._con.commit()
+
+    def delete(self, raw_path: str) -> None:
+        self._con.execute("DELETE FROM files WHERE raw_path = ?", (raw_path,))
+        self._con.commit()
+
+    def clear(self) -> None:
+        self._con.execute("DELETE FROM files")
+        self._con.commit()
+
+    def close(self) -> None:
+        self._con.close()
+
+
+def _in_flight_files(settings: Settings) -> set[str]:
+    """Raw files still being paginated by an ingestion run (never normalize half a fight)."""
+    path = ensure_paths(settings).manifest_file
+    if not path.exists():
+        return set()
+    manifest = IngestManifest(path)
+    try:
+        return manifest.in_flight_paths()
+    finally:
+        manifest.close()
+
+
+def _is_part(output_path: str) -> bool:
+    return Path(output_path).name.startswith("part-")
+
+
+def _evict(settings: Settings, evict: dict[str, list[tuple[str, int]]]) -> None:
+    if not evict:
+        return
+    from ff14_dataset.processing.compact import evict_fights
+
+    for part, fights in evict.items():
+        evict_fights(settings, Path(part), fights)
+
+
+def normalize_to_staging(
+    settings: Settings,
+    raw_files: Optional[list[Path]] = None,
+    *,
+    workers: Optional[int] = None,
+    full: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> NormalizeReport:
+    """Normalize new or changed raw fight files (default: the whole raw tree) into staging.
+
+    A file is unchanged when size and mtime match the index; if only those differ, the
+    content hash decides. With `full=True` the index is ignored and everything is rebuilt.
+    When scanning the whole tree, outputs whose raw source disappeared are deleted. Fights
+    living in a compacted part (see `processing.compact`) are evicted from it instead.
+
+    `progress(done, total)` is called as files are written. Setting `cancel` stops queueing
+    files: those already running finish and are indexed, the rest are redone next run.
+    """
+    paths = ensure_paths(settings)
+    index = FingerprintIndex(paths.staging / "_normalize_index.sqlite")
+    store = open_store(paths.raw, settings.ingestion.segment_max_mb)
+    try:
+        if full:
+            for _, _, _, out in index.all().values():
+                if _is_part(out):
+                    Path(out).unlink(missing_ok=True)
+            index.clear()
+        known = index.all()
+        scan_all = raw_files is None
+        files = (
+            [*iter_raw_event_files(settings), *iter_segment_fights(store)] if scan_all else list(raw_files)
+        )
+        in_flight = _in_flight_files(settings)
+
+        todo: list[tuple[Path, str, int, int, Optional[str]]] = []
+        unchanged = skipped = 0
+        for f in files:
+            if str(f) in in_flight:
+                skipped += 1
+                continue
+            rel = f.relative_to(paths.raw).as_posix()
+            prev = known.get(rel)
+            if is_fight_ref(f):
+                if store is None:
+                    raise ValueError(f"{f} is a segment fight but {paths.raw} has no segment index")
+                size, frames, sig = store.fingerprint(*_fight_of(f))
+                if prev and prev[:3] == (size, frames, sig) and Path(prev[3]).exists():
+                    unchanged += 1
+                else:
+                    todo.append((f, rel, size, frames, sig))
+                continue
+            st = f.stat()
+            if prev and prev[0] == st.st_size and prev[1] == st.st_mtime_ns and Path(prev[3]).exists():
+                unchanged += 1
+                continue
+            digest = file_digest(f) if prev else None
+            if prev and digest == prev[2] and Path(prev[3]).exists():
+                index.upsert(rel, st.st_size, st.st_mtime_ns, digest, prev[3])
+                unchanged += 1
+                continue
+            todo.append((f, rel, st.st_size, st.st_mtime_ns, digest))
+
+        # Fights previously merged into a compacted part must leave it before being rewritten
+        evict: dict[str, list[tuple[str, int]]] = {}
+        for f, rel, *_ in todo:
+            prev = known.get(rel)
+            if prev and _is_part(prev[3]):
+                evict.setdefault(prev[3], []).append(_fight_of(f))
+        _evict(settings, evict)
+
+        written: list[Path] = []
+        cancelled = False
+        if todo:
+            n = workers or min(len(todo), max(1, (os.cpu_count() or 2) // 2))
+            if progress:
+                progress(0, len(todo))
+            with ThreadPoolExecutor(max_workers=n) as pool:
+                futures = {pool.submit(write_staging_file, settings, t[0], store): t for t in todo}
+                for fut in as_completed(futures):
+                    f, rel, size, mtime_ns, digest = futures[fut]
+                    if fut.cancelled():
+                        # Possibly evicted from its part above: forget it so the next run redoes it
+                        index.delete(rel)
+                        continue
+                    out = fut.result()
+                    index.upsert(rel, size, mtime_ns, digest or file_digest(f), str(out))
+                    written.append(out)
+                    if progress:
+                        progress(len(written), len(todo))
+                    if cancel is not None and cancel.is_set() and not cancelled:
+                        cancelled = True
+                        for other in futures:
+                            other.cancel()
+
+        removed: list[Path] = []
+        evict = {}
+        if scan_all and not cancelled:
+            present = {f.relative_to(paths.raw).as_posix() for f in files}
+            for rel, (_, _, _, out) in known.items():
+                if rel not in present:
+                    if _is_part(out):
+                        evict.setdefault(out, []).append(_fight_of(paths.raw / rel))
+                    else:
+                        Path(out).unlink(missing_ok=True)
+                    index.delete(rel)
+                    removed.append(Path(out))
+        _evict(settings, evict)
+        return NormalizeReport(
+            written=written, unchanged=unchanged, removed=removed, skipped_in_flight=skipped, cancelled=cancelled
+        )
+    finally:
+        index.close()
+        if store:
+            store.close()
@@ -1,11 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import re
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 
 import httpx
 from bs4 import BeautifulSoup
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential
+
+from ff14_dataset.io.http_cache import ResponseCache
+
+try:  # optional: C-backed parsing; falls back to BeautifulSoup's html.parser
+    import lxml.html
+except ImportError:
+    lxml = None  # type: ignore[assignment]
 
 
 @dataclass
@@ -44,18 +53,96 @@ JOB_SLUG_TO_ABBR: Dict[str, str] = {
 }
 
 
-def fetch_jobguide_html(job_slug: str, *, timeout_s: float = 20.0) -> str:
-    url = f"https://na.finalfantasyxiv.com/jobguide/{job_slug}/"
-    headers = {
-        "User-Agent": "ff14-dataset/0.1 (+https://example.com)",
-        "Accept-Language": "en-US,en;q=0.9",
-    }
-    with httpx.Client(timeout=timeout_s, headers=headers, follow_redirects=True, http2=True) as c:
+JOBGUIDE_URL = "https://na.finalfantasyxiv.com/jobguide/{slug}/"
+JOBGUIDE_HEADERS = {
+    "User-Agent": "ff14-dataset/0.1 (+https://example.com)",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def fetch_jobguide_html(job_slug: str, *, timeout_s: float = 20.0, cache: Optional[ResponseCache] = None) -> str:
+    url = JOBGUIDE_URL.format(slug=job_slug)
+    key = ResponseCache.make_key(url) if cache is not None else None
+    if key is not None:
+        hit = cache.get(key, "jobguide")
+        if hit is not None:
+            return hit.decode("utf-8")
+    with httpx.Client(timeout=timeout_s, headers=JOBGUIDE_HEADERS, follow_redirects=True, http2=True) as c:
         r = c.get(url)
         r.raise_for_status()
+        if key is not None:
+            cache.put(key, "jobguide", r.text.encode("utf-8"))
         return r.text
 
 
+def _retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+async def fetch_jobguide_html_async(
+    client: httpx.AsyncClient, job_slug: str, *, cache: Optional[ResponseCache] = None, attempts: int = 4
+) -> str:
+    """`fetch_jobguide_html` over a shared async client, retrying 429/5xx/transport errors."""
+    url = JOBGUIDE_URL.format(slug=job_slug)
+    key = ResponseCache.make_key(url) if cache is not None else None
+    if key is not None:
+        hit = cache.get(key, "jobguide")
+        if hit is not None:
+            return hit.decode("utf-8")
+    async for attempt in AsyncRetrying(
+        retry=retry_if_exception(_retryable),
+        wait=wait_exponential(multiplier=0.5, min=0.5, max=10),
+        stop=stop_after_attempt(attempts),
+        reraise=True,
+    ):
+        with attempt:
+            r = await client.get(url)
+            r.raise_for_status()
+    if key is not None:
+        cache.put(key, "jobguide", r.text.encode("utf-8"))
+    return r.text
+
+
+async def scrape_jobguides(
+    job_slugs: Optional[Iterable[str]] = None,
+    *,
+    concurrency: int = 6,
+    timeout_s: float = 20.0,
+    cache: Optional[ResponseCache] = None,
+    client: Optional[httpx.AsyncClient] = None,
+) -> Dict[str, List[JobAction]]:
+    """Fetch and parse the Job Guide pages of `job_slugs` (default: every job) concurrently.
+
+    All pages share one pooled HTTP/2 client (a single TLS handshake per connection) with at
+    most `concurrency` requests in flight; each page is parsed in a worker thread as soon as
+    it arrives, so parsing overlaps the remaining downloads.
+    """
+    slugs = list(job_slugs or JOB_SLUG_TO_ABBR)
+    own_client = client is None
+    client = client or httpx.AsyncClient(
+        http2=True,
+        timeout=timeout_s,
+        headers=JOBGUIDE_HEADERS,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(slug: str) -> List[JobAction]:
+        async with sem:
+            html = await fetch_jobguide_html_async(client, slug, cache=cache)
+        return await asyncio.to_thread(parse_job_actions, html)
+
+    try:
+        results = await asyncio.gather(*(one(s) for s in slugs))
+    finally:
+        if own_client:
+            await client.aclose()
+    return dict(zip(slugs, results))
+
+
 def _clean_text(s: str | None) -> Optional[str]:
     if not s:
         return None
@@ -64,76 +151,157 @@ def _clean_text(s: str | None) -> Optional[str]:
     return s.strip() or None
 
 
-def parse_job_actions(html: str) -> List[JobAction]:
+ACTION_ANCHOR_PREFIX = "pve_action__"
+# Elements whose strings BeautifulSoup's get_text() leaves out
+_NON_TEXT_TAGS = frozenset({"script", "style", "template"})
+
+
+def _distance(text: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+    """(range, radius) from a distance cell: numbers with units in order, Range then Radius."""
+    if not text:
+        return None, None
+    nums = re.findall(r"\b\d+\s*(?:y|malms?|yalm|yalms)\b", re.sub(r"\s+", " ", text), flags=re.I)
+    return (nums[0] if nums else None), (nums[1] if len(nums) > 1 else None)
+
+
+def _action(
+    anchor_id: str,
+    name: str,
+    cast: Optional[str],
+    recast: Optional[str],
+    distance: Optional[str],
+    tooltip_texts: Optional[List[str]],
+) -> JobAction:
+    rng, radius = _distance(distance)
+    return JobAction(
+        anchor_id=anchor_id,
+        name_en=name,
+        cast=_clean_text(cast),
+        recast=_clean_text(recast),
+        range=rng,
+        radius=radius,
+        tooltip=_clean_text(" ".join(tooltip_texts)) if tooltip_texts is not None else None,
+    )
+
+
+def _lxml_text(el) -> str:
+    """`Tag.get_text(" ")` for an lxml element: no comment, script or style strings."""
+    parts: List[str] = []
+
+    def walk(e) -> None:
+        if isinstance(e.tag, str) and e.tag not in _NON_TEXT_TAGS:
+            if e.text:
+                parts.append(e.text)
+            for child in e:
+                walk(child)
+                if child.tail:
+                    parts.append(child.tail)
+
+    walk(el)
+    return " ".join(parts)
+
+
+def _first_td(row, cls: str):
+    return next((td for td in row.iter("td") if cls in (td.get("class") or "").split()), None)
+
+
+def _parse_lxml(html: str) -> List[JobAction]:
+    if not html.strip():
+        return []
+    root = lxml.html.fromstring(html)
+
+    # One pass over the document: icon-grid anchors -> names, and the first <tr> per id
+    anchor_to_name: Dict[str, str] = {}
+    rows: Dict[str, object] = {}
+    for el in root.iter("a", "tr"):
+        if el.tag == "a":
+            href = el.get("href") or ""
+            if href.startswith("#" + ACTION_ANCHOR_PREFIX) and "job__skill_icon" in (el.get("class") or "").split():
+                name = el.get("data-tooltip") or ""
+                if name:
+                    anchor_to_name[href[1:]] = name.strip()
+        elif el.get("id"):
+            rows.setdefault(el.get("id"), el)
+
+    actions: List[JobAction] = []
+    for anchor_id, name in anchor_to_name.items():
+        row = rows.get(anchor_id)
+        if row is None:
+            actions.append(_action(anchor_id, name, None, None, None, None))
+            continue
+        cells = {cls: _first_td(row, cls) for cls in ("cast", "recast", "distant_range")}
+        texts = {cls: _lxml_text(td) if td is not None else None for cls, td in cells.items()}
+        # Effect text: the following sibling rows up to the next action row
+        tooltip_texts: List[str] = []
+        for nxt in row.itersiblings("tr"):
+            if (nxt.get("id") or "").startswith(ACTION_ANCHOR_PREFIX):
+                break
+            tooltip_texts += [t for td in nxt.iter("td") if (t := _clean_text(_lxml_text(td)))]
+        actions.append(
+            _action(anchor_id, name, texts["cast"], texts["recast"], texts["distant_range"], tooltip_texts)
+        )
+    return actions
+
+
+def _parse_soup(html: str) -> List[JobAction]:
     soup = BeautifulSoup(html, "html.parser")
 
     # Collect mapping from anchor (e.g., #pve_action__01) to action names via the icon grid.
     anchor_to_name: Dict[str, str] = {}
-    for a in soup.select('a.job__skill_icon[href^="#pve_action__"]'):
+    for a in soup.select(f'a.job__skill_icon[href^="#{ACTION_ANCHOR_PREFIX}"]'):
         href = a.get("href") or ""
-        if not href.startswith("#"):
-            continue
         name = a.get("data-tooltip") or ""
         if name:
             anchor_to_name[href[1:]] = name.strip()
+    # id -> first <tr>, built once instead of one CSS lookup per action
+    rows: Dict[str, object] = {}
+    for tr in soup.find_all("tr", id=True):
+        rows.setdefault(str(tr["id"]), tr)
 
     actions: List[JobAction] = []
     for anchor_id, name in anchor_to_name.items():
-        # The details row usually is <tr id="pve_action__XX"> with subsequent tds for cast/recast/range/radius
-        row = soup.select_one(f"tr#{anchor_id}")
-        cast = recast = rng = radius = tooltip = None
-
-        if row:
-            # Try to pick cells in this row
-            cast_el = row.select_one("td.cast")
-            recast_el = row.select_one("td.recast")
-            dist_el = row.select_one("td.distant_range")
-
-            cast = _clean_text(cast_el.get_text(" ") if cast_el else None)
-            recast = _clean_text(recast_el.get_text(" ") if recast_el else None)
-
-            if dist_el:
-                # The distance cell may contain Range and Radius separated by hr/divs
-                # Extract numeric-looking pieces in order: Range then Radius, if present
-                text = dist_el.get_text(" ")
-                text = re.sub(r"\s+", " ", text)
-                parts = [p.strip() for p in re.split(r"\s*\bRange\b|\bRadius\b\s*", text) if p.strip()]
-                # Fallback: just capture numbers with units
-                nums = re.findall(r"\b\d+\s*(?:y|malms?|yalm|yalms)\b", text, flags=re.I)
-                if len(nums) >= 1:
-                    rng = nums[0]
-                if len(nums) >= 2:
-                    radius = nums[1]
-
-            # Try to grab tooltip/effect text from the following rows until next action anchor
-            tooltip_texts: List[str] = []
-            nxt = row.find_next_sibling("tr")
-            while nxt is not None:
-                if nxt.has_attr("id") and str(nxt["id"]).startswith("pve_action__"):
-                    break
-                # Pull all td text in this row
-                for td in nxt.find_all("td"):
-                    t = _clean_text(td.get_text(" "))
-                    if t:
-                        tooltip_texts.append(t)
-                nxt = nxt.find_next_sibling("tr")
-            tooltip = _clean_text(" ".join(tooltip_texts))
+        # The details row usually is <tr id="pve_action__XX"> with tds for cast/recast/range/radius
+        row = rows.get(anchor_id)
+        if row is None:
+            actions.append(_action(anchor_id, name, None, None, None, None))
+            continue
+        texts = {}
+        for cls in ("cast", "recast", "distant_range"):
+            el = row.select_one(f"td.{cls}")
+            texts[cls] = el.get_text(" ") if el else None
 
+        # Tooltip/effect text from the following rows until the next action anchor
+        tooltip_texts: List[str] = []
+        nxt = row.find_next_sibling("tr")
+        while nxt is not None:
+            if nxt.has_attr("id") and str(nxt["id"]).startswith(ACTION_ANCHOR_PREFIX):
+                break
+            for td in nxt.find_all("td"):
+                t = _clean_text(td.get_text(" "))
+                if t:
+                    tooltip_texts.append(t)
+            nxt = nxt.find_next_sibling("tr")
         actions.append(
-            JobAction(
-                anchor_id=anchor_id,
-                name_en=name,
-                cast=cast,
-                recast=recast,
-                range=rng,
-                radius=radius,
-                tooltip=tooltip,
-            )
+            _action(anchor_id, name, texts["cast"], texts["recast"], texts["distant_range"], tooltip_texts)
         )
 
     return actions
 
 
+def parse_job_actions(html: str, *, backend: Optional[str] = None) -> List[JobAction]:
+    """Actions of a Job Guide page, in icon-grid order.
+
+    `backend` is "lxml" or "soup" (BeautifulSoup + html.parser); by default lxml is used
+    when installed. Both walk the document once and produce the same records.
+    """
+    backend = backend or ("lxml" if lxml is not None else "soup")
+    if backend == "lxml":
+        if lxml is None:
+            raise RuntimeError("the lxml backend requires the 'lxml' package")
+        return _parse_lxml(html)
+    return _parse_soup(html)
+
+
 def get_job_abbr(job_slug: str) -> Optional[str]:
     return JOB_SLUG_TO_ABBR.get(job_slug.lower())
 
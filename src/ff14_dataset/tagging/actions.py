@@ -1,8 +1,149 @@
 from __future__ import annotations
 
-import re
+"""Rule-table action tagger.
+
+Tag rules live in a data file (`config/tag_rules.yaml`): named phrase groups, rules over
+which groups a tooltip matched, category tags and per-job name tags. `tag_frame` tags a
+whole column at once: every phrase of every group is found in a single Aho-Corasick pass
+(`str.extract_many`), so adding rules or phrases does not add passes over the tooltips.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
 from typing import List, Optional
 
+import polars as pl
+import yaml
+
+
+DEFAULT_TAG_RULES = Path("config/tag_rules.yaml")
+ANY_JOB = "*"
+
+
+@dataclass(frozen=True)
+class TagRule:
+    tag: str
+    all: tuple[str, ...]
+    none: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class TagRules:
+    phrases: dict[str, tuple[str, ...]]  # group -> lowercase phrases
+    rules: tuple[TagRule, ...]
+    categories: dict[str, str]  # lowercase category -> tag
+    names: dict[str, dict[str, tuple[str, ...]]]  # job abbr | "*" -> tag -> lowercase names
+
+
+@lru_cache(maxsize=8)
+def _load_tag_rules(path: str, mtime_ns: int) -> TagRules:
+    raw = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or {}
+    phrases = {g: tuple(p.lower() for p in ps) for g, ps in (raw.get("phrases") or {}).items()}
+    rules = tuple(
+        TagRule(r["tag"], tuple(r.get("all") or ()), tuple(r.get("none") or ()))
+        for r in raw.get("rules") or []
+    )
+    unknown = {g for r in rules for g in (*r.all, *r.none)} - set(phrases)
+    if unknown:
+        raise ValueError(f"{path}: rules reference undefined phrase groups {sorted(unknown)}")
+    return TagRules(
+        phrases=phrases,
+        rules=rules,
+        categories={c.lower(): t for c, t in (raw.get("categories") or {}).items()},
+        names={
+            job: {tag: tuple(n.lower() for n in names) for tag, names in (tags or {}).items()}
+            for job, tags in (raw.get("names") or {}).items()
+        },
+    )
+
+
+def load_tag_rules(path: Path = DEFAULT_TAG_RULES) -> TagRules:
+    """Parsed rules file, cached until the file changes."""
+    return _load_tag_rules(str(path.resolve()), path.stat().st_mtime_ns)
+
+
+def tag_frame(
+    frame: pl.DataFrame,
+    rules: Optional[TagRules] = None,
+    *,
+    tooltip: str = "tooltip",
+    name: str = "name_en",
+    category: str = "category",
+    job: str = "job_abbr",
+) -> pl.Series:
+    """Sorted, unique derived tags (List[str]) for every row of `frame`.
+
+    Missing `category` or `job` columns are treated as null (no category / job-specific
+    name tags); `tooltip` and `name` may be null.
+    """
+    rules = rules or load_tag_rules()
+    col = lambda c: pl.col(c) if c in frame.columns else pl.lit(None, dtype=pl.Utf8)  # noqa: E731
+    base = frame.select(
+        pl.int_range(pl.len(), dtype=pl.UInt32).alias("_row"),
+        col(tooltip).cast(pl.Utf8).fill_null("").str.to_lowercase().alias("_text"),
+        col(name).cast(pl.Utf8).str.to_lowercase().alias("_name"),
+        col(category).cast(pl.Utf8).str.to_lowercase().alias("_cat"),
+        col(job).cast(pl.Utf8).alias("_job"),
+    )
+
+    # Phrase groups matched per row: one automaton over all phrases, then phrase -> group
+    groups = pl.DataFrame(
+        [(p, g) for g, ps in rules.phrases.items() for p in ps],
+        schema={"_phrase": pl.Utf8, "_group": pl.Utf8},
+        orient="row",
+    )
+    found = (
+        pl.col("_text").str.extract_many(groups["_phrase"].unique().to_list(), overlapping=True)
+        if groups.height
+        else pl.lit([], dtype=pl.List(pl.Utf8))
+    )
+    hits = (
+        base.select("_row", found.alias("_phrase"))
+        .explode("_phrase")
+        .join(groups, on="_phrase")
+        .group_by("_row")
+        .agg(pl.col("_group").unique())
+    )
+    matched = base.join(hits, on="_row", how="left").sort("_row")
+    has = lambda g: pl.col("_group").list.contains(g).fill_null(False)  # noqa: E731
+    excluded = lambda r: pl.any_horizontal(pl.lit(False), *(has(g) for g in r.none))  # noqa: E731
+    rule_tags = [
+        pl.when(pl.all_horizontal(*(has(g) for g in r.all)) & ~excluded(r)).then(pl.lit(r.tag))
+        for r in rules.rules
+        if r.all
+    ]
+
+    names = pl.DataFrame(
+        [(j, n, tag) for j, tags in rules.names.items() for tag, ns in tags.items() for n in ns],
+        schema={"_job": pl.Utf8, "_name": pl.Utf8, "_tag": pl.Utf8},
+        orient="row",
+    )
+    any_job = names.filter(pl.col("_job") == ANY_JOB).drop("_job")
+    by_name = pl.concat(
+        [
+            matched.select("_row", "_name").join(any_job, on="_name"),
+            matched.select("_row", "_name", "_job").join(names, on=["_job", "_name"]).drop("_job"),
+        ]
+    ).group_by("_row").agg(pl.col("_tag").alias("_name_tags"))
+
+    cat_tag = pl.col("_cat").replace_strict(rules.categories, default=None, return_dtype=pl.Utf8)
+    return (
+        matched.join(by_name, on="_row", how="left")
+        .sort("_row")
+        .select(
+            pl.concat_list(
+                pl.concat_list(cat_tag, *rule_tags),
+                pl.col("_name_tags").fill_null(pl.lit([], dtype=pl.List(pl.Utf8))),
+            )
+            .list.drop_nulls()
+            .list.unique()
+            .list.sort()
+            .alias("tags")
+        )
+        .to_series()
+    )
+
 
 def derive_tags(
     *,
@@ -11,66 +152,12 @@ def derive_tags(
     category: Optional[str],
     cast: Optional[str],
     recast: Optional[str],
+    job: Optional[str] = None,
+    rules: Optional[TagRules] = None,
 ) -> List[str]:
-    t = (tooltip or "").lower()
-    name_l = name_en.lower()
-    tags: list[str] = []
-
-    # Base: gcd/ogcd
-    if category:
-        if category.lower() in ("weaponskill", "spell"):
-            tags.append("gcd")
-        elif category.lower() == "ability":
-            tags.append("ogcd")
-
-    # Common mechanics
-    if "reduces damage taken" in t or "damage taken is reduced" in t:
-        if "party" in t or "nearby party" in t:
-            tags.append("mitigation_party")
-        else:
-            tags.append("mitigation_self")
-    if "hp cannot be reduced below 1" in t or "renders you impervious" in t:
-        tags.append("invuln")
-    if "increases damage dealt" in t:
-        if "party" in t:
-            tags.append("raid_buff")
-        else:
-            tags.append("personal_buff")
-    if "increases healing" in t:
-        tags.append("healing_buff")
-    if "restores own hp" in t or "restores target's hp" in t or "restores hp" in t or "cure potency" in t:
-        tags.append("heal")
-    if "barrier" in t or "shield" in t:
-        tags.append("barrier")
-    if "stun" in t:
-        tags.append("stun")
-    if "interrupt" in t:
-        tags.append("interrupt")
-    if "silence" in t:
-        tags.append("silence")
-    if "increased enmity" in t or "enmity is increased" in t or "additional effect: increased enmity" in t:
-        tags.append("tank_enmity")
-    if re.search(r"damage over time|dot", t):
-        tags.append("dot")
-    if re.search(r"to all nearby enemies|all nearby enemies|all enemies in a straight line|in a cone", t):
-        tags.append("aoe")
-    else:
-        # crude single-target hint
-        if re.search(r"delivers an attack with a potency of", t):
-            tags.append("st")
-    if "combo action" in t:
-        tags.append("combo_step")
-
-    # Heuristics by name for PLD specifics
-    if name_l in {"provoke"}:
-        tags.append("taunt")
-    if name_l in {"interject"}:
-        tags.append("interrupt")
-    if name_l in {"low blow"}:
-        tags.append("stun")
-    if name_l == "sheltron":
-        tags.append("block")
-
-    # Charges inference: recast text like "30s" doesn't convey charges; skip for now.
-    return sorted(set(tags))
-
+    """Tags of a single action (see `tag_frame`; prefer it for many actions)."""
+    frame = pl.DataFrame(
+        {"name_en": [name_en], "tooltip": [tooltip], "category": [category], "job_abbr": [job]},
+        schema={"name_en": pl.Utf8, "tooltip": pl.Utf8, "category": pl.Utf8, "job_abbr": pl.Utf8},
+    )
+    return tag_frame(frame, rules)[0].to_list()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import httpx
+import orjson
+import pytest
+
+from ff14_dataset.config import Settings, load_settings
+from ff14_dataset.ingestion.fflogs_client import AUTH_URL, FFLogsClient
+from ff14_dataset.io.ndjson import NdjsonAppender
+from ff14_dataset.io.storage import partition_path
+
+
+DEFAULT_CONFIG = Path(__file__).resolve().parents[1] / "config" / "default.yaml"
+
+
+GqlHandler = Callable[[str, dict], Any]
+
+
+class StubFFLogs:
+    """FF Logs stand-in for `httpx.MockTransport`: answers the token endpoint and hands every
+    GraphQL POST (query, variables) to `handler`, whose return value is the response (a dict
+    becomes a JSON body, an `httpx.Response` is sent as is)."""
+
+    def __init__(self, handler: GqlHandler):
+        self.handler = handler
+        self.requests: list[httpx.Request] = []
+        self.queries: list[tuple[str, dict]] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if str(request.url) == AUTH_URL:
+            return httpx.Response(200, json={"access_token": "t", "expires_in": 3600})
+        body = json.loads(request.content)
+        self.queries.append((body["query"], body.get("variables") or {}))
+        out = self.handler(body["query"], body.get("variables") or {})
+        return out if isinstance(out, httpx.Response) else httpx.Response(200, json=out)
+
+    def client(self, **kwargs: Any) -> FFLogsClient:
+        kwargs.setdefault("sleep_ms", 0)
+        return FFLogsClient("id", "secret", transport=httpx.MockTransport(self), **kwargs)
+
+
+def rate_limit(spent: float = 10.0, limit: float = 3600.0, reset_in: float = 1800.0) -> dict:
+    return {"limitPerHour": limit, "pointsSpentThisHour": spent, "pointsResetIn": reset_in}
+
+
+def raw_events(fight: int, n: int = 5) -> list[dict]:
+    return [
+        {
+            "timestamp": 100_000 + 10 * i,
+            "type": "damage" if i % 2 else "cast",
+            "sourceID": 5,
+            "targetID": 50,
+            "abilityGameID": 7477,
+            "fight": fight,
+            "amount": 1000 + i,
+            "unknownField": {"nested": [i]},  # not in RAW_EVENT_SCHEMA
+        }
+        for i in range(n)
+    ]
+
+
+def write_raw_fight(
+    settings, code: str, fight: int, events: list[dict], suffix: str = ".ndjson"
+) -> Path:
+    part = partition_path(settings, "raw", "7.3x", "Test Boss", "SAM", "2025-01")
+    part.mkdir(parents=True, exist_ok=True)
+    (part / f"{code}_{fight}.fight.json").write_bytes(
+        orjson.dumps(
+            {
+                "report_code": code,
+                "fight_id": fight,
+                "report_start_ms": 1_735_689_600_000,
+                "start_time": 100_000,
+            }
+        )
+    )
+    path = part / f"{code}_{fight}{suffix}"
+    path.unlink(missing_ok=True)
+    with NdjsonAppender(path, "zstd" if suffix.endswith(".zst") else "none") as w:
+        w.append(events)
+    return path
+
+
+@pytest.fixture
+def stub_fflogs() -> Callable[[Optional[GqlHandler]], StubFFLogs]:
+    return lambda handler=None: StubFFLogs(handler or (lambda q, v: {"data": {}}))
+
+
+@pytest.fixture
+def settings(tmp_path: Path) -> Settings:
+    """Default settings with the data root in a temp dir and the response cache off."""
+    s = load_settings(DEFAULT_CONFIG)
+    return replace(
+        s, paths=replace(s.paths, data_root=tmp_path), cache=replace(s.cache, enabled=False)
+    )
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+import orjson
+import polars as pl
+import pytest
+
+from ff14_dataset.features.ticks import ticks_path_for
+from ff14_dataset.io.storage import ensure_paths
+from ff14_dataset.processing import compact
+from ff14_dataset.processing.compact import SIDECAR, SORT_KEYS, compact_partition, compact_staging
+from ff14_dataset.processing.normalize import normalize_to_staging
+
+from tests.conftest import raw_events, write_raw_fight
+
+
+FIGHTS = [("AAA", 3), ("AAA", 4), ("BBB", 1), ("CCC", 2)]
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def staged(settings):
+    """Settings compacting from 2 files up, and the partition holding one file per fight."""
+    settings = replace(settings, compaction=replace(settings.compaction, min_files=2))
+    for code, fight in FIGHTS:
+        write_raw_fight(settings, code, fight, raw_events(fight))
+    normalize_to_staging(settings)
+    files = sorted(ensure_paths(settings).staging.glob("*/*/*/report_date=*/*.parquet"))
+    assert len(files) == len(FIGHTS)
+    return settings, files[0].parent, files
+
+
+def rows(partition) -> pl.DataFrame:
+    return pl.read_parquet(sorted(partition.glob("*.parquet")))
+
+
+def test_compaction_merges_files_into_one_sorted_part(staged):
+    settings, partition, files = staged
+    before = rows(partition)
+
+    report = compact_staging(settings)
+
+    (part,) = report.parts
+    assert sorted(partition.glob("*.parquet")) == [part]
+    assert not any(f.exists() for f in files)
+    assert list(partition.glob("*.inputs")) == []
+    merged = pl.read_parquet(part)
+    assert merged.equals(merged.sort(SORT_KEYS))
+    assert merged.sort("original_json").equals(before.sort("original_json"))
+    assert orjson.loads((partition / SIDECAR).read_bytes())[part.name]["rows"] == before.height
+    # The fingerprint index follows the fights into the part: nothing is re-normalized
+    rerun = normalize_to_staging(settings)
+    assert rerun.written == [] and rerun.unchanged == len(FIGHTS)
+
+
+def test_swap_interrupted_after_the_part_landed_is_finished(staged, monkeypatch):
+    settings, partition, files = staged
+    ticks = ticks_path_for(settings, files[0])
+    ticks.parent.mkdir(parents=True, exist_ok=True)
+    ticks.write_bytes(b"stale")
+
+    def crash(settings, staging_file):
+        raise Crash
+
+    monkeypatch.setattr(compact, "_drop_curated", crash)
+    with pytest.raises(Crash):
+        compact_partition(settings, partition)
+    monkeypatch.undo()
+    (part,) = partition.glob("part-*.parquet")
+    assert all(f.exists() for f in files) and compact._journal(part).exists()
+
+    assert (
+        compact_partition(settings, partition) == []
+    )  # recovery leaves one file: nothing to merge
+    assert sorted(partition.glob("*.parquet")) == [part]
+    assert not compact._journal(part).exists() and not ticks.exists()
+    assert pl.read_parquet(part).height == sum(len(raw_events(f)) for _, f in FIGHTS)
+
+
+def test_swap_interrupted_before_the_part_landed_is_rolled_back(staged, monkeypatch):
+    settings, partition, files = staged
+    real_replace = compact.os.replace
+
+    def crash(src, dst):
+        if str(dst).endswith(".parquet") and "part-" in str(dst):
+            raise Crash
+        real_replace(src, dst)
+
+    monkeypatch.setattr(compact.os, "replace", crash)
+    with pytest.raises(Crash):
+        compact_partition(settings, partition)
+    monkeypatch.undo()
+    assert list(partition.glob("part-*.parquet")) == []
+    assert list(partition.glob("*.inputs")) and list(partition.glob("*.tmp"))
+    assert all(f.exists() for f in files)
+
+    (part,) = compact_partition(settings, partition)
+    assert sorted(partition.glob("*")) == sorted([part, partition / SIDECAR])
+    assert pl.read_parquet(part).height == sum(len(raw_events(f)) for _, f in FIGHTS)
+    assert normalize_to_staging(settings).written == []
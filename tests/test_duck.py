@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import random
+
+import duckdb
+import polars as pl
+import pytest
+
+from ff14_dataset.io.duck import DuckCatalog, PagedQuery
+from ff14_dataset.io.storage import partition_path
+
+
+# Fights of uneven length across reports, so pages straddle fight and report boundaries
+FIGHTS = {("A", 1): 3, ("A", 2): 10, ("B", 1): 1, ("B", 4): 12, ("C", 2): 5}
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    rows = [
+        (code, fight, eid, 10 * eid, "7.3x" if code != "C" else "7.2x")
+        for (code, fight), n in FIGHTS.items()
+        for eid in range(n)
+    ]
+    random.Random(7).shuffle(rows)
+    con.execute(
+        "CREATE TABLE t (report_id VARCHAR, fight_id BIGINT, event_id BIGINT, fight_ts_ms BIGINT, "
+        "game_patch VARCHAR)"
+    )
+    con.executemany("INSERT INTO t VALUES (?, ?, ?, ?, ?)", rows)
+    con.execute("CREATE VIEW events AS SELECT * FROM t")
+    con.execute("CREATE VIEW fights AS SELECT DISTINCT report_id, fight_id FROM t")
+    yield con
+    con.close()
+
+
+def expected(con, where: str = "") -> list[tuple]:
+    sql = "SELECT * FROM events" + (f" WHERE {where}" if where else "")
+    return con.execute(sql + " ORDER BY report_id, fight_id, event_id").fetchall()
+
+
+def traced(q: PagedQuery) -> list[str]:
+    """Record, per fetched page, whether it was a keyset seek or an OFFSET query."""
+    calls: list[str] = []
+    select = q._select
+
+    def spy(seek, bound, *, descending, offset=0, limit=None):
+        calls.append("offset" if offset else ("seek" if seek else "first"))
+        return select(seek, bound, descending=descending, offset=offset, limit=limit)
+
+    q._select = spy
+    return calls
+
+
+def test_sequential_pages_seek_from_the_previous_page(con):
+    q = PagedQuery(con, "events", page_rows=4)
+    calls = traced(q)
+
+    assert len(q) == sum(FIGHTS.values())
+    assert [q.row(i) for i in range(len(q))] == expected(con)
+    assert "offset" not in calls and calls[0] == "first"
+
+
+def test_backward_pages_seek_from_the_next_page(con):
+    q = PagedQuery(con, "events", page_rows=4)
+    calls = traced(q)
+    last = (len(q) - 1) // 4
+
+    got = [q.page(n) for n in range(last, -1, -1)]
+
+    assert [r for page in reversed(got) for r in page] == expected(con)
+    assert calls.count("offset") == 1  # only the jump to the last page
+
+
+def test_random_access_and_page_cache_bound(con):
+    q = PagedQuery(con, "events", page_rows=3, max_pages=2)
+    rows = expected(con)
+    for i in random.Random(1).sample(range(len(rows)), len(rows)):
+        assert q.row(i) == rows[i]
+    assert len(q._pages) == 2
+
+
+def test_filters_and_where_apply_to_count_and_pages(con):
+    q = PagedQuery(
+        con, "events", filters={"game_patch": "7.3x"}, where="fight_ts_ms >= 20", page_rows=4
+    )
+    want = expected(con, "game_patch = '7.3x' AND fight_ts_ms >= 20")
+
+    assert len(q) == len(want)
+    assert [q.row(i) for i in range(len(q))] == want
+    with pytest.raises(ValueError):
+        PagedQuery(con, "events", filters={"nope": 1})
+
+
+def test_views_without_a_key_page_by_offset(con):
+    q = PagedQuery(con, "fights", page_rows=2)
+    calls = traced(q)
+    want = con.execute("SELECT * FROM fights ORDER BY ALL").fetchall()
+
+    assert q.key == ()
+    assert [q.row(i) for i in range(len(q))] == want
+    assert "seek" not in calls
+
+
+def write_events(settings, patch: str, job: str, month: str, code: str, amounts: list[int]):
+    """Staging fight file: one damage event per amount, by actors 1 and 2 in turn."""
+    part = partition_path(settings, "staging", patch, "Test Boss", job, month)
+    part.mkdir(parents=True, exist_ok=True)
+    path = part / f"{code}_1.parquet"
+    pl.DataFrame(
+        {
+            "report_id": code,
+            "fight_id": 1,
+            "event_id": range(len(amounts)),
+            "fight_ts_ms": [100 * i for i in range(len(amounts))],
+            "event_type": "damage",
+            "source_id": [1 + i % 2 for i in range(len(amounts))],
+            "amount": amounts,
+        }
+    ).write_parquet(path)
+    return path
+
+
+def test_catalog_views_and_incremental_summary(settings):
+    write_events(settings, "7.3x", "SAM", "2025-01", "AAA", [10, 20, 30])
+    write_events(settings, "7.3x", "SAM", "2025-02", "BBB", [5])
+    deleted = write_events(settings, "7.2x", "DRG", "2025-01", "CCC", [1, 2])
+    catalog = DuckCatalog(settings, duckdb.connect())
+    summary = "SELECT report_id, job, events, actors, damage FROM fight_summary ORDER BY ALL"
+    try:
+        # No metrics files: the derived participants view is skipped
+        assert catalog.register_all() == ["events"]
+        assert catalog.con.execute(
+            "SELECT game_patch, encounter_name, job, report_date, count(*) FROM events "
+            "GROUP BY ALL ORDER BY ALL"
+        ).fetchall() == [
+            ("7.2x", "test-boss", "DRG", "2025-01", 2),
+            ("7.3x", "test-boss", "SAM", "2025-01", 3),
+            ("7.3x", "test-boss", "SAM", "2025-02", 1),
+        ]
+        # Partition predicates prune to the matching files
+        assert catalog.con.execute(
+            "SELECT DISTINCT report_id FROM events WHERE job = 'SAM' AND report_date = '2025-02'"
+        ).fetchall() == [("BBB",)]
+
+        assert catalog.refresh_summary("fight_summary") == (3, 0)
+        assert catalog.refresh_summary("fight_summary") == (0, 0)
+
+        write_events(settings, "7.3x", "SAM", "2025-02", "BBB", [5, 6, 7, 8])
+        deleted.unlink()
+        assert catalog.refresh_summary("fight_summary") == (1, 1)
+        assert catalog.con.execute(summary).fetchall() == [
+            ("AAA", "SAM", 3, 2, 60),
+            ("BBB", "SAM", 4, 2, 26),
+        ]
+        assert catalog.con.execute(
+            "SELECT count(*) FROM _catalog_files WHERE summary = 'fight_summary'"
+        ).fetchone() == (2,)
+    finally:
+        catalog.close()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import polars as pl
+
+from ff14_dataset.features.build import build_features_from_ticks
+from ff14_dataset.features.layout import layout_from_records
+from ff14_dataset.features.mask import add_action_mask, availability_exprs, mask_bit
+from ff14_dataset.features.ticks import build_ticks
+from ff14_dataset.processing.normalize import EVENTS_SCHEMA
+
+
+GCD_A, GCD_B, OGCD_X, OGCD_Y = 10, 11, 20, 21
+
+
+def events(rows: list[tuple[int, int, str, int]]) -> pl.DataFrame:
+    """Staging events from (event_id, fight_ts_ms, event_type, ability_id), all by actor 1."""
+    return pl.DataFrame(
+        [
+            {
+                "event_id": eid,
+                "fight_id": 1,
+                "report_id": "R",
+                "ts_ms": 1_000 + ts,
+                "fight_ts_ms": ts,
+                "event_type": etype,
+                "source_id": 1,
+                "target_id": 2,
+                "ability_id": ability,
+            }
+            for eid, ts, etype, ability in rows
+        ],
+        schema=EVENTS_SCHEMA,
+    )
+
+
+def test_same_millisecond_events_follow_event_id():
+    rows = [
+        (0, 0, "cast", GCD_A),
+        (1, 500, "cast", OGCD_X),
+        (2, 500, "cast", OGCD_Y),
+        (3, 2_500, "cast", GCD_B),
+        (4, 2_500, "applybuff", 0),
+        (5, 2_500, "removebuff", 0),
+    ]
+    ev = events(rows)
+    results = []
+    for seed in range(5):
+        shuffled = ev.sample(fraction=1.0, shuffle=True, seed=seed)
+        ticks = build_ticks(shuffled, 100, gcd_ability_ids=[GCD_A, GCD_B]).collect()
+        labels = build_features_from_ticks(ticks, shuffled, [GCD_A, GCD_B]).collect()
+        results.append((ticks, labels))
+
+    for ticks, labels in results:
+        assert ticks.equals(results[0][0]) and labels.equals(results[0][1])
+    ticks, labels = results[0]
+
+    def at(frame, ms):
+        return frame.filter(pl.col("fight_ts_ms") == ms).row(0, named=True)
+
+    assert at(ticks, 500)["last_ability_id"] == OGCD_Y
+    assert at(ticks, 2_500)["active_buffs"] == 0  # apply then remove in the same ms
+    assert at(labels, 100)["label_ogcd_list"] == [OGCD_X, OGCD_Y]
+    assert at(labels, 100)["label_next_gcd"] == GCD_B
+
+
+def action(aid: int, gcd: bool = False, recast_ms: int = 1_000, charges: int = 0) -> dict:
+    return {
+        "id": aid,
+        "job_abbr": "SAM",
+        "category": "Weaponskill" if gcd else "Ability",
+        "is_gcd": gcd,
+        "base_recast_ms": 2_500 if gcd else recast_ms,
+        "charges_max": charges,
+        "status_ids_applied": [],
+    }
+
+
+def test_action_mask_packs_more_than_64_actions():
+    # 70 actions: GCDs 1-3 (2 combos from 1), a 30s cooldown on the last bit of word 0 (64),
+    # a 2-charge 60s cooldown on the first bit of word 1 (65), plain oGCDs otherwise
+    records = [action(i, gcd=i <= 3) for i in range(1, 71)]
+    records[63] = action(64, recast_ms=30_000)
+    records[64] = action(65, recast_ms=60_000, charges=2)
+    layout = layout_from_records(records, "SAM")
+    combo = {2: [1]}
+    casts = [
+        (0, 1),
+        (700, 64),
+        (1_400, 65),
+        (2_100, 65),
+        (2_500, 1),
+        (5_500, 2),
+        (8_000, 3),
+        (11_000, 70),
+    ]
+    ev = events([(i, ts, "cast", aid) for i, (ts, aid) in enumerate(casts)])
+    ticks = add_action_mask(build_ticks(ev, 100, layout=layout), layout, combo).collect()
+
+    assert layout.mask_words == 2
+    assert ticks.schema["action_mask"] == pl.Array(pl.UInt64, 2)
+    # Every bit, packed and read back, matches its availability expression
+    avail = ticks.select(
+        pl.concat_list(availability_exprs(layout, combo)).alias("avail"), "action_mask"
+    )
+    for bits, words in avail.iter_rows():
+        assert words == [
+            sum(1 << (i - 64 * w) for i, on in enumerate(bits) if on and i // 64 == w)
+            for w in range(2)
+        ]
+    can = ticks.select(
+        "fight_ts_ms", *(mask_bit(layout, aid) for aid in (1, 2, 3, 64, 65, 70))
+    ).rows_by_key("fight_ts_ms", named=True, unique=True)
+    assert avail.height == len(can) == 111
+
+    def usable(ms):
+        return {aid for aid in (1, 2, 3, 64, 65, 70) if can[ms][f"can_{aid}"]}
+
+    assert usable(500) == set()  # animation lock after the opener
+    assert usable(600) == {64, 65, 70}  # oGCDs only: the GCD is still rolling
+    assert usable(1_300) == {65, 70}  # 64 on cooldown
+    assert usable(2_000) == {65, 70}  # one charge of 65 left
+    assert usable(3_200) == {70}  # both charges spent
+    assert usable(5_000) == {1, 2, 3, 70}  # GCD rolled, combo step 1
+    assert usable(10_500) == {1, 3, 70}  # combo moved on
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from ff14_dataset.ingestion.fflogs_client import GqlRequest
+from ff14_dataset.ingestion.ratelimit import RateLimitScheduler
+from ff14_dataset.io.http_cache import CacheMiss, ResponseCache
+
+from tests.conftest import rate_limit
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _closing(client, coro):
+    try:
+        return await coro
+    finally:
+        await client.close()
+
+
+def test_gql_many_batches_by_cost_and_keeps_order(stub_fflogs):
+    def handler(query, variables):
+        aliases = sorted({k.split("_", 1)[0] for k in variables})
+        data = {a: {"code": variables[f"{a}_code"]} for a in aliases}
+        data["rateLimitData"] = rate_limit()
+        return {"data": data}
+
+    stub = stub_fflogs(handler)
+    client = stub.client(batch_max_cost=2)
+    reqs = [
+        GqlRequest(
+            key=f"r{i}",
+            selection="report(code: $code) { code }",
+            variables={"code": f"C{i}"},
+            var_types={"code": "String"},
+        )
+        for i in range(5)
+    ]
+    results = _run(_closing(client, client.gql_many(reqs)))
+
+    assert len(stub.queries) == 3  # 2 + 2 + 1
+    assert [r.key for r in results] == [f"r{i}" for i in range(5)]
+    assert [r.data["report"]["code"] for r in results] == [f"C{i}" for i in range(5)]
+    assert all(r.ok for r in results)
+
+
+def test_gql_many_isolates_errors_per_alias(stub_fflogs):
+    def handler(query, variables):
+        return {
+            "data": {"q0": {"id": 1}, "q1": None, "q2": {"id": 3}, "rateLimitData": rate_limit()},
+            "errors": [{"message": "not found", "path": ["q1", "report"]}],
+        }
+
+    stub = stub_fflogs(handler)
+    client = stub.client()
+    reqs = [GqlRequest(key=str(i), selection="report { id }") for i in range(3)]
+    r0, r1, r2 = _run(_closing(client, client.gql_many(reqs)))
+
+    assert len(stub.queries) == 1
+    assert r0.ok and r2.ok and r0.data == {"report": {"id": 1}}
+    assert not r1.ok and r1.errors[0]["message"] == "not found"
+
+
+def test_iter_event_pages_follows_next_page_timestamp(stub_fflogs):
+    pages = {
+        0.0: ([{"timestamp": 1}, {"timestamp": 2}], 10.0),
+        10.0: ([{"timestamp": 10}], 20.0),
+        20.0: ([], None),
+    }
+
+    def handler(query, variables):
+        events, nxt = pages[variables["start"]]
+        report = {"events": {"data": events, "nextPageTimestamp": nxt}}
+        return {"data": {"reportData": {"report": report}, "rateLimitData": rate_limit()}}
+
+    stub = stub_fflogs(handler)
+    client = stub.client()
+
+    async def collect():
+        return [page async for page in client.iter_event_pages("ABC", 3, 0.0, 100.0)]
+
+    got = _run(_closing(client, collect()))
+
+    assert got == [
+        ([{"timestamp": 1}, {"timestamp": 2}], 10.0),
+        ([{"timestamp": 10}], 20.0),
+        ([], None),
+    ]
+    assert [v["start"] for _, v in stub.queries] == [0.0, 10.0, 20.0]
+    assert all(v["fights"] == [3] and v["end"] == 100.0 for _, v in stub.queries)
+
+
+def test_429_backs_off_and_retries(stub_fflogs):
+    calls = []
+
+    def handler(query, variables):
+        calls.append(query)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return {"data": {"worldData": {"zones": []}, "rateLimitData": rate_limit()}}
+
+    stub = stub_fflogs(handler)
+    client = stub.client(concurrency=4)
+    data = _run(_closing(client, client.list_zones()))
+
+    assert data["worldData"] == {"zones": []}
+    assert len(calls) == 2
+    status = client.rate_limit_status()
+    assert status.concurrency == 2  # halved by the 429
+    assert status.rate_per_s < 10.0  # rate halved (then retuned from rateLimitData)
+
+
+def test_429_gives_up_after_max_retries(stub_fflogs):
+    stub = stub_fflogs(lambda q, v: httpx.Response(429, headers={"Retry-After": "0"}))
+    client = stub.client()
+    client.max_throttle_retries = 2
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _run(_closing(client, client.list_zones()))
+    assert len(stub.queries) == 3
+
+
+def test_scheduler_grows_concurrency_above_start_up_to_ceiling():
+    sched = RateLimitScheduler(max_concurrency=4, initial_concurrency=2)
+    assert sched.status().concurrency == 2
+    for _ in range(200):
+        sched.on_success()
+    assert sched.status().concurrency == 4
+    sched.on_throttled(0)
+    assert sched.status().concurrency == 2
+
+
+def test_offline_mode_serves_cache_and_never_touches_the_network(stub_fflogs, tmp_path):
+    zones = {
+        "worldData": {"zones": [{"id": 1, "name": "Tier", "difficulties": [], "encounters": []}]}
+    }
+    online = stub_fflogs(lambda q, v: {"data": {**zones, "rateLimitData": rate_limit()}})
+    client = online.client(cache=ResponseCache(tmp_path))
+    _run(_closing(client, client.list_zones()))
+    assert len(online.queries) == 1
+
+    offline = stub_fflogs()
+    client = offline.client(cache=ResponseCache(tmp_path, offline=True))
+
+    async def session():
+        assert (await client.list_zones())["worldData"] == zones["worldData"]
+        with pytest.raises(CacheMiss):  # events are never cached (ttl 0)
+            async for _ in client.iter_event_pages("ABC", 1, 0.0, 10.0):
+                pass
+        with pytest.raises(CacheMiss):  # no cache kind at all
+            await client.refresh_rate_limit()
+        with pytest.raises(CacheMiss):
+            await client.gql_many(
+                [GqlRequest(key="x", selection="report { id }", cache_kind="report")]
+            )
+
+    _run(_closing(client, session()))
+    assert offline.requests == []  # not even a token request
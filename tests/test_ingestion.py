@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+
+import orjson
+import pytest
+
+from ff14_dataset.ingestion.pipeline import IngestionRequest, ingest_encounters
+from ff14_dataset.io.segments import open_store
+from ff14_dataset.io.storage import ensure_paths
+
+from tests.conftest import rate_limit
+
+
+ZONES = {
+    "worldData": {
+        "zones": [
+            {
+                "id": 1,
+                "name": "Tier",
+                "difficulties": [],
+                "encounters": [{"id": 93, "name": "Test Boss"}],
+            }
+        ]
+    }
+}
+# Samurai and Dragoon both ranked AAA#3; only Dragoon ranked BBB#5
+RANKED = {"Samurai": [("AAA", 3)], "Dragoon": [("AAA", 3), ("BBB", 5)]}
+FIGHTS = {"AAA": 3, "BBB": 5}
+
+
+def stub_handler(events_calls: list):
+    def handler(query, variables):
+        if "events(" in query:
+            events_calls.append((variables["code"], variables["fights"][0]))
+            page = {
+                "data": [
+                    {
+                        "timestamp": 100,
+                        "type": "cast",
+                        "sourceID": 1,
+                        "fight": variables["fights"][0],
+                    }
+                ],
+                "nextPageTimestamp": None,
+            }
+            return {
+                "data": {"reportData": {"report": {"events": page}}, "rateLimitData": rate_limit()}
+            }
+        if "characterRankings" in query:
+            rankings = [
+                {"rankPercent": 99, "report": {"code": c, "fightID": f}}
+                for c, f in RANKED[variables["cls"]]
+            ]
+            enc = {"characterRankings": {"rankings": rankings, "hasMorePages": False}}
+            return {"data": {"worldData": {"encounter": enc}, "rateLimitData": rate_limit()}}
+        if "zones" in query:
+            return {"data": {**ZONES, "rateLimitData": rate_limit()}}
+        # batched report fights
+        data = {"rateLimitData": rate_limit()}
+        for name, code in variables.items():
+            fight = {
+                "id": FIGHTS[code],
+                "encounterID": 93,
+                "name": "Test Boss",
+                "kill": True,
+                "startTime": 0,
+                "endTime": 1000,
+                "difficulty": 101,
+            }
+            data[name.split("_", 1)[0]] = {
+                "report": {
+                    "code": code,
+                    "startTime": 1735689600000,
+                    "endTime": 0,
+                    "zone": None,
+                    "fights": [fight],
+                }
+            }
+        return {"data": data}
+
+    return handler
+
+
+def _ingest(settings, stub, jobs):
+    req = IngestionRequest(
+        encounters=["93"], patches=["7.3x"], jobs=jobs, min_percentile=90, kills_only=True
+    )
+    client = stub.client()
+
+    async def run():
+        try:
+            return await ingest_encounters(settings, req, client)
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def _by_job(paths, raw):
+    return sorted((p.relative_to(raw).parts[2], p.name.split(".", 1)[0]) for p in paths)
+
+
+@pytest.mark.parametrize("layout", ["files", "segments"])
+def test_fight_ranked_by_several_jobs_is_downloaded_once_and_placed_under_each(
+    settings, stub_fflogs, layout
+):
+    settings = replace(settings, ingestion=replace(settings.ingestion, raw_layout=layout))
+    raw = ensure_paths(settings).raw
+    calls: list = []
+    paths = _ingest(settings, stub_fflogs(stub_handler(calls)), ["SAM", "DRG"])
+
+    assert sorted(calls) == [("AAA", 3), ("BBB", 5)]
+    assert _by_job(paths, raw) == [("DRG", "AAA_3"), ("DRG", "BBB_5"), ("SAM", "AAA_3")]
+    if layout == "files":
+        for p in paths:
+            assert p.read_bytes().count(b"\n") == 1
+            meta = orjson.loads(p.with_name(p.name.split(".", 1)[0] + ".fight.json").read_bytes())
+            assert meta["job"] == p.relative_to(raw).parts[2]
+    else:
+        store = open_store(raw, settings.ingestion.segment_max_mb)
+        try:
+            listed = sorted(
+                (part.relative_to(raw).parts[2], f"{code}_{fid}")
+                for code, fid, part, _ in store.fights()
+            )
+        finally:
+            store.close()
+        assert listed == [("DRG", "AAA_3"), ("DRG", "BBB_5"), ("SAM", "AAA_3")]
+
+    # A rerun downloads nothing and still reports every placement
+    calls.clear()
+    again = _ingest(settings, stub_fflogs(stub_handler(calls)), ["SAM", "DRG"])
+    assert calls == []
+    assert _by_job(again, raw) == _by_job(paths, raw)
+
+
+def test_completed_fight_is_placed_for_a_newly_requested_job(settings, stub_fflogs):
+    raw = ensure_paths(settings).raw
+    calls: list = []
+    _ingest(settings, stub_fflogs(stub_handler(calls)), ["DRG"])
+    calls.clear()
+    paths = _ingest(settings, stub_fflogs(stub_handler(calls)), ["SAM"])
+
+    assert calls == []
+    assert _by_job(paths, raw) == [("SAM", "AAA_3")]
+    assert paths[0].exists()
+
+
+def test_failed_fight_is_logged_and_the_others_still_land(settings, stub_fflogs, caplog):
+    raw = ensure_paths(settings).raw
+    calls: list = []
+    ok = stub_handler(calls)
+
+    def handler(query, variables):
+        if "events(" in query and variables["code"] == "BBB":
+            return {"errors": [{"message": "boom"}]}
+        return ok(query, variables)
+
+    paths = _ingest(settings, stub_fflogs(handler), ["SAM", "DRG"])
+
+    assert _by_job(paths, raw) == [("DRG", "AAA_3"), ("SAM", "AAA_3")]
+    assert "BBB#5 failed" in caplog.text
+    # The failed fight is picked up again by the next run
+    calls.clear()
+    again = _ingest(settings, stub_fflogs(stub_handler(calls)), ["SAM", "DRG"])
+    assert calls == [("BBB", 5)]
+    assert _by_job(again, raw) == [("DRG", "AAA_3"), ("DRG", "BBB_5"), ("SAM", "AAA_3")]
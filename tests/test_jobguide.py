@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from dataclasses import asdict
+from pathlib import Path
+
+import orjson
+import pytest
+
+from ff14_dataset.scraper import jobguide
+from ff14_dataset.scraper.jobguide import parse_job_actions
+
+
+# Trimmed Job Guide pages; actions.json is what the single-backend parser they replaced
+# returned for them, so both backends are pinned to the old output
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "jobguide"
+PAGES = sorted(FIXTURES.glob("*.html"))
+
+
+@pytest.mark.parametrize("backend", ["soup", "lxml"])
+@pytest.mark.parametrize("page", PAGES, ids=lambda p: p.stem)
+def test_backends_match_the_previous_parser(page, backend):
+    if backend == "lxml" and jobguide.lxml is None:
+        pytest.skip("lxml is not installed")
+    expected = orjson.loads((FIXTURES / "actions.json").read_bytes())[page.stem]
+    actions = parse_job_actions(page.read_text(encoding="utf-8"), backend=backend)
+    assert [asdict(a) for a in actions] == expected
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import math
+
+import orjson
+import polars as pl
+import pytest
+
+from ff14_dataset.metrics import intervals as iv
+from ff14_dataset.metrics.compute import compute_job_metrics
+from ff14_dataset.metrics.registry import JobMetricsPlugin
+from ff14_dataset.processing.normalize import EVENTS_SCHEMA
+
+
+SAM, DRG = 1, 2  # actor ids; 3 and 4 are party members of jobs without a plugin
+LITANY, DANCE = 9000, 9001
+RAID_BUFFS = {LITANY: 0.10, DANCE: 0.05}
+PLUGINS = [
+    JobMetricsPlugin("SAM", signature=(100,), gcds=(100,)),
+    JobMetricsPlugin("DRG", signature=(200,), gcds=(200,)),
+]
+
+
+def events(rows: list[tuple]) -> pl.DataFrame:
+    """Staging events from (fight_ts_ms, event_type, source, target, ability, status, amount)."""
+    return pl.DataFrame(
+        [
+            {
+                "event_id": i,
+                "fight_id": 1,
+                "report_id": "R",
+                "ts_ms": ts,
+                "fight_ts_ms": ts,
+                "event_type": et,
+                "source_id": src,
+                "target_id": tgt,
+                "ability_id": ability,
+                "status_id": status,
+                "amount": amount,
+            }
+            for i, (ts, et, src, tgt, ability, status, amount) in enumerate(rows)
+        ],
+        schema=EVENTS_SCHEMA,
+    )
+
+
+def test_raid_buff_damage_is_credited_to_the_buff_source():
+    ev = events(
+        [
+            (0, "cast", SAM, 99, 100, None, None),
+            (0, "cast", DRG, 99, 200, None, None),
+            (1_000, "applybuff", DRG, SAM, None, LITANY, None),
+            (1_500, "applybuff", 4, SAM, None, LITANY, None),  # same buff, later: does not stack
+            (2_000, "damage", SAM, 99, None, None, 1_100),  # x1.10
+            (2_000, "damage", DRG, 99, None, None, 1_000),
+            (2_500, "removebuff", 4, SAM, None, LITANY, None),
+            (3_000, "applybuff", 3, SAM, None, DANCE, None),
+            (4_000, "damage", SAM, 99, None, None, 1_155),  # x1.10 x1.05
+            (5_000, "removebuff", DRG, SAM, None, LITANY, None),
+            (5_000, "removebuff", 3, SAM, None, DANCE, None),
+            (10_000, "damage", DRG, 99, None, None, 0),
+        ]
+    )
+    m = {
+        r["actor_id"]: r for r in compute_job_metrics(ev, PLUGINS, RAID_BUFFS).iter_rows(named=True)
+    }
+
+    litany_share = math.log1p(0.10) / (math.log1p(0.10) + math.log1p(0.05))
+    given = 100 + 155 * litany_share
+    assert m[SAM]["aDPS"] == pytest.approx(2_255 / 10)
+    assert m[SAM]["rDPS"] == pytest.approx(2_000 / 10)
+    assert m[DRG]["aDPS"] == pytest.approx((1_000 + given) / 10)
+    assert m[DRG]["rDPS"] == pytest.approx((1_000 + given) / 10)
+
+
+def test_same_ms_remove_then_reapply_keeps_the_status_up():
+    BUFF = 500
+    ev = events(
+        [
+            (0, "applybuff", SAM, SAM, None, BUFF, None),
+            (1_000, "removebuff", SAM, SAM, None, BUFF, None),
+            (1_000, "applybuff", SAM, SAM, None, BUFF, None),
+            (5_000, "removebuff", SAM, SAM, None, BUFF, None),
+            (8_000, "damage", SAM, 99, None, None, 100),
+        ]
+    )
+    keys = ["report_id", "fight_id", "target_id"]
+    for seed in range(20):
+        shuffled = ev.sample(fraction=1.0, shuffle=True, seed=seed).lazy()
+        spans = iv.status_intervals(shuffled, [BUFF], ["report_id", "fight_id"])
+        covered = iv.coverage(iv.union(spans, keys), keys).collect()
+        assert covered["covered_ms"].to_list() == [5_000]
+
+
+def spans(rows: list[tuple], **keys: list) -> pl.LazyFrame:
+    """Intervals from (start, end) pairs plus equal-length key columns."""
+    return pl.LazyFrame(
+        {**keys, "start": [s for s, _ in rows], "end": [e for _, e in rows]},
+        schema_overrides={"start": pl.Int64, "end": pl.Int64},
+    )
+
+
+def pairs(frame: pl.LazyFrame, *keys: str) -> list[tuple]:
+    return frame.select(*keys, "start", "end").collect().sort(*keys, "start").rows()
+
+
+def test_union_merges_touching_and_overlapping_spans():
+    frame = spans([(0, 10), (10, 20), (15, 30), (40, 50)], g=[1, 1, 1, 1])
+    assert pairs(iv.union(frame, ["g"]), "g") == [(1, 0, 30), (1, 40, 50)]
+    assert iv.coverage(iv.union(frame, ["g"]), ["g"]).collect().rows() == [(1, 40)]
+
+
+def test_sweep_takes_the_threshold_per_group():
+    frame = spans([(0, 10), (5, 15), (0, 10), (20, 30)], g=["a", "a", "b", "b"], k=[2, 2, 1, 1])
+    assert pairs(iv.sweep([frame], ["g", "k"], "k"), "g") == [
+        ("a", 5, 10),
+        ("b", 0, 10),
+        ("b", 20, 30),
+    ]
+
+
+def test_intersect_and_intersect_sets_agree():
+    a = spans([(0, 10), (20, 30)], g=[1, 1], s=[1, 1])
+    b = spans([(5, 25)], g=[1], s=[2])
+    expected = [(1, 5, 10), (1, 20, 25)]
+    assert pairs(iv.intersect([a, b], ["g"]), "g") == expected
+    # Group 2 has only one of its two sets, so it is never fully covered
+    lone = spans([(0, 30)], g=[2], s=[1])
+    both = pl.concat([a, b, lone]).with_columns(k=pl.lit(2))
+    assert pairs(iv.intersect_sets(both, ["g", "k"], "s", "k"), "g") == expected
+
+
+def test_claim_first_keeps_the_earlier_then_longer_then_tiebreak_span():
+    frame = spans([(0, 10), (5, 15), (0, 4), (20, 30), (20, 30)], g=[1] * 5, src=[7, 8, 9, 2, 1])
+    claimed = iv.claim_first(frame, ["g"], ["src"])
+    assert pairs(claimed, "g", "src") == [(1, 1, 20, 30), (1, 7, 0, 10), (1, 8, 10, 15)]
+
+
+def test_status_intervals_handle_pre_pull_removes_and_statuses_never_removed():
+    ev = events(
+        [
+            (0, "cast", SAM, 99, 100, None, None),
+            (3_000, "removebuff", SAM, SAM, None, 1, None),  # applied before the pull
+            (4_000, "applybuff", SAM, SAM, None, 2, None),  # never removed
+            (4_500, "applybuff", SAM, SAM, None, 2, None),  # re-apply while active
+            (10_000, "damage", SAM, 99, None, None, 100),
+        ]
+    )
+    out = iv.status_intervals(ev.lazy(), [1, 2], ["report_id", "fight_id"])
+    assert pairs(out, "status_id") == [(1, 0, 3_000), (2, 4_000, 10_000)]
+
+
+def test_gcd_dot_and_buff_window_uptimes():
+    DOT, BUFF_A, BUFF_B = 600, 601, 602
+    plugin = JobMetricsPlugin(
+        "SAM", signature=(100,), gcds=(100,), dots=(DOT,), buff_window=(BUFF_A, BUFF_B)
+    )
+    ev = events(
+        [
+            # GCD gaps 2.4s, 2.4s, 2.2s -> recast 2.4s: [0, 7200) u [7000, 9400)
+            (0, "cast", SAM, 99, 100, None, None),
+            (0, "applybuff", SAM, SAM, None, BUFF_A, None),  # never removed
+            (1_000, "applydebuff", SAM, 99, None, DOT, None),
+            (2_000, "removebuff", SAM, SAM, None, BUFF_B, None),  # up since before the pull
+            (2_400, "cast", SAM, 99, 100, None, None),
+            (3_500, "applydebuff", SAM, 98, None, DOT, None),  # second target overlaps
+            (4_000, "removedebuff", SAM, 99, None, DOT, None),
+            (4_800, "cast", SAM, 99, 100, None, None),
+            (6_000, "removedebuff", SAM, 98, None, DOT, None),
+            (6_000, "applybuff", SAM, SAM, None, BUFF_B, None),
+            (7_000, "cast", SAM, 99, 100, None, None),
+            (9_000, "removebuff", SAM, SAM, None, BUFF_B, None),
+            (10_000, "damage", SAM, 99, None, None, 100),
+            (10_000, "cast", DRG, 99, 200, None, None),
+        ]
+    )
+    m = {
+        r["job"]: r for r in compute_job_metrics(ev, [plugin, PLUGINS[1]], {}).iter_rows(named=True)
+    }
+
+    assert m["SAM"]["gcd_uptime_pct"] == pytest.approx(94.0)
+    assert m["SAM"]["dot_uptime_pct"] == pytest.approx(50.0)  # [1000, 6000)
+    assert m["SAM"]["buff_window_uptime_pct"] == pytest.approx(50.0)  # [0, 2000) u [6000, 9000)
+    assert orjson.loads(m["SAM"]["windows_json"]) == {
+        "dots": [[1_000, 6_000]],
+        "buff_window": [[0, 2_000], [6_000, 9_000]],
+    }
+    # No DoTs or buff window declared: null rather than 0
+    assert m["DRG"]["dot_uptime_pct"] is None
+    assert m["DRG"]["buff_window_uptime_pct"] is None
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import os
+
+import orjson
+import polars as pl
+import pytest
+
+from ff14_dataset.ingestion.manifest import IngestManifest
+from ff14_dataset.io.ndjson import zstandard
+from ff14_dataset.io.storage import ensure_paths
+from ff14_dataset.processing.normalize import normalize_to_staging, scan_raw_events
+
+from tests.conftest import raw_events, write_raw_fight
+
+
+@pytest.mark.parametrize(
+    "suffix",
+    [
+        ".ndjson",
+        pytest.param(
+            ".ndjson.zst", marks=pytest.mark.skipif(zstandard is None, reason="zstandard")
+        ),
+    ],
+)
+def test_original_json_is_the_raw_line(settings, suffix):
+    events = raw_events(3)
+    path = write_raw_fight(settings, "AAA", 3, events, suffix)
+    out = scan_raw_events(path).collect()
+
+    assert out["original_json"].to_list() == [orjson.dumps(e).decode() for e in events]
+    assert out["event_id"].to_list() == list(range(len(events)))
+    assert out["fight_ts_ms"].to_list() == [10 * i for i in range(len(events))]
+    assert out["amount"].to_list() == [e["amount"] for e in events]
+    assert out.schema["ts_ms"] == pl.Int64
+
+
+def test_normalize_is_incremental(settings):
+    a = write_raw_fight(settings, "AAA", 3, raw_events(3))
+    write_raw_fight(settings, "BBB", 7, raw_events(7))
+
+    first = normalize_to_staging(settings, workers=1)
+    assert sorted(p.name for p in first.written) == ["AAA_3.parquet", "BBB_7.parquet"]
+    out_a, out_b = sorted(first.written)
+
+    again = normalize_to_staging(settings)
+    assert (again.written, again.unchanged, again.removed) == ([], 2, [])
+
+    # Same content, new mtime: the content hash decides, nothing is rewritten
+    os.utime(a, ns=(a.stat().st_atime_ns, a.stat().st_mtime_ns + 10**9))
+    touched = normalize_to_staging(settings)
+    assert (touched.written, touched.unchanged) == ([], 2)
+
+    # Changed content: only that file is rebuilt
+    write_raw_fight(settings, "BBB", 7, raw_events(7, n=9))
+    changed = normalize_to_staging(settings)
+    assert changed.written == [out_b] and changed.unchanged == 1
+    assert pl.read_parquet(out_b).height == 9
+
+    # Deleted raw file: its output goes too
+    a.unlink()
+    removed = normalize_to_staging(settings)
+    assert removed.removed == [out_a] and not out_a.exists()
+
+    assert normalize_to_staging(settings, full=True).written == [out_b]
+
+
+def test_normalize_skips_fights_still_downloading(settings):
+    path = write_raw_fight(settings, "AAA", 3, raw_events(3))
+    manifest = IngestManifest(ensure_paths(settings).manifest_file)
+    try:
+        manifest.start("AAA", 3, path, 0.0)
+        report = normalize_to_staging(settings)
+        assert (report.written, report.skipped_in_flight) == ([], 1)
+        manifest.complete("AAA", 3, path.stat().st_size, 5)
+        assert len(normalize_to_staging(settings).written) == 1
+    finally:
+        manifest.close()
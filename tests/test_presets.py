@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import pytest
+
+from ff14_dataset.io.presets import ActionCatalog, load_catalog
+
+from tests.conftest import DEFAULT_CONFIG
+
+
+PRESET = DEFAULT_CONFIG.parent / "presets" / "actions-7.3x-combat-all+tags.json"
+
+RECORDS = [
+    {"id": 1, "job_abbr": "PLD", "name_en": "Fast Blade", "tags": ["gcd"], "cooldown_group": 58},
+    {"id": 7, "job_abbr": "PLD", "name_en": "Provoke", "tags": ["taunt", "ogcd"]},
+    {"id": 7, "job_abbr": "WAR", "name_en": "Provoke", "tags": ["taunt", "ogcd"]},
+    {"id": 31, "job_abbr": "WAR", "name_en": "Heavy Swing", "tags": [], "cooldown_group": 58},
+]
+
+
+def test_rows_use_the_job_composite_index():
+    catalog = ActionCatalog.from_records(RECORDS)
+
+    assert catalog.rows("id", 7) == (1, 2)
+    assert catalog.rows("id", 7, "WAR") == (2,)
+    assert catalog.rows("tags", "taunt", "PLD") == (1,)
+    assert catalog.rows("tags", "gcd", "WAR") == ()
+    assert catalog.rows("missing", 1, "PLD") == ()
+    assert catalog.index("tags", by_job=True)[("WAR", "ogcd")] == (2,)
+    assert catalog.index("id", by_job=True) is catalog.index("id", by_job=True)  # built once
+    assert catalog.cooldown_group(58, "WAR") == (31,)
+    assert catalog.by_name("Provoke", "PLD") == [catalog.records([1])[0]]
+
+
+@pytest.mark.skipif(not PRESET.exists(), reason="action preset")
+def test_composite_index_agrees_with_filtering_by_job():
+    catalog = load_catalog(PRESET)
+    jobs = catalog.frame["job_abbr"].to_list()
+    for tag in list(catalog.index("tags"))[:20]:
+        for job in set(jobs):
+            expected = tuple(i for i in catalog.rows("tags", tag) if jobs[i] == job)
+            assert catalog.rows("tags", tag, job) == expected
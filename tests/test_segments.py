@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+
+import orjson
+import pytest
+
+from ff14_dataset.ingestion.manifest import IngestManifest
+from ff14_dataset.ingestion.pipeline import FightUnit, stream_fight_events
+from ff14_dataset.io.ndjson import NdjsonAppender, zstandard
+from ff14_dataset.io.segments import SegmentStore, fight_ref
+from ff14_dataset.processing.normalize import scan_raw_events
+
+from tests.conftest import raw_events, rate_limit
+
+
+pytestmark = pytest.mark.skipif(zstandard is None, reason="zstandard")
+
+# Three event pages of fight AAA#3, keyed by their start cursor: (events, next cursor)
+PAGES = {
+    0.0: (raw_events(3, 4)[:2], 10.0),
+    10.0: (raw_events(3, 4)[2:], 20.0),
+    20.0: ([{"timestamp": 100_050, "type": "cast", "sourceID": 6, "fight": 3}], None),
+}
+ALL_EVENTS = [e for events, _ in PAGES.values() for e in events]
+
+
+class Crash(Exception):
+    pass
+
+
+def lines(data: bytes) -> list[bytes]:
+    return data.splitlines()
+
+
+def test_truncate_fight_forgets_frames_past_the_kept_bytes(tmp_path):
+    part = tmp_path / "7.3x" / "test-boss" / "SAM" / "report_date=2025-01"
+    with SegmentStore(tmp_path) as store:
+        store.put_fight(
+            part, "AAA", 3, {"report_start_ms": 1_735_689_600_000, "start_time": 100_000}
+        )
+        kept = store.append_page(part, "AAA", 3, PAGES[0.0][0])
+        store.append_page(part, "BBB", 1, raw_events(1, 2))  # interleaved in the same segment
+        store.append_page(part, "AAA", 3, PAGES[10.0][0])
+        store.truncate_fight("AAA", 3, kept)
+        assert store.fight_bytes("AAA", 3) == kept
+        store.append_page(part, "AAA", 3, PAGES[20.0][0])
+
+        expected = PAGES[0.0][0] + PAGES[20.0][0]
+        assert lines(store.read_fight("AAA", 3)) == [orjson.dumps(e) for e in expected]
+        out = scan_raw_events(fight_ref(part, "AAA", 3), store).collect()
+        assert out["original_json"].to_list() == [orjson.dumps(e).decode() for e in expected]
+        assert out["event_id"].to_list() == list(range(len(expected)))
+        assert lines(store.read_fight("BBB", 1)) == [orjson.dumps(e) for e in raw_events(1, 2)]
+
+
+@pytest.mark.parametrize("layout", ["files", "segments"])
+def test_interrupted_fight_resumes_from_its_checkpoint(stub_fflogs, tmp_path, layout):
+    part = tmp_path / "raw" / "7.3x" / "test-boss" / "SAM" / "report_date=2025-01"
+    unit = FightUnit("AAA", 3, 93, "Test Boss", "SAM", 1_735_689_600_000, 0.0, 1_000.0, True)
+    crash = {"at": 20.0}
+
+    def handler(query, variables):
+        if variables["start"] == crash["at"]:
+            raise Crash
+        events, nxt = PAGES[variables["start"]]
+        report = {"events": {"data": events, "nextPageTimestamp": nxt}}
+        return {"data": {"reportData": {"report": report}, "rateLimitData": rate_limit()}}
+
+    stub = stub_fflogs(handler)
+    manifest = IngestManifest(tmp_path / "manifest.sqlite")
+    store = SegmentStore(tmp_path / "raw") if layout == "segments" else None
+    out = fight_ref(part, "AAA", 3) if store else part / "AAA_3.ndjson"
+    part.mkdir(parents=True, exist_ok=True)
+
+    async def run():
+        client = stub.client()
+        try:
+            return await stream_fight_events(client, unit, out, manifest=manifest, store=store)
+        finally:
+            await client.close()
+
+    with pytest.raises(Crash):
+        asyncio.run(run())
+    state = manifest.get("AAA", 3)
+    assert state.status == "in_flight" and state.next_page_ts == 20.0 and state.events == 4
+    # A page written after the last checkpoint (crash before checkpointing) is dropped on resume
+    if store:
+        store.append_page(part, "AAA", 3, raw_events(9, 3))
+    else:
+        with NdjsonAppender(out) as w:
+            w.append(raw_events(9, 3))
+
+    crash["at"] = None
+    assert asyncio.run(run()) == len(ALL_EVENTS)
+    assert [v["start"] for _, v in stub.queries] == [0.0, 10.0, 20.0, 20.0]
+    data = store.read_fight("AAA", 3) if store else out.read_bytes()
+    assert lines(data) == [orjson.dumps(e) for e in ALL_EVENTS]
+    assert manifest.get("AAA", 3).status == "done"
+    manifest.close()
+    if store:
+        store.close()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import os
+
+import polars as pl
+import pytest
+
+from ff14_dataset.tagging.actions import derive_tags, load_tag_rules, tag_frame
+
+from tests.conftest import DEFAULT_CONFIG
+
+
+TAG_RULES = DEFAULT_CONFIG.parent / "tag_rules.yaml"
+
+
+@pytest.fixture
+def rules():
+    return load_tag_rules(TAG_RULES)
+
+
+def test_tag_frame_applies_rules_categories_and_names(rules):
+    frame = pl.DataFrame(
+        {
+            "name_en": [
+                "Reprisal",
+                "Rampart",
+                "Sheltron",
+                "Sheltron",
+                "Provoke",
+                "Fast Blade",
+                None,
+            ],
+            "tooltip": [
+                "Reduces damage dealt by nearby enemies. Party members' damage taken is reduced.",
+                "Reduces damage taken by 20%.",
+                None,
+                None,
+                "Gesture threatening placing yourself at the top of a target's enmity list.",
+                "Delivers an attack with a potency of 220.",
+                "Delivers an attack with a potency of 100 to all nearby enemies.",
+            ],
+            "category": [
+                "Ability",
+                "Ability",
+                "Ability",
+                "Ability",
+                "Ability",
+                "Weaponskill",
+                None,
+            ],
+            "job_abbr": ["*", "*", "PLD", "WAR", "*", "PLD", "PLD"],
+        }
+    )
+    tags = tag_frame(frame, rules).to_list()
+
+    assert tags == [
+        ["mitigation_party", "ogcd"],
+        ["mitigation_self", "ogcd"],
+        ["block", "ogcd"],  # per-job name tag
+        ["ogcd"],  # not for another job
+        ["ogcd", "taunt"],  # "*" name tag
+        ["gcd", "st"],
+        ["aoe"],  # `st` is excluded by the aoe group; overlapping aoe phrases counted once
+    ]
+
+
+def test_missing_columns_are_null(rules):
+    frame = pl.DataFrame(
+        {"name_en": ["Interject"], "tooltip": ["Interrupts the use of an action."]}
+    )
+    assert tag_frame(frame, rules).to_list() == [["interrupt"]]
+
+
+def test_derive_tags_matches_tag_frame(rules):
+    tooltip = "Restores target's HP and erects a barrier."
+    assert derive_tags(
+        name_en="Adloquium",
+        tooltip=tooltip,
+        category="Spell",
+        cast="2s",
+        recast="2.5s",
+        job="SCH",
+        rules=rules,
+    ) == ["barrier", "gcd", "heal"]
+
+
+def test_rules_file_is_reloaded_when_it_changes(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text("phrases: {stun: [stun]}\nrules: [{tag: stun, all: [stun]}]\n")
+    first = load_tag_rules(path)
+    assert load_tag_rules(path) is first
+
+    path.write_text("phrases: {stun: [stun]}\nrules: [{tag: cc, all: [stun]}]\n")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    frame = pl.DataFrame({"name_en": ["Low Blow"], "tooltip": ["Stuns target."]})
+    assert tag_frame(frame, load_tag_rules(path)).to_list() == [["cc"]]
+
+
+def test_rules_must_reference_defined_groups(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text("phrases: {stun: [stun]}\nrules: [{tag: cc, all: [stun], none: [silence]}]\n")
+    with pytest.raises(ValueError, match="silence"):
+        load_tag_rules(path)
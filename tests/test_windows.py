@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from ff14_dataset.features.build import write_labels_file
+from ff14_dataset.features.layout import layout_from_records
+from ff14_dataset.features.ticks import write_ticks_file
+from ff14_dataset.features.windows import WindowReader, export_windows, job_ticks_files
+from ff14_dataset.io.storage import ensure_paths
+from ff14_dataset.processing.normalize import normalize_to_staging
+
+from tests.conftest import write_raw_fight
+
+
+GCD = 7477
+ACTORS = (5, 6)
+RECORDS = [
+    {
+        "id": GCD,
+        "job_abbr": "SAM",
+        "category": "Weaponskill",
+        "is_gcd": True,
+        "base_recast_ms": 2500,
+        "charges_max": 0,
+        "status_ids_applied": [],
+    }
+]
+
+
+def fight_events(fight: int) -> list[dict]:
+    """Both actors cast every 500 ms for 3 s (31 ticks each at 100 ms)."""
+    return [
+        {
+            "timestamp": 100_000 + ms,
+            "type": "cast",
+            "sourceID": actor,
+            "targetID": 50,
+            "abilityGameID": GCD,
+            "fight": fight,
+        }
+        for ms in range(0, 3_001, 500)
+        for actor in ACTORS
+    ]
+
+
+def test_export_windows_indexes_one_actor_sequence_per_window(settings):
+    for code, fight in (("AAA", 1), ("BBB", 2)):
+        write_raw_fight(settings, code, fight, fight_events(fight))
+    normalize_to_staging(settings, workers=1)
+    layout = layout_from_records(RECORDS, "SAM")
+    for f in sorted(ensure_paths(settings).staging.glob("*/*/SAM/report_date=*/*.parquet")):
+        ticks = write_ticks_file(settings, f, layout)
+        write_labels_file(settings, ticks, layout.gcd_actions)
+
+    files = job_ticks_files(settings, "SAM")
+    assert len(files) == 2
+    out = export_windows(settings, files, "SAM", length=8, stride=4)
+    reader = WindowReader(out.root, 8)
+
+    # Per actor: 31 ticks -> starts 0, 4, ..., 20
+    assert out.windows == len(reader) == 2 * len(ACTORS) * 6
+    for i, row in enumerate(reader.index.iter_rows(named=True)):
+        window = reader[i]
+        assert window.height == 8
+        assert window["fight_id"].unique().to_list() == [row["fight_id"]]
+        assert window["actor_id"].unique().to_list() == [row["actor_id"]]
+        assert window["tick_id"].to_list() == list(range(row["start_tick"], row["start_tick"] + 8))
+    assert sorted({(r["fight_id"], r["actor_id"]) for r in reader.index.iter_rows(named=True)}) == [
+        (fight, actor) for fight in (1, 2) for actor in ACTORS
+    ]